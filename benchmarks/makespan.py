@@ -0,0 +1,149 @@
+"""
+Simulated makespan of the task scheduling policies on synthetic repositories.
+
+The task graph of every repository is built like in a real run, then executed on a simulated clock
+by a given number of workers, every task taking its estimated generation cost (optionally scaled by
+a random factor). The makespans of FIFO and critical-path scheduling are compared to the lower bound
+max(longest chain, total work / workers). Run it from a directory containing a `config.yml`:
+
+    python -m benchmarks.makespan --objects 500 2000 --workers 4 10 32
+"""
+import argparse
+import heapq
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from functools import partial
+from typing import Dict
+
+from benchmarks.synthetic_repo import SyntheticRepoSpec, generate_synthetic_repo
+from dynamodocs.config import CONFIG
+from dynamodocs.file_handler import FileHandler
+from dynamodocs.threads import TaskManager
+from dynamodocs.tree_handler import DocItem, MetaInfo
+
+POLICIES = ["fifo", "critical_path"]
+
+
+def build_meta_info(repo_path: str) -> MetaInfo:
+    structure = FileHandler(repo_path, None).generate_overall_structure({}, [])
+    meta_info = MetaInfo.from_project_hierarchy_json(structure)
+    meta_info.repo_path = repo_path
+    meta_info.parse_reference()
+    return meta_info
+
+
+def build_task_manager(meta_info: MetaInfo, policy: str) -> TaskManager:
+    for item in meta_info.target_repo_hierarchical_tree.get_preorder_traversal():
+        item.multithread_task_id = -1
+    CONFIG["task_priority"] = policy
+    task_manager = meta_info.get_task_manager(
+        meta_info.target_repo_hierarchical_tree, partial(DocItem.need_to_generate, ignore_list=[]))
+    task_manager.sync_func = lambda: None
+    return task_manager
+
+
+def critical_path_length(task_manager: TaskManager, durations: Dict[int, float]) -> float:
+    """The duration of the longest dependency chain, computed by increasing ID."""
+    finish = {}
+    for task_id in sorted(task_manager.task_dict):
+        task = task_manager.task_dict[task_id]
+        finish[task_id] = durations[task_id] + max(
+            (finish[dependency.task_id] for dependency in task.dependencies), default=0.0)
+    return max(finish.values(), default=0.0)
+
+
+def simulate_makespan(task_manager: TaskManager, worker_count: int, durations: Dict[int, float]) -> float:
+    """
+    Drain the task manager with `worker_count` simulated workers.
+
+    Idle workers claim tasks as long as some are ready, then the clock jumps to the next completion.
+
+    Returns:
+        float: The simulated time at which the last task completes.
+    """
+    now = 0.0
+    running = []
+    idle = worker_count
+    while not task_manager.all_success:
+        while idle > 0:
+            task, task_id = task_manager.get_next_task(0)
+            if task is None:
+                break
+            heapq.heappush(running, (now + durations[task_id], task_id))
+            idle -= 1
+        now, task_id = heapq.heappop(running)
+        task_manager.mark_completed(task_id)
+        idle += 1
+    return now
+
+
+def main():
+    argparser = argparse.ArgumentParser(
+        description="Compare the simulated makespan of FIFO and critical-path task scheduling")
+    argparser.add_argument("--objects", type=int, nargs="+", default=[500, 2000],
+                           help="Total object counts of the generated repositories")
+    argparser.add_argument("--objects-per-file", type=int, default=20)
+    argparser.add_argument("--nesting-depth", type=int, default=2)
+    argparser.add_argument("--reference-density", type=float, default=1.0)
+    argparser.add_argument("--workers", type=int, nargs="+", default=[4, 10, 32])
+    argparser.add_argument("--noise", type=float, default=0.3,
+                           help="Standard deviation of the log of the random factor applied to every task cost")
+    argparser.add_argument("--seed", type=int, default=0)
+    argparser.add_argument("--output", type=str, default=None,
+                           help="Write the JSON results to this file instead of stdout")
+    args = argparser.parse_args()
+
+    CONFIG["project_hierarchy"] = ".project_hierarchy_bench"
+    results = {"python": sys.version.split()[0], "runs": []}
+    for object_count in args.objects:
+        spec = SyntheticRepoSpec(
+            file_count=max(1, object_count // args.objects_per_file),
+            objects_per_file=args.objects_per_file,
+            nesting_depth=args.nesting_depth,
+            reference_density=args.reference_density,
+            seed=args.seed,
+        )
+        repo_dir = tempfile.mkdtemp(prefix="dynamodocs_makespan_")
+        try:
+            repo_path = generate_synthetic_repo(repo_dir, spec)
+            CONFIG["repo_path"] = repo_path
+            with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                meta_info = build_meta_info(repo_path)
+                # the random factors only depend on the task, so both policies run the same workload
+                task_manager = build_task_manager(meta_info, "fifo")
+                rng = random.Random(args.seed)
+                durations = {task_id: task.cost * rng.lognormvariate(0, args.noise)
+                             for task_id, task in sorted(task_manager.task_dict.items())}
+                critical_path = critical_path_length(task_manager, durations)
+                total_work = sum(durations.values())
+                for worker_count in args.workers:
+                    run = {"spec": spec.to_dict(), "workers": worker_count, "task_count": len(durations),
+                           "lower_bound": max(critical_path, total_work / worker_count)}
+                    for policy in POLICIES:
+                        run[policy] = simulate_makespan(
+                            build_task_manager(meta_info, policy), worker_count, durations)
+                    run["speedup_over_fifo"] = run["fifo"] / \
+                        run["critical_path"]
+                    results["runs"].append(run)
+            for run in results["runs"][-len(args.workers):]:
+                print(f"{spec.object_count} objects, {run['workers']} workers: fifo {run['fifo']:.1f}, "
+                      f"critical path {run['critical_path']:.1f}, lower bound {run['lower_bound']:.1f}",
+                      file=sys.stderr)
+        finally:
+            shutil.rmtree(repo_dir, ignore_errors=True)
+
+    output = json.dumps(results, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w", encoding="utf-8") as writer:
+            writer.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Local stand-in for an Ollama server, answering with the SimulatedBackend.
+
+It serves the endpoints DynamoDocs uses (`POST /api/chat` and `GET /api/tags`), so the multi-host
+load balancing, the health checks and the failover can be exercised without any inference box.
+Start a few of them and list them in `ollama_host`, for example:
+
+    python -m benchmarks.ollama_server --port 11501 --latency-mean 0.5 &
+    python -m benchmarks.ollama_server --port 11502 --latency-mean 2.0 --die-after 20 &
+"""
+import argparse
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ollama import ResponseError
+
+from dynamodocs.backends import SimulatedBackend
+
+
+class OllamaStandInHandler(BaseHTTPRequestHandler):
+    """Answers Ollama API requests with the SimulatedBackend of the server."""
+
+    def send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self.send_json(200, {"models": [{"name": self.server.model}]})
+        else:
+            self.send_json(404, {"error": f"unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/api/chat":
+            self.send_json(404, {"error": f"unknown endpoint {self.path}"})
+            return
+        request = json.loads(self.rfile.read(
+            int(self.headers.get("Content-Length", 0))))
+        self.server.count_request()
+        try:
+            response = self.server.backend.chat(request["messages"])
+        except ResponseError as e:
+            self.send_json(e.status_code, {"error": e.error})
+            return
+        response["model"] = request.get("model", self.server.model)
+        self.send_json(200, response)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class OllamaStandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, backend: SimulatedBackend, model: str, die_after: int = 0, verbose: bool = False):
+        super().__init__(address, OllamaStandInHandler)
+        self.backend = backend
+        self.model = model
+        self.die_after = die_after
+        self.verbose = verbose
+        self.request_count = 0
+        self.count_lock = threading.Lock()
+
+    def count_request(self) -> None:
+        with self.count_lock:
+            self.request_count += 1
+            if self.die_after and self.request_count > self.die_after:
+                # exit abruptly like a crashed host, dropping the requests in flight
+                print(f"Stand-in server on port {self.server_address[1]} dies after {self.die_after} requests",
+                      flush=True)
+                os._exit(1)
+
+
+def main():
+    argparser = argparse.ArgumentParser(
+        description="Serve the Ollama chat API with a simulated model")
+    argparser.add_argument("--host", type=str, default="127.0.0.1")
+    argparser.add_argument("--port", type=int, default=11434)
+    argparser.add_argument("--model", type=str, default="codellama")
+    argparser.add_argument("--latency-distribution", type=str, default="lognormal",
+                           choices=["constant", "uniform", "normal", "lognormal", "exponential"])
+    argparser.add_argument("--latency-mean", type=float, default=0.5,
+                           help="Mean time before the first token, in seconds")
+    argparser.add_argument("--latency-stddev", type=float, default=0.2)
+    argparser.add_argument("--tokens-per-second", type=float, default=0)
+    argparser.add_argument("--prompt-tokens-per-second", type=float, default=0,
+                           help="Prefill speed, 0 disables the prefill delay")
+    argparser.add_argument("--prefix-cache-slots", type=int, default=0,
+                           help="Number of prompts kept in the simulated KV cache, 0 disables it")
+    argparser.add_argument("--output-tokens", type=int, default=200)
+    argparser.add_argument("--error-rate", type=float, default=0.0)
+    argparser.add_argument("--seed", type=int, default=0)
+    argparser.add_argument("--die-after", type=int, default=0,
+                           help="Exit abruptly when this many chat requests were received, 0 never dies")
+    argparser.add_argument("--verbose", action="store_true",
+                           help="Log every HTTP request")
+    args = argparser.parse_args()
+
+    backend = SimulatedBackend(
+        latency={"distribution": args.latency_distribution,
+                 "mean": args.latency_mean, "stddev": args.latency_stddev},
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        prompt_tokens_per_second=args.prompt_tokens_per_second,
+        prefix_cache_slots=args.prefix_cache_slots,
+    )
+    server = OllamaStandInServer((args.host, args.port), backend, args.model,
+                                 die_after=args.die_after, verbose=args.verbose)
+    print(f"Stand-in Ollama server listening on http://{args.host}:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
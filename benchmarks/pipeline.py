@@ -0,0 +1,204 @@
+"""
+End-to-end benchmark of the documentation pipeline on synthetic repositories.
+
+Every stage of the pipeline is timed and memory-profiled on its own, no LLM is involved.
+Run it from a directory containing a `config.yml`, for example:
+
+    python -m benchmarks.pipeline --objects 1000 10000 --output pipeline.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from functools import partial
+from typing import Any, Callable, Dict, List
+
+from benchmarks.synthetic_repo import SyntheticRepoSpec, generate_synthetic_repo
+from dynamodocs.config import CONFIG
+from dynamodocs.file_handler import FileHandler
+from dynamodocs.launcher import Runner
+from dynamodocs.tree_handler import DocItem, MetaInfo
+
+STAGES = [
+    "generate_overall_structure",
+    "from_project_hierarchy_json",
+    "parse_reference",
+    "get_task_manager",
+    "checkpoint",
+    "load_doc_from_older_meta",
+    "markdown_refresh",
+]
+
+
+def measure(stage: str, func: Callable[[], Any], trace_memory: bool = True, quiet: bool = True) -> tuple[Any, Dict[str, Any]]:
+    """
+    Run `func` once and record its wall time and, optionally, its peak python heap usage.
+
+    Args:
+        stage (str): The name of the measured stage.
+        func (Callable): The stage to run.
+        trace_memory (bool): Whether to profile memory with tracemalloc, which slows the stage down noticeably.
+        quiet (bool): Whether to silence the progress output printed by the stage.
+
+    Returns:
+        tuple: The return value of `func` and the measurement record.
+    """
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        if quiet:
+            with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                result = func()
+        else:
+            result = func()
+    finally:
+        seconds = time.perf_counter() - start
+        peak = None
+        if trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    return result, {"stage": stage, "seconds": seconds, "peak_memory_bytes": peak}
+
+
+def benchmark_repo(repo_path: str, stages: List[str], trace_memory: bool = True, quiet: bool = True) -> List[Dict[str, Any]]:
+    """
+    Run the pipeline stages one after the other on an existing repository.
+
+    Stages that are not selected still run when a later stage needs their output, but are not recorded.
+
+    Args:
+        repo_path (str): The absolute path of the repository.
+        stages (List[str]): The names of the stages to record.
+        trace_memory (bool): Whether to profile memory.
+        quiet (bool): Whether to silence the progress output of the stages.
+
+    Returns:
+        List[Dict[str, Any]]: One measurement record per selected stage.
+    """
+    CONFIG["repo_path"] = repo_path
+    CONFIG["project_hierarchy"] = ".project_hierarchy_bench"
+    CONFIG["Markdown_Docs_folder"] = "markdown_docs_bench"
+    records = []
+    last_stage = max(STAGES.index(stage) for stage in stages)
+
+    def run(stage: str, func: Callable[[], Any]) -> Any:
+        if stage in stages:
+            result, record = measure(stage, func, trace_memory, quiet)
+            records.append(record)
+            return result
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            return func()
+
+    def build_structure() -> dict:
+        return FileHandler(repo_path, None).generate_overall_structure({}, [])
+
+    def build_meta(structure: dict) -> MetaInfo:
+        meta_info = MetaInfo.from_project_hierarchy_json(structure)
+        meta_info.repo_path = repo_path
+        return meta_info
+
+    structure = run("generate_overall_structure", build_structure)
+    if last_stage < STAGES.index("from_project_hierarchy_json"):
+        return records
+    meta_info = run("from_project_hierarchy_json",
+                    partial(build_meta, structure))
+    if last_stage < STAGES.index("parse_reference"):
+        return records
+    run("parse_reference", meta_info.parse_reference)
+    if last_stage < STAGES.index("get_task_manager"):
+        return records
+    task_available_func = partial(DocItem.need_to_generate, ignore_list=[])
+    task_manager = run("get_task_manager", partial(
+        meta_info.get_task_manager, meta_info.target_repo_hierarchical_tree, task_available_func))
+    if "get_task_manager" in stages:
+        records[-1]["task_count"] = len(task_manager.task_dict)
+
+    # pretend every object has been documented, so the later stages handle realistic payloads
+    for item in meta_info.target_repo_hierarchical_tree.get_preorder_traversal():
+        if item.content:
+            item.md_content.append(
+                f"**{item.item_name}**: synthetic documentation of {item.get_full_name()}.")
+
+    checkpoint_dir = os.path.join(repo_path, CONFIG["project_hierarchy"])
+    run("checkpoint", partial(meta_info.checkpoint,
+        target_dir_path=checkpoint_dir, flash_reference_relation=True))
+    if "checkpoint" in stages:
+        records[-1]["file_size_bytes"] = os.path.getsize(
+            os.path.join(checkpoint_dir, "project_hierarchy.json"))
+    if last_stage < STAGES.index("load_doc_from_older_meta"):
+        return records
+
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        new_meta_info = build_meta(build_structure())
+    run("load_doc_from_older_meta", partial(
+        new_meta_info.load_doc_from_older_meta, meta_info))
+    if last_stage < STAGES.index("markdown_refresh"):
+        return records
+
+    # markdown_refresh only needs the meta info and the lock, not a fully initialized Runner
+    runner = Runner.__new__(Runner)
+    runner.meta_info = meta_info
+    runner.runner_lock = threading.Lock()
+    run("markdown_refresh", runner.markdown_refresh)
+    return records
+
+
+def main():
+    argparser = argparse.ArgumentParser(
+        description="Benchmark every stage of the documentation pipeline on synthetic repositories")
+    argparser.add_argument("--objects", type=int, nargs="+", default=[1000],
+                           help="Total object counts of the generated repositories, one run per value")
+    argparser.add_argument("--objects-per-file", type=int, default=20)
+    argparser.add_argument("--nesting-depth", type=int, default=2)
+    argparser.add_argument("--reference-density", type=float, default=1.0,
+                           help="Average number of cross-module references per function or method")
+    argparser.add_argument("--seed", type=int, default=0)
+    argparser.add_argument("--stages", type=str, nargs="+", default=STAGES, choices=STAGES,
+                           help="Stages to record, all by default")
+    argparser.add_argument("--no-memory", action="store_true",
+                           help="Skip memory profiling, which makes the timings closer to a real run")
+    argparser.add_argument("--verbose", action="store_true",
+                           help="Show the progress output of the stages")
+    argparser.add_argument("--keep-repos", action="store_true",
+                           help="Do not delete the generated repositories")
+    argparser.add_argument("--output", type=str, default=None,
+                           help="Write the JSON results to this file instead of stdout")
+    args = argparser.parse_args()
+
+    results = {"python": sys.version.split()[0], "runs": []}
+    for object_count in args.objects:
+        spec = SyntheticRepoSpec(
+            file_count=max(1, object_count // args.objects_per_file),
+            objects_per_file=args.objects_per_file,
+            nesting_depth=args.nesting_depth,
+            reference_density=args.reference_density,
+            seed=args.seed,
+        )
+        repo_dir = tempfile.mkdtemp(prefix="dynamodocs_bench_")
+        try:
+            repo_path = generate_synthetic_repo(repo_dir, spec)
+            records = benchmark_repo(
+                repo_path, args.stages, trace_memory=not args.no_memory, quiet=not args.verbose)
+            results["runs"].append({"spec": spec.to_dict(), "stages": records})
+            print(f"benchmarked {spec.object_count} objects in {repo_path}", file=sys.stderr)
+        finally:
+            if not args.keep_repos:
+                shutil.rmtree(repo_dir, ignore_errors=True)
+
+    output = json.dumps(results, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w", encoding="utf-8") as writer:
+            writer.write(output)
+
+
+if __name__ == "__main__":
+    main()
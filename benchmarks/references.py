@@ -0,0 +1,170 @@
+"""
+Reference resolution with jedi against the pre-filter and the static AST resolver, on synthetic
+repositories or given ones.
+
+Every function and class of the repository is resolved by jedi, by jedi behind the identifier
+pre-filter, and by the static resolver. The pre-filter and the static resolver are timed with the
+indexing of the files, and the hybrid time adds the jedi lookups of the objects the static resolver
+leaves to jedi.
+The agreement is measured on the objects the static resolver answers for, with jedi as the reference,
+on the references from the files of the hierarchy (add_references drops the others anyway).
+Run it from a directory containing a `config.yml`:
+
+    python -m benchmarks.references --objects 500 2000
+    python -m benchmarks.references --repo /path/to/repo
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from typing import Any, Dict, List
+
+from benchmarks.synthetic_repo import SyntheticRepoSpec, generate_synthetic_repo
+from dynamodocs.config import CONFIG
+from dynamodocs.file_handler import FileHandler
+from dynamodocs.identifier_index import SEARCH_FILE, SEARCH_NONE, IdentifierIndex
+from dynamodocs.static_references import StaticReferenceResolver
+from dynamodocs.tree_handler import DocItemType, MetaInfo, find_all_referencer
+
+
+def compare_resolvers(repo_path: str) -> Dict[str, Any]:
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        structure = FileHandler(repo_path, None).generate_overall_structure({}, [])
+    meta_info = MetaInfo.from_project_hierarchy_json(structure)
+    file_paths = [file_node.get_full_name() for file_node in meta_info.get_all_files()]
+    indexed_files = set(file_paths)
+    objects = [(item, file_node.get_full_name()) for file_node in meta_info.get_all_files()
+               for item in file_node.get_preorder_traversal()
+               if item.item_type not in [DocItemType._repo, DocItemType._dir, DocItemType._file]]
+
+    start = time.perf_counter()
+    resolver = StaticReferenceResolver(repo_path, file_paths)
+    index_seconds = time.perf_counter() - start
+    static_results = {}
+    start = time.perf_counter()
+    for item, file_path in objects:
+        static_results[id(item)] = resolver.find_references(
+            item.item_name, file_path, item.content["code_start_line"])
+    static_seconds = time.perf_counter() - start
+
+    jedi_results = {}
+    jedi_seconds = {}
+    for item, file_path in objects:
+        start = time.perf_counter()
+        references = find_all_referencer(repo_path, item.item_name, file_path,
+                                         item.content["code_start_line"], item.content["name_column"])
+        jedi_seconds[id(item)] = time.perf_counter() - start
+        jedi_results[id(item)] = {reference for reference in references if reference[0] in indexed_files}
+
+    start = time.perf_counter()
+    identifier_index = IdentifierIndex(repo_path, file_paths)
+    prefilter_seconds = time.perf_counter() - start
+    prefiltered_results = {}
+    for item, file_path in objects:
+        start = time.perf_counter()
+        search_scope, candidate_files = identifier_index.search_scope(
+            item.item_name, file_path, item.parent.item_type == DocItemType._file)
+        if search_scope == SEARCH_NONE:
+            prefiltered_results[id(item)] = set()
+        else:
+            # its own file, and the candidate files one by one
+            references = find_all_referencer(
+                repo_path, item.item_name, file_path, item.content["code_start_line"],
+                item.content["name_column"], in_file_only=search_scope == SEARCH_FILE,
+                candidate_files=candidate_files)
+            prefiltered_results[id(item)] = {reference for reference in references
+                                             if reference[0] in indexed_files}
+        prefilter_seconds += time.perf_counter() - start
+    missed_by_prefilter = sum(len(jedi_results[id(item)] - prefiltered_results[id(item)]) for item, _ in objects)
+
+    resolved = [item for item, _ in objects if static_results[id(item)] is not None]
+    true_positives = sum(len(set(static_results[id(item)]) & jedi_results[id(item)]) for item in resolved)
+    static_count = sum(len(set(static_results[id(item)])) for item in resolved)
+    jedi_count = sum(len(jedi_results[id(item)]) for item in resolved)
+    exact = sum(set(static_results[id(item)]) == jedi_results[id(item)] for item in resolved)
+    fallback_seconds = sum(seconds for item_id, seconds in jedi_seconds.items()
+                           if static_results[item_id] is None)
+    return {
+        "objects": len(objects),
+        "files": len(file_paths),
+        "jedi_seconds": sum(jedi_seconds.values()),
+        "prefilter_seconds": prefilter_seconds,
+        "prefilter_skipped": identifier_index.counts[SEARCH_NONE],
+        "prefilter_in_file": identifier_index.counts[SEARCH_FILE],
+        "prefilter_missed_references": missed_by_prefilter,
+        "static_index_seconds": index_seconds,
+        "static_lookup_seconds": static_seconds,
+        "hybrid_seconds": index_seconds + static_seconds + fallback_seconds,
+        "static_resolved": len(resolved),
+        "fallback_rate": 1 - len(resolved) / len(objects) if objects else 0.0,
+        "exact_agreement": exact / len(resolved) if resolved else 1.0,
+        "precision": true_positives / static_count if static_count else 1.0,
+        "recall": true_positives / jedi_count if jedi_count else 1.0,
+        "disagreements": [
+            {"object": item.get_full_name(), "missed": sorted(jedi_results[id(item)] - set(static_results[id(item)])),
+             "extra": sorted(set(static_results[id(item)]) - jedi_results[id(item)])}
+            for item in resolved if set(static_results[id(item)]) != jedi_results[id(item)]
+        ][:20],
+    }
+
+
+def main():
+    argparser = argparse.ArgumentParser(
+        description="Compare the reference resolution of jedi, of the pre-filter and of the static AST resolver")
+    argparser.add_argument("--objects", type=int, nargs="+", default=[500, 2000],
+                           help="Total object counts of the generated repositories")
+    argparser.add_argument("--objects-per-file", type=int, default=20)
+    argparser.add_argument("--nesting-depth", type=int, default=2)
+    argparser.add_argument("--reference-density", type=float, default=1.0)
+    argparser.add_argument("--seed", type=int, default=0)
+    argparser.add_argument("--repo", type=str, nargs="+", default=[],
+                           help="Compare on these repositories instead of generated ones")
+    argparser.add_argument("--output", type=str, default=None,
+                           help="Write the JSON results to this file instead of stdout")
+    args = argparser.parse_args()
+
+    CONFIG["project_hierarchy"] = ".project_hierarchy_bench"
+    results = {"python": sys.version.split()[0], "runs": []}
+    runs: List[tuple] = [(os.path.abspath(repo_path), None) for repo_path in args.repo]
+    if not runs:
+        runs = [(None, SyntheticRepoSpec(
+            file_count=max(1, object_count // args.objects_per_file),
+            objects_per_file=args.objects_per_file,
+            nesting_depth=args.nesting_depth,
+            reference_density=args.reference_density,
+            seed=args.seed,
+        )) for object_count in args.objects]
+    for repo_path, spec in runs:
+        repo_dir = None
+        try:
+            if spec is not None:
+                repo_dir = tempfile.mkdtemp(prefix="dynamodocs_references_")
+                repo_path = generate_synthetic_repo(repo_dir, spec)
+            CONFIG["repo_path"] = repo_path
+            run = compare_resolvers(repo_path)
+            run["repo"] = spec.to_dict() if spec is not None else repo_path
+            results["runs"].append(run)
+            print(f"{run['objects']} objects: jedi {run['jedi_seconds']:.1f}s, "
+                  f"pre-filtered jedi {run['prefilter_seconds']:.1f}s ({run['prefilter_skipped']} skipped, "
+                  f"{run['prefilter_in_file']} in file, {run['prefilter_missed_references']} references missed), "
+                  f"static {run['static_index_seconds'] + run['static_lookup_seconds']:.2f}s, "
+                  f"hybrid {run['hybrid_seconds']:.1f}s, {run['fallback_rate']:.1%} left to jedi, "
+                  f"precision {run['precision']:.3f}, recall {run['recall']:.3f}", file=sys.stderr)
+        finally:
+            if repo_dir is not None:
+                shutil.rmtree(repo_dir, ignore_errors=True)
+
+    output = json.dumps(results, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w", encoding="utf-8") as writer:
+            writer.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Micro-benchmarks of the task scheduler and of the task graph construction, with complexity checks.
+
+Each benchmark is run at growing input sizes, the growth exponent of its run time is fitted on a
+log-log scale and compared to a configured bound. The process exits with status 1 when a bound
+is exceeded, so quadratic regressions in the hot paths are caught without needing an LLM.
+Run it from a directory containing a `config.yml`, for example:
+
+    python -m benchmarks.scheduler --sizes 10000 100000 1000000 --workers 1 4 16 64
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import redirect_stdout
+from functools import partial
+from typing import Dict, List
+
+from dynamodocs.threads import TaskManager
+from dynamodocs.tree_handler import DocItem, DocItemType, MetaInfo
+
+# Upper bounds of the fitted exponent (run time ~ size ** exponent), linear code fits around 1.0
+DEFAULT_MAX_EXPONENTS = {
+    "add_task": 1.25,
+    "claim": 1.25,
+    "complete": 1.25,
+    "drain": 1.25,
+    "get_task_manager": 1.3,
+}
+
+
+def fit_exponent(sizes: List[int], seconds: List[float]) -> float:
+    """
+    Fit `seconds = c * sizes ** exponent` with a least-squares line on a log-log scale.
+
+    Args:
+        sizes (List[int]): The input sizes.
+        seconds (List[float]): The measured run times.
+
+    Returns:
+        float: The fitted exponent, NaN when fewer than two sizes were measured.
+    """
+    if len(sizes) < 2:
+        return float("nan")
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(second, 1e-9)) for second in seconds]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    return covariance / variance
+
+
+def build_task_dependencies(task_count: int, max_dependencies: int, window: int, seed: int) -> List[List[int]]:
+    """Random DAG in which every task depends on up to `max_dependencies` of the `window` tasks added before it."""
+    rng = random.Random(seed)
+    dependencies = []
+    for task_id in range(task_count):
+        low = max(0, task_id - window)
+        count = min(task_id - low, rng.randint(0, max_dependencies))
+        dependencies.append(rng.sample(range(low, task_id), count))
+    return dependencies
+
+
+def bench_task_manager(task_count: int, worker_count: int, dependencies: List[List[int]]) -> Dict[str, float]:
+    """
+    Fill a TaskManager with the given DAG, then drain it with `worker_count` threads.
+
+    Returns:
+        Dict[str, float]: The time of the add, claim and complete phases. Claim and complete
+        times are thread cpu times summed over all the workers and only count successful claims,
+        the drain time is the wall time of the whole drain.
+    """
+    task_manager = TaskManager()
+    task_manager.sync_func = lambda: None
+
+    start = time.perf_counter()
+    for dependency_task_id in dependencies:
+        task_manager.add_task(dependency_task_id)
+    add_seconds = time.perf_counter() - start
+
+    claim_seconds = [0.0] * worker_count
+    complete_seconds = [0.0] * worker_count
+
+    # thread cpu time leaves out the time spent waiting for the GIL and the task lock,
+    # so claim and complete costs reflect the algorithm rather than the contention
+    def drain(process_id: int):
+        while not task_manager.all_success:
+            claim_start = time.thread_time()
+            task, task_id = task_manager.get_next_task(process_id)
+            claim_end = time.thread_time()
+            if task is None:
+                time.sleep(0)
+                continue
+            claim_seconds[process_id] += claim_end - claim_start
+            task_manager.mark_completed(task_id)
+            complete_seconds[process_id] += time.thread_time() - claim_end
+
+    threads = [threading.Thread(target=drain, args=(process_id,))
+               for process_id in range(worker_count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    drain_seconds = time.perf_counter() - start
+
+    return {
+        "add_task": add_seconds,
+        "claim": sum(claim_seconds),
+        "complete": sum(complete_seconds),
+        "drain": drain_seconds,
+        "throughput_tasks_per_second": task_count / drain_seconds,
+    }
+
+
+def build_doc_tree(object_count: int, objects_per_file: int, reference_density: float, seed: int) -> DocItem:
+    """
+    Build an in-memory DocItem tree shaped like a parsed repository, without touching the disk or jedi.
+
+    Files hold top-level functions and classes with methods, each function or method references on
+    average `reference_density` objects from other files, which can create reference cycles.
+    """
+    rng = random.Random(seed)
+    root = DocItem(item_type=DocItemType._repo, item_name="full_repo")
+    file_objects: List[List[DocItem]] = []
+    line = 1
+
+    def add_child(parent: DocItem, item: DocItem):
+        item.parent = parent
+        parent.children[item.item_name] = item
+
+    for file_index in range(max(1, object_count // objects_per_file)):
+        file_item = DocItem(item_type=DocItemType._file,
+                            item_name=f"module_{file_index}.py")
+        add_child(root, file_item)
+        objects = []
+        remaining = objects_per_file
+        while remaining > 0:
+            if remaining > 1 and rng.random() < 0.3:
+                method_count = min(remaining - 1, rng.randint(1, 4))
+                class_item = DocItem(item_type=DocItemType._class,
+                                     item_name=f"Class{len(objects)}", content={"type": "ClassDef"})
+                add_child(file_item, class_item)
+                objects.append(class_item)
+                for method_index in range(method_count):
+                    method_item = DocItem(item_type=DocItemType._class_method,
+                                          item_name=f"method{method_index}", content={"type": "FunctionDef"})
+                    add_child(class_item, method_item)
+                    objects.append(method_item)
+                remaining -= 1 + method_count
+            else:
+                function_item = DocItem(item_type=DocItemType._function,
+                                        item_name=f"function{len(objects)}", content={"type": "FunctionDef"})
+                add_child(file_item, function_item)
+                objects.append(function_item)
+                remaining -= 1
+        for item in objects:
+            item.code_start_line = line
+            line += 1
+        file_objects.append(objects)
+
+    for file_index, objects in enumerate(file_objects):
+        for item in objects:
+            if item.item_type == DocItemType._class or len(file_objects) < 2:
+                continue
+            count = int(reference_density) + \
+                (1 if rng.random() < reference_density % 1 else 0)
+            for _ in range(count):
+                other_index = rng.randrange(len(file_objects) - 1)
+                if other_index >= file_index:
+                    other_index += 1
+                referenced = rng.choice(file_objects[other_index])
+                if any(other is referenced for other in item.reference_who):
+                    continue
+                item.reference_who.append(referenced)
+                item.special_reference_type.append(False)
+                referenced.who_reference_me.append(item)
+
+    root.parse_tree_path(now_path=[])
+    root.calculate_depth()
+    return root
+
+
+def bench_get_task_manager(object_count: int, reference_density: float, seed: int) -> Dict[str, float]:
+    root = build_doc_tree(object_count, 20, reference_density, seed)
+    meta_info = MetaInfo(target_repo_hierarchical_tree=root)
+    task_available_func = partial(DocItem.need_to_generate, ignore_list=[])
+    start = time.perf_counter()
+    task_manager = meta_info.get_task_manager(root, task_available_func)
+    return {
+        "get_task_manager": time.perf_counter() - start,
+        "task_count": len(task_manager.task_dict),
+    }
+
+
+def check_growth(name: str, sizes: List[int], seconds: List[float], max_exponent: float, **labels) -> Dict:
+    exponent = fit_exponent(sizes, seconds)
+    return {
+        "benchmark": name,
+        **labels,
+        "sizes": sizes,
+        "seconds": seconds,
+        "exponent": exponent,
+        "max_exponent": max_exponent,
+        "passed": math.isnan(exponent) or exponent <= max_exponent,
+    }
+
+
+def parse_bounds(overrides: List[str]) -> Dict[str, float]:
+    bounds = dict(DEFAULT_MAX_EXPONENTS)
+    for override in overrides:
+        name, _, value = override.partition("=")
+        if name not in bounds:
+            raise ValueError(
+                f"Unknown benchmark {name}, expected one of {list(bounds)}")
+        bounds[name] = float(value)
+    return bounds
+
+
+def main():
+    argparser = argparse.ArgumentParser(
+        description="Micro-benchmark the TaskManager and the task graph construction, and check their growth rate")
+    argparser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000],
+                           help="Task counts of the TaskManager benchmarks")
+    argparser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16, 64],
+                           help="Worker thread counts of the TaskManager benchmarks")
+    argparser.add_argument("--topology-sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                           help="Object counts of the get_task_manager benchmark")
+    argparser.add_argument("--max-dependencies", type=int, default=3)
+    argparser.add_argument("--reference-density", type=float, default=1.0)
+    argparser.add_argument("--seed", type=int, default=0)
+    argparser.add_argument("--max-exponent", type=str, nargs="*", default=[],
+                           help="Override a growth bound, e.g. claim=1.1")
+    argparser.add_argument("--output", type=str, default=None,
+                           help="Write the JSON results to this file instead of stdout")
+    args = argparser.parse_args()
+    bounds = parse_bounds(args.max_exponent)
+
+    checks = []
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        dependency_graphs = {
+            size: build_task_dependencies(size, args.max_dependencies, 1000, args.seed) for size in args.sizes
+        }
+        for worker_count in args.workers:
+            runs = [bench_task_manager(size, worker_count, dependency_graphs[size])
+                    for size in args.sizes]
+            for name in ["add_task", "claim", "complete", "drain"]:
+                checks.append(check_growth(
+                    name, args.sizes, [run[name] for run in runs], bounds[name], workers=worker_count))
+            checks[-1]["throughput_tasks_per_second"] = [run["throughput_tasks_per_second"]
+                                                         for run in runs]
+
+        topology_runs = [bench_get_task_manager(size, args.reference_density, args.seed)
+                         for size in args.topology_sizes]
+        checks.append(check_growth("get_task_manager", args.topology_sizes,
+                                   [run["get_task_manager"] for run in topology_runs], bounds["get_task_manager"]))
+
+    results = {
+        "python": sys.version.split()[0],
+        "passed": all(check["passed"] for check in checks),
+        "checks": checks,
+    }
+    output = json.dumps(results, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w", encoding="utf-8") as writer:
+            writer.write(output)
+
+    for check in checks:
+        if not check["passed"]:
+            labels = f" with {check['workers']} workers" if "workers" in check else ""
+            print(f"{check['benchmark']}{labels} grows as n^{check['exponent']:.2f}, over the bound n^{check['max_exponent']}",
+                  file=sys.stderr)
+    if not results["passed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import os
+import random
+import git
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+
+@dataclass
+class SyntheticRepoSpec:
+    """
+    Parameters describing the shape of a synthetic repository.
+
+    Attributes:
+        file_count (int): Number of python modules to generate.
+        objects_per_file (int): Number of documentable objects (classes, methods and functions) in each module.
+        nesting_depth (int): Number of directory levels the modules are spread over.
+        reference_density (float): Average number of cross-module references made by each function or method.
+        seed (int): Seed of the random generator, the same spec always produces the same repository.
+    """
+    file_count: int = 50
+    objects_per_file: int = 20
+    nesting_depth: int = 2
+    reference_density: float = 1.0
+    seed: int = 0
+
+    @property
+    def object_count(self) -> int:
+        return self.file_count * self.objects_per_file
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "file_count": self.file_count,
+            "objects_per_file": self.objects_per_file,
+            "nesting_depth": self.nesting_depth,
+            "reference_density": self.reference_density,
+            "seed": self.seed,
+            "object_count": self.object_count,
+        }
+
+
+@dataclass
+class _Module:
+    rel_path: str
+    import_path: str
+    functions: List[str] = field(default_factory=list)
+    classes: List[str] = field(default_factory=list)
+
+
+def _module_dirs(file_index: int, nesting_depth: int) -> List[str]:
+    """Spread the modules over a directory tree of the requested depth, with a small fan-out per level."""
+    return [f"layer{level}_{file_index % (level + 2)}" for level in range(nesting_depth)]
+
+
+def _reference_count(rng: random.Random, density: float) -> int:
+    count = int(density)
+    if rng.random() < density - count:
+        count += 1
+    return count
+
+
+def generate_synthetic_repo(target_dir: str, spec: SyntheticRepoSpec) -> str:
+    """
+    Generate a committed git repository of python modules following the given spec.
+
+    Every module contains a mix of top-level functions and classes with methods. Each function or
+    method calls, on average, `reference_density` functions or classes imported from other modules,
+    which gives jedi real cross-file references to resolve.
+
+    Args:
+        target_dir (str): The directory the repository is created in, it must not exist or be empty.
+        spec (SyntheticRepoSpec): The shape of the repository.
+
+    Returns:
+        str: The absolute path of the generated repository.
+    """
+    rng = random.Random(spec.seed)
+    target_dir = os.path.abspath(target_dir)
+    os.makedirs(target_dir, exist_ok=True)
+
+    modules: List[_Module] = []
+    for file_index in range(spec.file_count):
+        dirs = ["synthetic"] + _module_dirs(file_index, spec.nesting_depth)
+        module_name = f"module_{file_index}"
+        modules.append(_Module(
+            rel_path="/".join(dirs + [module_name + ".py"]),
+            import_path=".".join(dirs + [module_name]),
+        ))
+
+    # decide the object names first so that references can point to any module
+    layouts: List[List[tuple]] = []
+    for file_index, module in enumerate(modules):
+        layout = []
+        remaining = spec.objects_per_file
+        object_index = 0
+        while remaining > 0:
+            if remaining > 1 and rng.random() < 0.3:
+                method_count = min(remaining - 1, rng.randint(1, 4))
+                class_name = f"Class{file_index}_{object_index}"
+                methods = [f"method{file_index}_{object_index}_{k}" for k in range(method_count)]
+                module.classes.append(class_name)
+                layout.append(("class", class_name, methods))
+                remaining -= 1 + method_count
+            else:
+                function_name = f"function{file_index}_{object_index}"
+                module.functions.append(function_name)
+                layout.append(("function", function_name, []))
+                remaining -= 1
+            object_index += 1
+        layouts.append(layout)
+
+    def pick_references(file_index: int) -> List[tuple]:
+        references = []
+        if len(modules) < 2:
+            return references
+        for _ in range(_reference_count(rng, spec.reference_density)):
+            other_index = rng.randrange(len(modules) - 1)
+            if other_index >= file_index:
+                other_index += 1
+            other = modules[other_index]
+            candidates = other.functions + other.classes
+            if candidates:
+                references.append((other.import_path, rng.choice(candidates)))
+        return references
+
+    def body(references: List[tuple], indent: str) -> List[str]:
+        lines = [f"{indent}total = 0"]
+        for _, name in references:
+            lines.append(f"{indent}total += hash({name}(*args))")
+        lines.append(f"{indent}return total")
+        return lines
+
+    for file_index, (module, layout) in enumerate(zip(modules, layouts)):
+        imports: Dict[str, set] = {}
+        code_lines: List[str] = []
+        for kind, name, methods in layout:
+            if kind == "function":
+                references = pick_references(file_index)
+                for import_path, ref_name in references:
+                    imports.setdefault(import_path, set()).add(ref_name)
+                code_lines.append(f"def {name}(*args):")
+                code_lines.append(f'    """Synthetic function {name}."""')
+                code_lines += body(references, "    ")
+                code_lines.append("")
+                code_lines.append("")
+            else:
+                code_lines.append(f"class {name}:")
+                code_lines.append(f'    """Synthetic class {name}."""')
+                for method in methods:
+                    references = pick_references(file_index)
+                    for import_path, ref_name in references:
+                        imports.setdefault(import_path, set()).add(ref_name)
+                    code_lines.append("")
+                    code_lines.append(f"    def {method}(self, *args):")
+                    code_lines += body(references, "        ")
+                code_lines.append("")
+                code_lines.append("")
+
+        header = [
+            f"from {import_path} import {', '.join(sorted(names))}"
+            for import_path, names in sorted(imports.items())
+        ]
+        abs_path = os.path.join(target_dir, module.rel_path)
+        os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+        with open(abs_path, "w", encoding="utf-8") as writer:
+            writer.write("\n".join(header + ["", ""] + code_lines))
+
+    # `__init__.py` files make every directory an importable package for jedi
+    for root, _, _ in os.walk(os.path.join(target_dir, "synthetic")):
+        init_path = os.path.join(root, "__init__.py")
+        if not os.path.exists(init_path):
+            open(init_path, "w").close()
+
+    with open(os.path.join(target_dir, ".gitignore"), "w", encoding="utf-8") as writer:
+        writer.write("__pycache__/\n.project_hierarchy*/\nmarkdown_docs*/\n")
+
+    repo = git.Repo.init(target_dir)
+    with repo.config_writer() as config_writer:
+        config_writer.set_value("user", "name", "synthetic")
+        config_writer.set_value("user", "email", "synthetic@example.com")
+    repo.git.add(A=True)
+    repo.index.commit("synthetic repository")
+    return target_dir
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argparser = argparse.ArgumentParser(
+        description="Generate a synthetic git repository for benchmarking")
+    argparser.add_argument("target_dir", type=str)
+    argparser.add_argument("--files", type=int, default=50)
+    argparser.add_argument("--objects-per-file", type=int, default=20)
+    argparser.add_argument("--nesting-depth", type=int, default=2)
+    argparser.add_argument("--reference-density", type=float, default=1.0)
+    argparser.add_argument("--seed", type=int, default=0)
+    args = argparser.parse_args()
+
+    spec = SyntheticRepoSpec(
+        file_count=args.files,
+        objects_per_file=args.objects_per_file,
+        nesting_depth=args.nesting_depth,
+        reference_density=args.reference_density,
+        seed=args.seed,
+    )
+    print(generate_synthetic_repo(args.target_dir, spec))
@@ -1,15 +1,39 @@
 import argparse
+import sys
 
+from dynamodocs.batch import BatchRunner, load_repo_list
 from dynamodocs.launcher import Runner
 from dynamodocs.mylogger import logger
+from dynamodocs.tracing import tracer
+
+
+def run_profile(args: argparse.Namespace, profile: str):
+    with tracer.span("runner init"):
+        runner = Runner(clear=args.clear, profile=profile,
+                        repo_path=args.repo_path, dry_run=args.dry_run, paths=args.paths)
+
+    if args.dry_run:
+        runner.dry_run()
+    elif args.watch:
+        runner.watch()
+    elif args.staged:
+        with tracer.span("run"):
+            runner.run_staged()
+
+        logger.info(f"Documentation task completed ({profile} profile).")
+    else:
+        with tracer.span("run"):
+            runner.run()
+
+        logger.info(f"Documentation task completed ({profile} profile).")
 
 
 def main():
     argparser = argparse.ArgumentParser(
         description="Automatic documentation generator")
 
-    argparser.add_argument("-p", "--profile", type=str,
-                           default="dev", help="Choose the prompt profile to use, can be configured in the config file, uses 'dev' by default")
+    argparser.add_argument("-p", "--profile", type=str, nargs="+",
+                           default=["dev"], help="Choose the prompt profiles to use, can be configured in the config file, uses 'dev' by default. The profiles are run one after the other and share the structure and references of the repository")
 
     argparser.add_argument("-c", "--clear", action="store_true",
                            help="Clear the output directory before generating the documentation from scratch")
@@ -17,14 +41,48 @@ def main():
     argparser.add_argument("-rp", "--repo_path", type=str, default=None,
                            help="Path to the repository to be documented, overwrites the config file repo_path, if not provided, the repository path in the config file will be used")
 
+    argparser.add_argument("--trace", type=str, default=None,
+                           help="Record timing spans of the run, write them to this file as a Chrome trace-event JSON and print a summary table")
+
+    argparser.add_argument("--dry-run", action="store_true",
+                           help="Detect the changes and print the planned tasks with their estimated tokens and time, without calling the LLM or writing anything")
+
+    argparser.add_argument("--watch", action="store_true",
+                           help="Keep running and regenerate the docs of the changed objects whenever Python files change")
+
+    argparser.add_argument("--staged", action="store_true",
+                           help="Only document the staged Python files and the objects related to them, for a pre-commit hook")
+
+    argparser.add_argument("--paths", type=str, nargs="+", default=None,
+                           help="Only document these paths or globs of the repository, relative to its root, the docs of the other files are kept as they are")
+
+    argparser.add_argument("--batch", type=str, nargs="+", default=None,
+                           help="Document several repositories in one process, with one generation queue and one concurrency limit for all of them. Every argument is a repository, or a text file listing one repository per line")
+
     args = argparser.parse_args()
+    if len(args.profile) > 1 and args.watch:
+        argparser.error("--watch runs a single profile")
+    if args.batch is not None and (args.watch or args.staged or args.repo_path is not None):
+        argparser.error("--batch can't be combined with --watch, --staged or --repo_path")
+
+    if args.trace is not None:
+        tracer.enable()
 
-    runner = Runner(clear=args.clear, profile=args.profile,
-                    repo_path=args.repo_path)
+    failures = []
+    if args.batch is not None:
+        failures = BatchRunner(load_repo_list(args.batch), args.profile, clear=args.clear,
+                               dry_run=args.dry_run, paths=args.paths).run()
+    else:
+        for profile in args.profile:
+            run_profile(args, profile)
 
-    runner.run()
+    if args.trace is not None:
+        tracer.export_chrome_trace(args.trace)
+        print(tracer.summary_table())
+        logger.info(f"Trace written to {args.trace}")
 
-    logger.info("Documentation task completed.")
+    if failures:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,579 @@
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Union
+from ollama import Client, RequestError, ResponseError
+from prettytable import PrettyTable
+
+from dynamodocs.mylogger import logger
+
+
+class LLMBackend:
+    """
+    Interface of the chat backends used by ChatEngine.
+
+    A backend takes the chat messages of one request and returns a response shaped like the
+    Ollama chat response: a dict with a "message" entry holding the generated "content", plus
+    optional statistics such as "prompt_eval_count" and "eval_count".
+    """
+    name = "backend"
+
+    def chat(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def chat_cancellable(self, messages: List[Dict[str, str]], cancelled: Optional[threading.Event],
+                         hedge: bool = False) -> Dict[str, Any]:
+        """
+        Like chat, for a request that may be cancelled while it runs, as the loser of a hedged request.
+
+        The backends able to stop a request raise RequestCancelledError once `cancelled` is set, the
+        others run it to its end.
+
+        Args:
+            messages (List[Dict[str, str]]): The chat messages of the request.
+            cancelled (threading.Event, optional): Set to cancel the request.
+            hedge (bool, optional): The request duplicates one in flight, better sent to another host.
+        """
+        return self.chat(messages)
+
+    def ping(self) -> None:
+        """Raises an exception when the backend is not reachable."""
+
+    def report(self) -> Optional[str]:
+        """Returns a summary of the backend usage to print at the end of a run, if any."""
+        return None
+
+
+class RequestCancelledError(RequestError):
+    """Raised by a backend when a request is cancelled before its answer is complete."""
+    pass
+
+
+class OllamaBackend(LLMBackend):
+    """
+    Sends the requests to an Ollama server, the client is shared by all the requests.
+
+    The cancellable requests are streamed, closing the stream makes the server stop generating.
+    """
+    name = "ollama"
+
+    def __init__(self, host: str, model: str, timeout: float = 60 * 60, keep_alive: str = "60m"):
+        self.host = host
+        self.model = model
+        self.keep_alive = keep_alive
+        self.client = Client(host=host, timeout=timeout)
+
+    def chat(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        return self.client.chat(model=self.model, messages=messages,
+                                stream=False, keep_alive=self.keep_alive)
+
+    def chat_cancellable(self, messages: List[Dict[str, str]], cancelled: Optional[threading.Event],
+                         hedge: bool = False) -> Dict[str, Any]:
+        if cancelled is None:
+            return self.chat(messages)
+        stream = self.client.chat(model=self.model, messages=messages,
+                                  stream=True, keep_alive=self.keep_alive)
+        content = []
+        last_chunk = None
+        try:
+            for chunk in stream:
+                if cancelled.is_set():
+                    raise RequestCancelledError("request cancelled")
+                content.append(chunk["message"]["content"])
+                last_chunk = chunk
+        finally:
+            stream.close()
+        response = dict(last_chunk) if last_chunk is not None else {}
+        response["message"] = {"role": "assistant", "content": "".join(content)}
+        return response
+
+    def ping(self) -> None:
+        self.client.list()
+
+
+def response_to_json(response: Any) -> Dict[str, Any]:
+    """A chat response as plain JSON data, the Ollama client returns pydantic models holding a Message."""
+    if hasattr(response, "model_dump"):
+        return response.model_dump(mode="json")
+    return dict(response)
+
+
+def messages_key(messages: List[Dict[str, str]]) -> str:
+    """Returns a stable hash of the chat messages, used to identify a request."""
+    return hashlib.sha256(
+        json.dumps(messages, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+class SimulatedBackend(LLMBackend):
+    """
+    Local stand-in for an LLM server, used to measure the pipeline offline and reproducibly.
+
+    The response text only depends on the prompt. The latency is drawn from the configured
+    distribution, then the time needed to produce the output tokens at `tokens_per_second` is added.
+    Failures are raised as Ollama `ResponseError`s with the configured probability. Batch prompts
+    are answered with one delimited document per object.
+
+    With `prefix_cache_slots`, the server is modelled with that many KV-cache slots: only the prompt
+    tokens (words) past the longest prefix shared with a cached prompt are prefilled, which is what
+    "prompt_eval_count" reports and what `prompt_tokens_per_second` is charged for.
+
+    Args:
+        latency (dict, optional): The distribution of the time before the first token, with the keys
+            "distribution" (constant, uniform, normal, lognormal or exponential), "mean", "stddev",
+            "min" and "max" in seconds. Defaults to no latency.
+        tokens_per_second (float, optional): Generation speed, 0 disables the generation delay.
+        output_tokens (int, optional): Number of tokens (words) of every response.
+        error_rate (float, optional): Probability of a request to fail.
+        seed (int, optional): Seed of the latency and error draws.
+        prompt_tokens_per_second (float, optional): Prefill speed, 0 disables the prefill delay.
+        prefix_cache_slots (int, optional): Number of cached prompts, 0 disables the prefix cache.
+    """
+    name = "simulated"
+
+    def __init__(self, latency: Optional[Dict[str, Any]] = None, tokens_per_second: float = 0,
+                 output_tokens: int = 200, error_rate: float = 0.0, seed: int = 0,
+                 prompt_tokens_per_second: float = 0, prefix_cache_slots: int = 0):
+        self.latency = latency or {"distribution": "constant", "mean": 0}
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.prefix_cache_slots = prefix_cache_slots
+        self.prefix_cache: List[List[str]] = []
+
+    def sample_latency(self) -> float:
+        distribution = self.latency.get("distribution", "constant")
+        mean = float(self.latency.get("mean", 0))
+        stddev = float(self.latency.get("stddev", 0))
+        with self.random_lock:
+            if distribution == "constant":
+                value = mean
+            elif distribution == "uniform":
+                value = self.random.uniform(
+                    mean - math.sqrt(3) * stddev, mean + math.sqrt(3) * stddev)
+            elif distribution == "normal":
+                value = self.random.gauss(mean, stddev)
+            elif distribution == "lognormal":
+                # parameters chosen so that the samples have the configured mean and stddev
+                sigma2 = math.log(1 + (stddev / mean) ** 2) if mean > 0 else 0
+                value = self.random.lognormvariate(
+                    math.log(mean) - sigma2 / 2, math.sqrt(sigma2)) if mean > 0 else 0
+            elif distribution == "exponential":
+                value = self.random.expovariate(1 / mean) if mean > 0 else 0
+            else:
+                raise ValueError(
+                    f"Unknown latency distribution: {distribution}")
+        value = max(value, float(self.latency.get("min", 0)))
+        if self.latency.get("max") is not None:
+            value = min(value, float(self.latency["max"]))
+        return value
+
+    def generate_text(self, key: str) -> str:
+        words = random.Random(key).choices(
+            ["the", "function", "returns", "value", "object", "parameter", "class", "method",
+             "documentation", "project", "data", "list", "string", "handles", "each", "item"],
+            k=max(self.output_tokens - 2, 0),
+        )
+        return f"**Simulated documentation** ({key[:12]}): " + " ".join(words)
+
+    def prefill(self, messages: List[Dict[str, str]]) -> int:
+        """Returns the number of prompt tokens to prefill, and puts the prompt in the prefix cache."""
+        tokens = [token for message in messages for token in message["content"].split()]
+        if self.prefix_cache_slots <= 0:
+            return len(tokens)
+        with self.random_lock:
+            best_slot, best_shared = None, 0
+            for slot, cached in enumerate(self.prefix_cache):
+                shared = 0
+                for cached_token, token in zip(cached, tokens):
+                    if cached_token != token:
+                        break
+                    shared += 1
+                if shared > best_shared:
+                    best_slot, best_shared = slot, shared
+            # like a server slot, the prompt replaces the cached prompt it extends, or the oldest one
+            if best_slot is not None:
+                self.prefix_cache.pop(best_slot)
+            elif len(self.prefix_cache) >= self.prefix_cache_slots:
+                self.prefix_cache.pop(0)
+            self.prefix_cache.append(tokens)
+        return len(tokens) - best_shared
+
+    @staticmethod
+    def sleep(seconds: float, cancelled: Optional[threading.Event]) -> None:
+        if cancelled is None:
+            time.sleep(seconds)
+        elif cancelled.wait(seconds):
+            raise RequestCancelledError("request cancelled")
+
+    def chat(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        return self.chat_cancellable(messages, None)
+
+    def chat_cancellable(self, messages: List[Dict[str, str]], cancelled: Optional[threading.Event],
+                         hedge: bool = False) -> Dict[str, Any]:
+        key = messages_key(messages)
+        start = time.perf_counter()
+        self.sleep(self.sample_latency(), cancelled)
+        prompt_tokens = self.prefill(messages)
+        if self.prompt_tokens_per_second > 0:
+            self.sleep(prompt_tokens / self.prompt_tokens_per_second, cancelled)
+        with self.random_lock:
+            failed = self.random.random() < self.error_rate
+        if failed:
+            raise ResponseError("simulated backend error", 503)
+        object_count = len(re.findall(
+            r"<<<OBJECT \d+>>>", messages[0]["content"]))
+        if object_count > 0:
+            content = "\n".join(
+                f"<<<DOC {k}>>>\n{self.generate_text(f'{key}-{k}')}\n<<<END {k}>>>"
+                for k in range(1, object_count + 1))
+        else:
+            content = self.generate_text(key)
+        output_tokens = self.output_tokens * max(object_count, 1)
+        if self.tokens_per_second > 0:
+            self.sleep(output_tokens / self.tokens_per_second, cancelled)
+        return {
+            "model": "simulated",
+            "message": {"role": "assistant", "content": content},
+            "done": True,
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": output_tokens,
+            "total_duration": int((time.perf_counter() - start) * 1e9),
+        }
+
+
+class RecordReplayBackend(LLMBackend):
+    """
+    Records the prompt/response pairs of another backend to a JSON-lines file, or replays them.
+
+    In record mode every request is forwarded to the wrapped backend and the pair is appended to the
+    file. In replay mode the responses are read from the file, requests that were never recorded
+    fail, or are forwarded to the wrapped backend when `fallthrough` is set.
+
+    Args:
+        mode (str): "record" or "replay".
+        path (str): The path of the recording file.
+        backend (LLMBackend, optional): The wrapped backend, required in record mode.
+        fallthrough (bool, optional): Whether to forward unrecorded requests in replay mode.
+    """
+    name = "record_replay"
+
+    def __init__(self, mode: str, path: str, backend: Optional[LLMBackend] = None, fallthrough: bool = False):
+        if mode not in ["record", "replay"]:
+            raise ValueError(
+                f"record_replay mode must be record or replay, got {mode}")
+        if mode == "record" and backend is None:
+            raise ValueError("record mode needs a backend to record from")
+        self.mode = mode
+        self.path = path
+        self.backend = backend
+        self.fallthrough = fallthrough
+        self.file_lock = threading.Lock()
+        self.recordings: Dict[str, List[Dict[str, Any]]] = {}
+        self.replay_positions: Dict[str, int] = {}
+        if mode == "replay":
+            self.load()
+
+    def load(self) -> None:
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"No recording found at {self.path}")
+        with open(self.path, "r", encoding="utf-8") as reader:
+            for line in reader:
+                if line.strip():
+                    record = json.loads(line)
+                    self.recordings.setdefault(
+                        record["key"], []).append(record["response"])
+        logger.info(
+            f"Loaded {sum(len(value) for value in self.recordings.values())} recorded responses from {self.path}")
+
+    def chat(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        return self.chat_cancellable(messages, None)
+
+    def chat_cancellable(self, messages: List[Dict[str, str]], cancelled: Optional[threading.Event],
+                         hedge: bool = False) -> Dict[str, Any]:
+        key = messages_key(messages)
+        if self.mode == "replay":
+            with self.file_lock:
+                responses = self.recordings.get(key)
+                if responses:
+                    # identical prompts replay their recorded responses in order, then the last one
+                    position = self.replay_positions.get(key, 0)
+                    self.replay_positions[key] = position + 1
+                    return responses[min(position, len(responses) - 1)]
+            if not self.fallthrough or self.backend is None:
+                raise ResponseError(
+                    f"no recorded response for request {key[:12]}", 404)
+            return self.backend.chat_cancellable(messages, cancelled, hedge)
+
+        response = self.backend.chat_cancellable(messages, cancelled, hedge)
+        with self.file_lock:
+            with open(self.path, "a", encoding="utf-8") as writer:
+                writer.write(json.dumps(
+                    {"key": key, "messages": messages, "response": response_to_json(response)},
+                    ensure_ascii=False) + "\n")
+        return response
+
+    def report(self) -> Optional[str]:
+        return self.backend.report() if self.backend is not None else None
+
+
+class HostState:
+    """Load and health of one host of a MultiHostBackend."""
+
+    def __init__(self, name: str, backend: LLMBackend, max_in_flight: int):
+        self.name = name
+        self.backend = backend
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.errors = 0
+        self.failovers = 0
+        self.total_latency = 0.0
+        self.total_tokens = 0
+
+    @property
+    def load(self) -> float:
+        return self.in_flight / self.max_in_flight
+
+
+class NoHealthyHostError(RequestError):
+    """Raised when every host of a MultiHostBackend is dead or was already tried for the request."""
+    pass
+
+
+def is_host_failure(error: Exception) -> bool:
+    """
+    Whether an error is caused by the host rather than by the request.
+
+    Client errors (4xx) are caused by the request and would fail on any host, except 404 which
+    Ollama returns when the model is not pulled on that host. Server errors and connection errors
+    mean the host is overloaded or dead.
+    """
+    if isinstance(error, NoHealthyHostError):
+        return True
+    if isinstance(error, ResponseError):
+        return not (400 <= error.status_code < 500) or error.status_code == 404
+    return not isinstance(error, RequestError)
+
+
+# number of system prompts remembered to route the requests sharing them to the same host
+MAX_PREFIX_ROUTES = 4096
+
+
+class MultiHostBackend(LLMBackend):
+    """
+    Spreads the requests over several hosts, each one served by its own backend.
+
+    Every request goes to the healthy host with the lowest load (in-flight requests over its cap),
+    and waits while all the healthy hosts are at their cap. Requests sharing their system prompt stick
+    to the host that served it last while it has room, so the host can reuse the cached prefix. A host is marked unhealthy after
+    `failure_threshold` consecutive host failures (passive check), and a background thread pings
+    every host each `health_check_interval` seconds to take dead hosts out and bring recovered ones
+    back (active check). A request failing because of its host is sent again to another host.
+
+    Args:
+        hosts (Dict[str, LLMBackend]): The backend of every host, by host name.
+        max_in_flight (Dict[str, int]): The concurrency cap of every host.
+        failure_threshold (int, optional): Consecutive failures before a host is marked unhealthy.
+        health_check_interval (float, optional): Seconds between two active checks, 0 disables them.
+    """
+    name = "multi_host"
+
+    def __init__(self, hosts: Dict[str, LLMBackend], max_in_flight: Dict[str, int],
+                 failure_threshold: int = 2, health_check_interval: float = 30):
+        if not hosts:
+            raise ValueError("MultiHostBackend needs at least one host")
+        self.hosts = [HostState(name, backend, max(1, max_in_flight[name]))
+                      for name, backend in hosts.items()]
+        self.failure_threshold = max(1, failure_threshold)
+        self.health_check_interval = health_check_interval
+        self.condition = threading.Condition()
+        self.start = time.perf_counter()
+        self.prefix_hosts: OrderedDict[str, HostState] = OrderedDict()
+        if health_check_interval > 0:
+            threading.Thread(target=self.health_check_loop,
+                             name="health-check", daemon=True).start()
+
+    def acquire_host(self, excluded: List[HostState], prefix_key: Optional[str] = None,
+                     hedge: bool = False) -> HostState:
+        with self.condition:
+            while True:
+                candidates = [host for host in self.hosts
+                              if host.healthy and host not in excluded]
+                if not candidates:
+                    # every host looks dead, probe them right away rather than failing the whole run
+                    self.condition.release()
+                    try:
+                        self.check_hosts()
+                    finally:
+                        self.condition.acquire()
+                    candidates = [host for host in self.hosts
+                                  if host.healthy and host not in excluded]
+                    if not candidates:
+                        raise NoHealthyHostError("no healthy host available")
+                available = [
+                    host for host in candidates if host.in_flight < host.max_in_flight]
+                if available:
+                    host = self.prefix_hosts.get(prefix_key)
+                    if hedge:
+                        # the request in flight went to the host of its prefix, the hedge goes elsewhere if possible
+                        others = [candidate for candidate in available if candidate is not host]
+                        host = min(others or available, key=lambda host: host.load)
+                    elif host not in available:
+                        host = min(available, key=lambda host: host.load)
+                    if prefix_key is not None and not hedge:
+                        self.prefix_hosts[prefix_key] = host
+                        self.prefix_hosts.move_to_end(prefix_key)
+                        if len(self.prefix_hosts) > MAX_PREFIX_ROUTES:
+                            self.prefix_hosts.popitem(last=False)
+                    host.in_flight += 1
+                    return host
+                self.condition.wait()
+
+    def release_host(self, host: HostState, latency: float, response: Optional[Dict[str, Any]],
+                     error: Optional[Exception]) -> None:
+        with self.condition:
+            host.in_flight -= 1
+            host.requests += 1
+            host.total_latency += latency
+            if error is None:
+                host.consecutive_failures = 0
+                host.total_tokens += response.get("eval_count") or 0
+            elif not isinstance(error, RequestCancelledError):
+                host.errors += 1
+                if is_host_failure(error):
+                    host.consecutive_failures += 1
+                    if host.healthy and host.consecutive_failures >= self.failure_threshold:
+                        host.healthy = False
+                        logger.warning(
+                            f"Host {host.name} marked unhealthy after {host.consecutive_failures} failures: {error}")
+            self.condition.notify_all()
+
+    def chat(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        return self.chat_cancellable(messages, None)
+
+    def chat_cancellable(self, messages: List[Dict[str, str]], cancelled: Optional[threading.Event],
+                         hedge: bool = False) -> Dict[str, Any]:
+        tried: List[HostState] = []
+        prefix_key = hashlib.sha256(
+            messages[0]["content"].encode("utf-8")).hexdigest() if messages else None
+        while True:
+            host = self.acquire_host(
+                excluded=tried, prefix_key=prefix_key, hedge=hedge)
+            start = time.perf_counter()
+            try:
+                response = host.backend.chat_cancellable(messages, cancelled)
+            except Exception as e:
+                self.release_host(host, time.perf_counter() - start, None, e)
+                if not is_host_failure(e) or len(tried) + 1 >= len(self.hosts):
+                    raise
+                tried.append(host)
+                with self.condition:
+                    host.failovers += 1
+                logger.warning(
+                    f"Request failed on host {host.name}, failing over: {e}")
+                continue
+            self.release_host(host, time.perf_counter() - start, response, None)
+            return response
+
+    def check_hosts(self) -> None:
+        """Ping every host and update its health."""
+        for host in self.hosts:
+            try:
+                host.backend.ping()
+                reachable = True
+            except Exception:
+                reachable = False
+            with self.condition:
+                if reachable and not host.healthy:
+                    logger.info(f"Host {host.name} is healthy again")
+                    host.consecutive_failures = 0
+                elif not reachable and host.healthy:
+                    logger.warning(f"Host {host.name} failed its health check")
+                host.healthy = reachable
+                self.condition.notify_all()
+
+    def health_check_loop(self) -> None:
+        while True:
+            time.sleep(self.health_check_interval)
+            self.check_hosts()
+
+    def report(self) -> Optional[str]:
+        elapsed = time.perf_counter() - self.start
+        table = PrettyTable(["host", "healthy", "cap", "requests", "errors", "failovers",
+                             "mean latency (s)", "requests/s", "tokens/s"])
+        with self.condition:
+            for host in self.hosts:
+                table.add_row([
+                    host.name, host.healthy, host.max_in_flight, host.requests, host.errors, host.failovers,
+                    f"{host.total_latency / host.requests:.2f}" if host.requests else "-",
+                    f"{host.requests / elapsed:.2f}", f"{host.total_tokens / elapsed:.1f}",
+                ])
+        return "Per-host throughput:\n" + table.get_string()
+
+
+def parse_hosts(ollama_host: Union[str, List[Union[str, Dict[str, Any]]]], default_max_in_flight: int) -> Dict[str, int]:
+    """
+    Normalize the `ollama_host` config entry, a host url or a list of host urls and
+    {host, max_in_flight} dicts, into the concurrency cap of every host.
+    """
+    if isinstance(ollama_host, str):
+        ollama_host = [ollama_host]
+    hosts = {}
+    for entry in ollama_host:
+        if isinstance(entry, str):
+            hosts[entry] = default_max_in_flight
+        else:
+            hosts[entry["host"]] = entry.get(
+                "max_in_flight") or default_max_in_flight
+    return hosts
+
+
+def build_backend(config: Dict[str, Any]) -> LLMBackend:
+    """
+    Build the backend selected by the `llm_backend` entry of the config, "ollama" by default,
+    wrapped in a RecordReplayBackend when `record_replay.mode` is set. Several Ollama hosts
+    are load balanced by a MultiHostBackend.
+    """
+    backend_name = config.get("llm_backend") or "ollama"
+    if backend_name == "ollama":
+        load_balancing = config.get("load_balancing") or {}
+        hosts = parse_hosts(
+            config["ollama_host"], load_balancing.get("max_in_flight_per_host") or config["max_thread_count"])
+        if len(hosts) == 1:
+            backend = OllamaBackend(
+                host=next(iter(hosts)), model=config["ollama_model"])
+        else:
+            backend = MultiHostBackend(
+                hosts={host: OllamaBackend(host=host, model=config["ollama_model"])
+                       for host in hosts},
+                max_in_flight=hosts,
+                failure_threshold=load_balancing.get("failure_threshold") or 2,
+                health_check_interval=load_balancing.get(
+                    "health_check_interval", 30),
+            )
+    elif backend_name == "simulated":
+        backend = SimulatedBackend(**(config.get("simulated_backend") or {}))
+    else:
+        raise ValueError(f"Unknown llm_backend: {backend_name}")
+
+    record_replay = config.get("record_replay") or {}
+    if record_replay.get("mode"):
+        backend = RecordReplayBackend(
+            mode=record_replay["mode"],
+            path=record_replay.get("path") or "llm_recordings.jsonl",
+            backend=backend,
+            fallthrough=bool(record_replay.get("fallthrough")),
+        )
+    return backend
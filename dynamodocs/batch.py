@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from dynamodocs.backends import build_backend
+from dynamodocs.concurrency import ConcurrencyController
+from dynamodocs.config import CONFIG
+from dynamodocs.engine import ChatEngine
+from dynamodocs.launcher import Runner, build_chat_engine
+from dynamodocs.mylogger import logger
+from dynamodocs.threads import GenerationQueue
+from dynamodocs.tracing import tracer
+
+
+def load_repo_list(paths: List[str]) -> List[str]:
+    """
+    The repositories of a batch run.
+
+    Args:
+        paths (List[str]): Repositories, or text files listing one repository per line. The empty
+            lines and the lines starting with `#` of the files are skipped.
+
+    Returns:
+        List[str]: The absolute paths of the repositories, in order and without duplicates.
+    """
+    repo_paths = []
+    for path in paths:
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as reader:
+                lines = [line.strip() for line in reader]
+            repo_paths += [line for line in lines if line and not line.startswith("#")]
+        else:
+            repo_paths.append(path)
+    return list(dict.fromkeys(os.path.abspath(repo_path) for repo_path in repo_paths))
+
+
+class BatchRunner:
+    """
+    Document several repositories in one process, with one generation queue for all of them.
+
+    Every repository is documented by its own Runner, in a thread, within the scope of its own copy of
+    the config. The runners detect their changes and build their task graphs side by side, and hand
+    their tasks to a single GenerationQueue: one pool of workers, one concurrency controller and one
+    backend for all the repositories, so the server sees a single client whatever the number of
+    repositories. The workers serve the repositories fair-share, by the estimated cost of the tasks
+    each one was handed.
+
+    The profiles are run one after the other, each one on all the repositories.
+
+    Args:
+        repo_paths (List[str]): The repositories.
+        profiles (List[str]): The prompt profiles.
+        clear (bool, optional): Clear the docs of every repository before generating them from scratch.
+        dry_run (bool, optional): Only plan the generation of every repository, one after the other.
+        paths (List[str], optional): Narrow the run of every repository to these paths.
+    """
+
+    def __init__(self, repo_paths: List[str], profiles: List[str], clear: bool = False, dry_run: bool = False,
+                 paths: Optional[List[str]] = None):
+        self.repo_paths = repo_paths
+        self.profiles = profiles
+        self.clear = clear
+        self.dry_run = dry_run
+        self.paths = paths
+        self.backend = build_backend(CONFIG)
+        self.concurrency = ConcurrencyController.from_config(CONFIG)
+        # the concurrency controller decides how many of the workers may send a request at once
+        self.generation_queue = GenerationQueue(
+            max(CONFIG["max_thread_count"], self.concurrency.max_limit))
+        # the (repository, profile) runs that raised
+        self.failures: List[tuple] = []
+        # the time of every repository with the current profile
+        self.durations: Dict[str, float] = {}
+
+    def run_repo(self, repo_path: str, profile: str, chat_engine: ChatEngine) -> None:
+        config = CONFIG.copy()
+        config["repo_path"] = repo_path
+        start = time.perf_counter()
+        with CONFIG.scope(config):
+            try:
+                with tracer.span("runner init", repo=repo_path):
+                    runner = Runner(clear=self.clear, profile=profile, repo_path=repo_path, dry_run=self.dry_run,
+                                    paths=self.paths, chat_engine=chat_engine, generation_queue=self.generation_queue)
+                if self.dry_run:
+                    runner.dry_run()
+                else:
+                    with tracer.span("run", repo=repo_path):
+                        runner.run()
+            except Exception as e:
+                logger.exception(f"Batch: the {profile} run of {repo_path} failed: {e}")
+                self.failures.append((repo_path, profile))
+        self.durations[repo_path] = time.perf_counter() - start
+
+    def run(self) -> List[tuple]:
+        """
+        Document all the repositories with all the profiles.
+
+        Returns:
+            List[tuple]: The (repository, profile) runs that failed, the other runs are completed.
+        """
+        self.generation_queue.start()
+        try:
+            for profile in self.profiles:
+                chat_engine = build_chat_engine(profile, self.backend, self.concurrency)
+                self.durations = {}
+                logger.info(f"Batch: documenting {len(self.repo_paths)} repositories with the {profile} profile")
+                if self.dry_run:
+                    for repo_path in self.repo_paths:
+                        self.run_repo(repo_path, profile, chat_engine)
+                    continue
+                threads = [threading.Thread(target=self.run_repo, args=(repo_path, profile, chat_engine),
+                                            name=f"repo {os.path.basename(repo_path)}")
+                           for repo_path in self.repo_paths]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                self.log_summary(profile, chat_engine)
+        finally:
+            self.generation_queue.close()
+        return self.failures
+
+    def log_summary(self, profile: str, chat_engine: ChatEngine) -> None:
+        for repo_path in self.repo_paths:
+            outcome = "failed after" if (repo_path, profile) in self.failures else "done in"
+            logger.info(f"Batch: {repo_path} {outcome} {self.durations.get(repo_path, 0.0):.1f}s")
+        logger.info(self.concurrency.summary())
+        breaker_summary = chat_engine.circuit_breaker.summary()
+        if breaker_summary is not None:
+            logger.info(breaker_summary)
+        backend_report = self.backend.report()
+        if backend_report is not None:
+            logger.info(backend_report)
+        failed_count = sum(failed_profile == profile for _, failed_profile in self.failures)
+        logger.info(f"Batch: {len(self.repo_paths) - failed_count} of {len(self.repo_paths)} "
+                    f"repositories documented with the {profile} profile")
@@ -0,0 +1,122 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+import git
+
+# number of files whose lines are kept in memory, a file is read once for all its objects
+MAX_CACHED_FILES = 256
+
+
+def git_blob_id(data: bytes) -> str:
+    """The id git gives to a file of this content, as `git hash-object` computes it."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def code_hash(code: str) -> str:
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()[:32]
+
+
+def decode_lines(data: bytes) -> List[str]:
+    """Split a file in lines like a file opened in text mode, with universal newlines."""
+    return io.TextIOWrapper(io.BytesIO(data), encoding="utf-8").readlines()
+
+
+class CodeUnavailableError(Exception):
+    """The file an object was parsed from is neither in the working tree nor in git anymore."""
+
+
+class CodeStore:
+    """
+    Gives the code of the objects, sliced on demand from their file.
+
+    The hierarchy doesn't hold the code of the objects, only their line range, the hash of their code
+    and the git blob id of the file they were parsed from. The file is read from the working tree when
+    it still has that content, otherwise from the git object database, where the committed and staged
+    versions of the files are.
+
+    Args:
+        repo_path (str): The repository of the files.
+        max_cached_files (int, optional): The number of files whose lines are kept in memory.
+    """
+
+    def __init__(self, repo_path: str, max_cached_files: int = MAX_CACHED_FILES):
+        self.repo_path = repo_path
+        self.max_cached_files = max_cached_files
+        self.cache: OrderedDict[str, List[str]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.repo = None
+
+    def read_blob(self, blob_id: str) -> bytes:
+        with self.lock:
+            if self.repo is None:
+                self.repo = git.Repo(self.repo_path)
+            return self.repo.odb.stream(bytes.fromhex(blob_id)).read()
+
+    def file_lines(self, file_path: str, blob_id: str) -> List[str]:
+        """
+        The lines of a file as it was parsed.
+
+        Args:
+            file_path (str): The path of the file, relative to the repository.
+            blob_id (str): The git blob id of the parsed content.
+
+        Returns:
+            List[str]: The lines, with their line ends.
+        """
+        with self.lock:
+            lines = self.cache.get(blob_id)
+            if lines is not None:
+                self.cache.move_to_end(blob_id)
+                return lines
+        try:
+            with open(os.path.join(self.repo_path, file_path), "rb") as reader:
+                data = reader.read()
+        except OSError:
+            data = None
+        if data is None or git_blob_id(data) != blob_id:
+            data = self.read_blob(blob_id)
+        lines = decode_lines(data)
+        with self.lock:
+            self.cache[blob_id] = lines
+            if len(self.cache) > self.max_cached_files:
+                self.cache.popitem(last=False)
+        return lines
+
+    def get_code(self, file_path: str, content: Dict[str, Any]) -> str:
+        """
+        The code of an object.
+
+        Args:
+            file_path (str): The file of the object, relative to the repository.
+            content (Dict[str, Any]): The content of the object in the hierarchy.
+
+        Returns:
+            str: The code.
+
+        Raises:
+            CodeUnavailableError: When neither the working tree nor git has the parsed file anymore.
+        """
+        if "code_content" in content:
+            # hierarchies written by older versions hold the code
+            return content["code_content"]
+        try:
+            lines = self.file_lines(file_path, content["file_blob"])
+        except (ValueError, OSError, git.exc.ODBError, git.exc.GitError) as e:
+            raise CodeUnavailableError(
+                f"The code of {file_path}/{content.get('name')} is not available anymore: {e}") from e
+        return "".join(lines[content["code_start_line"] - 1: content["code_end_line"]])
+
+
+CODE_STORES: Dict[str, CodeStore] = {}
+
+
+def get_code_store(repo_path: str) -> CodeStore:
+    """The code store of a repository, shared by the whole process."""
+    store = CODE_STORES.get(repo_path)
+    if store is None:
+        store = CODE_STORES.setdefault(repo_path, CodeStore(repo_path))
+    return store
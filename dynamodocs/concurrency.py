@@ -0,0 +1,214 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from dynamodocs.mylogger import logger
+from dynamodocs.tracing import tracer
+
+
+class RequestSlot:
+    """
+    Handle of one in-flight request, used as a context manager around the request.
+
+    The request code sets `output_tokens` and `prompt_tokens` when the response reports them, and
+    exceptions raised in the block are counted as errors.
+    """
+
+    def __init__(self, controller: "ConcurrencyController"):
+        self.controller = controller
+        self.output_tokens: Optional[int] = None
+        self.prompt_tokens: Optional[int] = None
+
+    def __enter__(self):
+        self.controller.acquire()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.controller.release(
+            latency=time.perf_counter() - self.start,
+            output_tokens=self.output_tokens,
+            prompt_tokens=self.prompt_tokens,
+            error=exc_type is not None,
+        )
+        return False
+
+
+class ConcurrencyController:
+    """
+    Limits the number of in-flight generation requests and adapts the limit to the backend.
+
+    Every request reports its latency, the number of generated tokens and whether it failed. The
+    latency per generated token (or the raw latency when the token count is unknown) is compared
+    to the best one observed recently, so that long answers are not mistaken for congestion.
+
+    Policies:
+        - fixed: the limit stays at `max_limit`.
+        - aimd: the limit grows by one after a full window of healthy requests, and is multiplied by
+          `backoff` on an error or when the latency exceeds `latency_tolerance` times the best one.
+        - gradient: the limit follows the ratio between the long-term and the current latency, plus a
+          small queue allowance, and is multiplied by `backoff` on an error.
+
+    Args:
+        policy (str, optional): fixed, aimd or gradient.
+        min_limit (int, optional): The lowest allowed limit.
+        max_limit (int, optional): The highest allowed limit.
+        initial (int, optional): The starting limit, `min_limit` by default for adaptive policies.
+        latency_tolerance (float, optional): How much slower than the best latency a request may be before it counts as congestion.
+        backoff (float, optional): Multiplicative decrease factor.
+        window (int, optional): Number of recent requests the best latency is taken from.
+    """
+
+    def __init__(self, policy: str = "fixed", min_limit: int = 1, max_limit: int = 10, initial: Optional[int] = None,
+                 latency_tolerance: float = 2.0, backoff: float = 0.7, window: int = 100):
+        if policy not in ["fixed", "aimd", "gradient"]:
+            raise ValueError(f"Unknown concurrency policy: {policy}")
+        self.policy = policy
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        if policy == "fixed":
+            initial = self.max_limit
+        elif initial is None:
+            initial = self.min_limit
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.recent_signals = deque(maxlen=window)
+        self.long_signal: Optional[float] = None
+        self.increase_credit = 0.0
+        self.completions_since_decrease = self.max_limit
+        self.adjustments = 0
+        self.requests = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.total_tokens = 0
+        self.total_prompt_tokens = 0
+
+    @staticmethod
+    def from_config(config: Dict[str, Any]) -> "ConcurrencyController":
+        settings = config.get("concurrency") or {}
+        return ConcurrencyController(
+            policy=settings.get("policy") or "fixed",
+            min_limit=settings.get("min") or 1,
+            max_limit=settings.get("max") or config["max_thread_count"],
+            initial=settings.get("initial"),
+            latency_tolerance=settings.get("latency_tolerance") or 2.0,
+            backoff=settings.get("backoff") or 0.7,
+        )
+
+    @property
+    def current_limit(self) -> int:
+        return int(self.limit)
+
+    def slot(self) -> RequestSlot:
+        return RequestSlot(self)
+
+    def acquire(self) -> None:
+        with tracer.span("wait concurrency slot", "queue"):
+            with self.condition:
+                while self.in_flight >= self.current_limit:
+                    self.condition.wait()
+                self.in_flight += 1
+
+    def try_acquire(self) -> bool:
+        """Take a slot if one is free, without waiting."""
+        with self.condition:
+            if self.in_flight >= self.current_limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release_unmeasured(self) -> None:
+        """Give back a slot without counting a request, for the duplicates of a hedged request."""
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def release(self, latency: float, output_tokens: Optional[int] = None, prompt_tokens: Optional[int] = None,
+                error: bool = False) -> None:
+        with self.condition:
+            self.in_flight -= 1
+            self.requests += 1
+            self.total_latency += latency
+            self.total_tokens += output_tokens or 0
+            self.total_prompt_tokens += prompt_tokens or 0
+            self.completions_since_decrease += 1
+            if error:
+                self.errors += 1
+                self._decrease("request failed")
+            elif self.policy != "fixed":
+                signal = latency / output_tokens if output_tokens else latency
+                self.recent_signals.append(signal)
+                if self.policy == "aimd":
+                    self._update_aimd(signal)
+                else:
+                    self._update_gradient(signal)
+            self.condition.notify_all()
+
+    def _update_aimd(self, signal: float) -> None:
+        best_signal = min(self.recent_signals)
+        if signal > self.latency_tolerance * best_signal:
+            self._decrease(
+                f"latency {signal / best_signal:.1f}x the best observed")
+            return
+        self.increase_credit += 1 / self.limit
+        if self.increase_credit >= 1:
+            self.increase_credit = 0
+            self._set_limit(self.limit + 1, "healthy latency")
+
+    def _update_gradient(self, signal: float) -> None:
+        if self.long_signal is None:
+            self.long_signal = signal
+        self.long_signal = 0.95 * self.long_signal + 0.05 * signal
+        gradient = max(0.5, min(1.0, self.latency_tolerance *
+                       self.long_signal / max(signal, 1e-9)))
+        target = self.limit * gradient + math.sqrt(self.limit)
+        self._set_limit(0.8 * self.limit + 0.2 * target,
+                        f"latency gradient {gradient:.2f}")
+
+    def _decrease(self, reason: str) -> None:
+        if self.policy == "fixed":
+            return
+        # a single congestion episode fails many in-flight requests at once, decrease once per window
+        if self.completions_since_decrease < self.current_limit:
+            return
+        self.completions_since_decrease = 0
+        self.increase_credit = 0
+        self._set_limit(self.limit * self.backoff, reason)
+
+    def _set_limit(self, new_limit: float, reason: str) -> None:
+        new_limit = min(max(new_limit, self.min_limit), self.max_limit)
+        old_limit = self.current_limit
+        self.limit = new_limit
+        if self.current_limit != old_limit:
+            self.adjustments += 1
+            logger.info(
+                f"Concurrency limit {old_limit} -> {self.current_limit} ({reason})")
+
+    def totals(self) -> Dict[str, float]:
+        """Returns the request, error, latency and token counts of the run so far."""
+        with self.condition:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "latency_seconds": self.total_latency,
+                "prompt_tokens": self.total_prompt_tokens,
+                "output_tokens": self.total_tokens,
+            }
+
+    def summary(self) -> str:
+        with self.condition:
+            if self.requests == 0:
+                return f"Concurrency ({self.policy}): no request sent"
+            return (
+                f"Concurrency ({self.policy}): final limit {self.current_limit} in [{self.min_limit}, {self.max_limit}], "
+                f"{self.adjustments} adjustments, {self.requests} requests, {self.errors} errors, "
+                f"mean latency {self.total_latency / self.requests:.2f}s, "
+                f"{self.total_prompt_tokens / self.requests:.0f} prefilled prompt tokens per request, "
+                f"{self.total_tokens / self.total_latency if self.total_latency > 0 else 0:.1f} tokens/s per request"
+            )
@@ -1,9 +1,64 @@
+import contextvars
+import copy
 import yaml
 import sys
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+
+class ScopedConfig(MutableMapping):
+    """
+    The configuration of the repository being documented.
+
+    It reads and writes the config of the current scope, or the one loaded from config.yml outside of
+    any scope. A batch run documents every repository within the scope of its own copy of the config,
+    so the runners of several repositories, which set their repository path and folders in the config,
+    can run in one process. The scope is per thread: a thread started within a scope doesn't inherit it.
+
+    Args:
+        default (dict): The config loaded from config.yml.
+    """
+
+    def __init__(self, default: dict):
+        self.default = default
+        self.scoped = contextvars.ContextVar("config", default=None)
+
+    def current(self) -> dict:
+        """The config of the current scope."""
+        config = self.scoped.get()
+        return self.default if config is None else config
+
+    def copy(self) -> dict:
+        """A deep copy of the config of the current scope, e.g. to document another repository with it."""
+        return copy.deepcopy(self.current())
+
+    @contextmanager
+    def scope(self, config: dict) -> Iterator[dict]:
+        token = self.scoped.set(config)
+        try:
+            yield config
+        finally:
+            self.scoped.reset(token)
+
+    def __getitem__(self, key: str) -> Any:
+        return self.current()[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.current()[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        del self.current()[key]
+
+    def __iter__(self):
+        return iter(self.current())
+
+    def __len__(self) -> int:
+        return len(self.current())
 
 
 try:
-    CONFIG = yaml.load(open("config.yml", "r"), Loader=yaml.FullLoader)
+    CONFIG = ScopedConfig(yaml.load(open("config.yml", "r"), Loader=yaml.FullLoader))
 except FileNotFoundError:
     print(
         "The file does not exist! Maybe you forgot to create a config.yml file from template"
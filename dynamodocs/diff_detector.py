@@ -34,9 +34,31 @@ class DiffDetector:
             if diff.change_type in ["A", "M"] and diff.a_path.endswith(".py"):
                 is_new_file = diff.change_type == "A"
                 staged_files[diff.a_path] = is_new_file
+            elif diff.change_type == "R" and diff.b_path.endswith(".py"):
+                # a renamed file is a new file at its new path, its old path is deleted
+                staged_files[diff.b_path] = True
 
         return staged_files
 
+    def get_staged_deleted_python_files(self) -> List[str]:
+        """looks the Python files deleted between the current head and the stage changes, the old paths of the renamed files included
+
+        Returns:
+            List[str]
+        """
+        diffs: git.DiffIndex = self.repo.index.diff("HEAD", R=True)
+        return [diff.a_path for diff in diffs
+                if diff.change_type in ["D", "R"] and diff.a_path.endswith(".py")]
+
+    def get_index_python_blobs(self) -> Dict[str, str]:
+        """the git blob id of every Python file of the index, by path. Two of them tell which staged versions changed in between
+
+        Returns:
+            Dict[str, str]
+        """
+        return {path: entry.hexsha for (path, _), entry in self.repo.index.entries.items()
+                if path.endswith(".py")}
+
     def get_file_diff(self, file_path: str, is_new_file: bool) -> List[str]:
         """If the file is new, the get_file_diff method stages that file for commit. It ensures that the 
         newly added file is included in the next commit. On the other hand, if the file is not new (i.e., it has already been committed),
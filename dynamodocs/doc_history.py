@@ -0,0 +1,79 @@
+import hashlib
+import os
+import zlib
+from typing import Iterable
+
+# the older versions of the docs are kept out of project_hierarchy.json, in a folder of the hierarchy
+DOC_HISTORY_FOLDER = "doc_history"
+DIGEST_LENGTH = 32
+
+
+def doc_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:DIGEST_LENGTH]
+
+
+class DocHistoryStore:
+    """
+    A content-addressed store of the older versions of the docs.
+
+    Every text is compressed and stored once under the hash of its content, in a file named after
+    the hash like git objects, so the identical docs of several objects or versions share their blob.
+    The hierarchy only keeps the hashes of the versions of every object.
+
+    Args:
+        folder (str): The folder of the blobs, created on the first write.
+    """
+
+    def __init__(self, folder: str):
+        self.folder = folder
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.folder, digest[:2], digest[2:])
+
+    def put(self, text: str) -> str:
+        """
+        Store a text, unless an identical one is stored already.
+
+        Returns:
+            str: The hash the text is stored under.
+        """
+        digest = doc_digest(text)
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as writer:
+                writer.write(zlib.compress(text.encode("utf-8")))
+            os.replace(temp_path, path)
+        return digest
+
+    def get(self, digest: str) -> str:
+        """Returns the text stored under a hash, raises FileNotFoundError when it was collected."""
+        with open(self.blob_path(digest), "rb") as reader:
+            return zlib.decompress(reader.read()).decode("utf-8")
+
+    def collect_garbage(self, referenced: Iterable[str]) -> int:
+        """
+        Remove the blobs no object refers to anymore.
+
+        Args:
+            referenced (Iterable[str]): The hashes still listed in the hierarchy.
+
+        Returns:
+            int: The number of blobs removed.
+        """
+        if not os.path.isdir(self.folder):
+            return 0
+        referenced = set(referenced)
+        removed = 0
+        for prefix in os.listdir(self.folder):
+            prefix_path = os.path.join(self.folder, prefix)
+            if not os.path.isdir(prefix_path):
+                continue
+            for name in os.listdir(prefix_path):
+                if prefix + name not in referenced:
+                    os.remove(os.path.join(prefix_path, name))
+                    removed += 1
+            if not os.listdir(prefix_path):
+                os.rmdir(prefix_path)
+        return removed
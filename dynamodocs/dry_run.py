@@ -0,0 +1,207 @@
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from prettytable import PrettyTable
+
+from dynamodocs.code_store import CodeUnavailableError
+from dynamodocs.threads import TaskManager
+from dynamodocs.tree_handler import EXPECTED_DOC_TOKENS, PREFILL_SPEEDUP, DocItem
+
+# Every generation run appends its measured throughput to this file of the project hierarchy folder,
+# and the dry run projects the time of the next run from the last recorded runs.
+RUN_STATS_FILE = "run_stats.json"
+MAX_RECORDED_RUNS = 10
+
+
+def load_run_stats(hierarchy_path: str) -> List[Dict[str, Any]]:
+    stats_path = os.path.join(hierarchy_path, RUN_STATS_FILE)
+    if not os.path.exists(stats_path):
+        return []
+    with open(stats_path, "r", encoding="utf-8") as reader:
+        return json.load(reader).get("runs", [])
+
+
+def record_run_stats(hierarchy_path: str, totals: Dict[str, float], wall_seconds: float, task_count: int) -> None:
+    """
+    Append the measurements of a finished generation run to the run stats, keeping the last runs only.
+
+    Args:
+        hierarchy_path (str): The project hierarchy folder.
+        totals (Dict[str, float]): The totals of the concurrency controller.
+        wall_seconds (float): The time the workers took.
+        task_count (int): The number of tasks of the run.
+    """
+    if totals["requests"] == 0:
+        return
+    runs = load_run_stats(hierarchy_path)
+    runs.append({"time": time.strftime("%Y-%m-%d %H:%M:%S"), "tasks": task_count,
+                "wall_seconds": wall_seconds, **totals})
+    os.makedirs(hierarchy_path, exist_ok=True)
+    with open(os.path.join(hierarchy_path, RUN_STATS_FILE), "w", encoding="utf-8") as writer:
+        json.dump({"runs": runs[-MAX_RECORDED_RUNS:]},
+                  writer, indent=2, ensure_ascii=False)
+
+
+@dataclass
+class Throughput:
+    """
+    Throughput measured over earlier runs.
+
+    The time of a request is modeled as proportional to its work, the number of generated tokens plus
+    the prompt tokens divided by PREFILL_SPEEDUP.
+    """
+    runs: int = 0
+    seconds_per_work_token: Optional[float] = None
+    output_tokens_per_request: float = EXPECTED_DOC_TOKENS
+    requests_in_flight: Optional[float] = None
+
+    @staticmethod
+    def from_runs(runs: List[Dict[str, Any]]) -> "Throughput":
+        runs = [run for run in runs if run.get("requests")]
+        if not runs:
+            return Throughput()
+        requests = sum(run["requests"] for run in runs)
+        latency = sum(run["latency_seconds"] for run in runs)
+        output_tokens = sum(run["output_tokens"] for run in runs)
+        prompt_tokens = sum(run["prompt_tokens"] for run in runs)
+        wall_seconds = sum(run["wall_seconds"] for run in runs)
+        output_per_request = output_tokens / requests if output_tokens else EXPECTED_DOC_TOKENS
+        # backends that don't report token counts are measured in requests of the expected size
+        work = requests * output_per_request + prompt_tokens / PREFILL_SPEEDUP
+        return Throughput(
+            runs=len(runs),
+            seconds_per_work_token=latency / work if work > 0 else None,
+            output_tokens_per_request=output_per_request,
+            requests_in_flight=latency / wall_seconds if wall_seconds > 0 else None,
+        )
+
+    def request_seconds(self, prompt_tokens: int, output_tokens: float) -> Optional[float]:
+        if self.seconds_per_work_token is None:
+            return None
+        return self.seconds_per_work_token * (output_tokens + prompt_tokens / PREFILL_SPEEDUP)
+
+
+def plan_tasks(task_manager: TaskManager, chat_engine, throughput: Throughput) -> List[Dict[str, Any]]:
+    """
+    Estimate the prompt tokens, output tokens and time of every planned task.
+
+    The prompts are built like in a real run. The docs of the related objects that this run generates
+    are not written yet, so each of them is counted as the expected output of a request. The objects
+    whose code is not available anymore would fail, they are planned without any token.
+
+    Returns:
+        List[Dict[str, Any]]: One row per task, by task ID.
+    """
+    pending = {id(task.extra_info) for task in task_manager.task_dict.values()}
+    plan = []
+    for task_id, task in sorted(task_manager.task_dict.items()):
+        doc_item: DocItem = task.extra_info
+        try:
+            system_prompt, user_prompt = chat_engine.build_prompt(doc_item)
+            prompt_tokens = chat_engine.num_tokens_from_string(
+                system_prompt) + chat_engine.num_tokens_from_string(user_prompt)
+            prompt_tokens += round(throughput.output_tokens_per_request * sum(
+                1 for item in doc_item.reference_who + doc_item.who_reference_me
+                if id(item) in pending and not item.md_content))
+            output_tokens = round(throughput.output_tokens_per_request)
+            code_unavailable = False
+        except CodeUnavailableError:
+            # its request would fail before being sent
+            prompt_tokens, output_tokens, code_unavailable = 0, 0, True
+        plan.append({
+            "task_id": task_id,
+            "reason": doc_item.item_status.name,
+            "path": doc_item.get_full_name(strict=True),
+            "file": doc_item.get_file_name(),
+            "dependencies": [dependency.task_id for dependency in task.dependencies],
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "seconds": throughput.request_seconds(prompt_tokens, output_tokens),
+            "code_unavailable": code_unavailable,
+        })
+    return plan
+
+
+def projected_wall_seconds(task_manager: TaskManager, plan: List[Dict[str, Any]], throughput: Throughput,
+                           workers: int) -> Optional[float]:
+    """
+    Project the wall time of the plan: the longest chain of dependent tasks, or the total time spread
+    over the requests measured in flight (at most `workers`), whichever is longer.
+    """
+    if throughput.seconds_per_work_token is None or not plan:
+        return None
+    for row in plan:
+        task_manager.task_dict[row["task_id"]].cost = row["seconds"]
+    task_manager.prioritize()
+    critical_path = max(
+        task.priority for task in task_manager.task_dict.values())
+    parallelism = min(throughput.requests_in_flight or workers, workers)
+    return max(critical_path, sum(row["seconds"] for row in plan) / max(parallelism, 1e-9))
+
+
+def format_seconds(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "n/a"
+    if seconds < 120:
+        return f"{seconds:.1f}s"
+    if seconds < 2 * 3600:
+        return f"{seconds / 60:.1f}min"
+    return f"{seconds / 3600:.1f}h"
+
+
+def breakdown_table(plan: List[Dict[str, Any]], key: str, title: str) -> PrettyTable:
+    groups: Dict[str, Dict[str, Any]] = {}
+    for row in plan:
+        group = groups.setdefault(
+            row[key], {"tasks": 0, "prompt_tokens": 0, "output_tokens": 0, "seconds": 0.0})
+        group["tasks"] += 1
+        group["prompt_tokens"] += row["prompt_tokens"]
+        group["output_tokens"] += row["output_tokens"]
+        group["seconds"] = None if row["seconds"] is None or group["seconds"] is None \
+            else group["seconds"] + row["seconds"]
+    table = PrettyTable(
+        [title, "tasks", "prompt tokens", "output tokens", "LLM time"])
+    for name, group in sorted(groups.items(), key=lambda entry: -entry[1]["prompt_tokens"]):
+        table.add_row([name, group["tasks"], group["prompt_tokens"],
+                      group["output_tokens"], format_seconds(group["seconds"])])
+    return table
+
+
+def print_plan(task_manager: TaskManager, plan: List[Dict[str, Any]], throughput: Throughput, workers: int,
+               fast_path_count: int = 0) -> None:
+    """Print the planned tasks, the breakdowns by file and by reason, and the projected totals."""
+    task_table = PrettyTable(["task_id", "Doc Generation Reason", "Path", "dependency",
+                              "prompt tokens", "output tokens", "LLM time"])
+    for row in plan:
+        dependency_str = ",".join(str(task_id)
+                                  for task_id in row["dependencies"]) or "None"
+        if len(dependency_str) > 20:
+            dependency_str = dependency_str[:8] + "..." + dependency_str[-8:]
+        reason = "code_unavailable" if row["code_unavailable"] else row["reason"]
+        task_table.add_row([row["task_id"], reason, row["path"], dependency_str,
+                            row["prompt_tokens"], row["output_tokens"], format_seconds(row["seconds"])])
+    print(task_table)
+    print(breakdown_table(plan, "file", "File"))
+    print(breakdown_table(plan, "reason", "Doc Generation Reason"))
+
+    prompt_tokens = sum(row["prompt_tokens"] for row in plan)
+    output_tokens = sum(row["output_tokens"] for row in plan)
+    unavailable = [row["path"] for row in plan if row["code_unavailable"]]
+    print(f"Dry run: {len(plan) - len(unavailable)} LLM calls planned, {prompt_tokens} prompt tokens, "
+          f"{output_tokens} estimated output tokens, {fast_path_count} objects documented by the fast path")
+    if unavailable:
+        print(f"{len(unavailable)} objects would fail, their code is not available anymore: "
+              + ", ".join(unavailable[:5]) + (" ..." if len(unavailable) > 5 else ""))
+    if throughput.seconds_per_work_token is None:
+        print("No earlier run recorded its throughput, the LLM time can't be projected yet")
+        return
+    llm_seconds = sum(row["seconds"] for row in plan)
+    wall_seconds = projected_wall_seconds(
+        task_manager, plan, throughput, workers)
+    print(f"Projected LLM time {format_seconds(llm_seconds)}, wall time {format_seconds(wall_seconds)} "
+          f"(throughput measured over the last {throughput.runs} runs: "
+          f"{1 / throughput.seconds_per_work_token:.1f} work tokens/s per request, "
+          f"{min(throughput.requests_in_flight or workers, workers):.1f} requests in flight)")
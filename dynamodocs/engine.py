@@ -1,14 +1,22 @@
 import os
+import re
 import tiktoken
 import time
 import traceback
 from collections import defaultdict
-from ollama import Client, ResponseError, RequestError, ChatResponse
+from typing import List, Optional
+from ollama import ResponseError, RequestError, ChatResponse
 
 from dynamodocs.mylogger import logger
+from dynamodocs.backends import LLMBackend, build_backend, is_host_failure
+from dynamodocs.concurrency import ConcurrencyController
+from dynamodocs.hedging import RequestHedger
+from dynamodocs.retry import CircuitBreaker, CircuitOpenError, backoff_delay
+from dynamodocs.tracing import tracer
 # from dynamodocs.prompt import SYSTEM_PROMPT, USER_PROMPT
-from dynamodocs.tree_handler import DocItem
+from dynamodocs.tree_handler import DocItem, DocItemType
 from dynamodocs.file_handler import FileHandler
+from dynamodocs.code_store import CodeUnavailableError
 
 
 class ContextLengthExceededError(Exception):
@@ -16,6 +24,11 @@ class ContextLengthExceededError(Exception):
     pass
 
 
+class GenerationFailedError(Exception):
+    """Exception raised when every attempt to generate a doc failed, the object is left undocumented."""
+    pass
+
+
 def build_path_tree(who_reference_me, reference_who, doc_item_path):
     def tree():
         return defaultdict(tree)
@@ -48,15 +61,108 @@ def build_path_tree(who_reference_me, reference_who, doc_item_path):
     return tree_to_string(path_tree)
 
 
+# the documents of a batch come back between <<<DOC k>>> and <<<END k>>> lines
+BATCH_DOC_PATTERN = re.compile(r"<<<DOC (\d+)>>>\s*(.*?)\s*<<<END \1>>>", re.DOTALL)
+
+
+def parse_batch_response(content: str, item_count: int) -> Optional[List[str]]:
+    """
+    Split the response of a batched request into the documents of its objects.
+
+    Args:
+        content (str): The response text.
+        item_count (int): The number of objects of the batch.
+
+    Returns:
+        Optional[List[str]]: The documents in object order, None when one of them is missing or empty.
+    """
+    docs = {}
+    for match in BATCH_DOC_PATTERN.finditer(content):
+        docs.setdefault(int(match.group(1)), match.group(2))
+    if any(not docs.get(k) for k in range(1, item_count + 1)):
+        return None
+    return [docs[k] for k in range(1, item_count + 1)]
+
+
+def get_referenced_prompt(doc_item: DocItem) -> str:
+    if len(doc_item.reference_who) == 0:
+        return ""
+    prompt = [
+        """As you can see, the code calls the following objects, their code and docs are as following:"""
+    ]
+    for k, reference_item in enumerate(doc_item.reference_who):
+        instance_prompt = (
+            f"""obj: {reference_item.get_full_name()}\nDocument: \n{
+                reference_item.md_content[-1] if len(reference_item.md_content) > 0 else 'None'}\n"""
+            # + f"""Raw code:```\n{
+            #     reference_item.content['code_content'] if 'code_content' in reference_item.content.keys() else ''}\n```"""
+            + "=" * 10
+        )
+        prompt.append(instance_prompt)
+    return "\n".join(prompt)
+
+
+def get_referencer_prompt(doc_item: DocItem) -> str:
+    if len(doc_item.who_reference_me) == 0:
+        return ""
+    prompt = [
+        """Also, the code has been called by the following objects, their code and docs are as following:"""
+    ]
+    for k, referencer_item in enumerate(doc_item.who_reference_me):
+        instance_prompt = (
+            f"""obj: {referencer_item.get_full_name()}\nDocument: \n{
+                referencer_item.md_content[-1] if len(referencer_item.md_content) > 0 else 'None'}\n"""
+            # + f"""Raw code:```\n{referencer_item.content['code_content']
+            #                      if 'code_content' in referencer_item.content.keys() else 'None'}\n```"""
+            + "=" * 10
+        )
+        prompt.append(instance_prompt)
+    return "\n".join(prompt)
+
+
 class ChatEngine:
     """
     ChatEngine is used to generate the doc of functions or classes.
+
+    The requests are sent through a pluggable LLMBackend, built from the config when none is given.
+    The number of requests in flight at once is limited by a ConcurrencyController, and the slowest
+    requests can be hedged by a RequestHedger.
+    Profiles providing batch prompts can document several sibling objects in a single request.
+
+    With the "prefix_stable" prompt layout, the system prompt only holds what is shared by all the
+    objects of a file (instructions, project structure around the file, outline of the file), and the
+    per-object material comes last in the user prompt. Consecutive requests for a file then start with
+    the same bytes, and the server can reuse the KV cache of that prefix instead of prefilling it again.
     """
 
-    def __init__(self, CONFIG, SYSTEM_PROMPT, USER_PROMPT):
+    def __init__(self, CONFIG, SYSTEM_PROMPT, USER_PROMPT, backend: Optional[LLMBackend] = None,
+                 concurrency: Optional[ConcurrencyController] = None,
+                 BATCH_SYSTEM_PROMPT: Optional[str] = None, BATCH_USER_PROMPT: Optional[str] = None,
+                 PREFIX_STABLE_SYSTEM_PROMPT: Optional[str] = None, PREFIX_STABLE_USER_PROMPT: Optional[str] = None):
         self.config = CONFIG
         self.system_prompt = SYSTEM_PROMPT
         self.user_prompt = USER_PROMPT
+        self.batch_system_prompt = BATCH_SYSTEM_PROMPT
+        self.batch_user_prompt = BATCH_USER_PROMPT
+        self.prefix_stable_system_prompt = PREFIX_STABLE_SYSTEM_PROMPT
+        self.prefix_stable_user_prompt = PREFIX_STABLE_USER_PROMPT
+        self.prompt_layout = CONFIG.get("prompt_layout") or "default"
+        if self.prompt_layout == "prefix_stable" and (PREFIX_STABLE_SYSTEM_PROMPT is None or PREFIX_STABLE_USER_PROMPT is None):
+            logger.warning(
+                "The prompt profile has no prefix-stable prompts, using the default prompt layout")
+            self.prompt_layout = "default"
+        self.backend = backend if backend is not None else build_backend(CONFIG)
+        self.concurrency = concurrency if concurrency is not None else ConcurrencyController.from_config(
+            CONFIG)
+        self.circuit_breaker = CircuitBreaker.from_config(CONFIG)
+        self.hedger = RequestHedger.from_config(CONFIG, self.concurrency)
+
+    def record_failure(self, error: Exception) -> None:
+        """Report a failed request to the circuit breaker, the requests rejected for their content prove the backend answers."""
+        if is_host_failure(error):
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success()
 
     def num_tokens_from_string(self, string: str, encoding_name="cl100k_base") -> int:
         """Returns the number of tokens in a text string."""
@@ -64,13 +170,56 @@ class ChatEngine:
         num_tokens = len(encoding.encode(string))
         return num_tokens
 
-    def generate_doc(self, doc_item: DocItem, file_handler: FileHandler):
+    def build_file_context(self, doc_item: DocItem) -> tuple[str, str]:
+        """
+        Build the parts of a prefix-stable prompt shared by all the objects of the file of an item.
+
+        Args:
+            doc_item (DocItem): An item of the file.
+
+        Returns:
+            tuple[str, str]: The project structure around the file, and the outline of the file.
+        """
+        file_item = doc_item
+        while file_item.parent is not None and file_item.item_type != DocItemType._file:
+            file_item = file_item.parent
+        file_objects = file_item.get_preorder_traversal()[1:]
+        project_structure = build_path_tree(
+            sorted({name for item in file_objects for name in item.who_reference_me_name_list}),
+            sorted({name for item in file_objects for name in item.reference_who_name_list}),
+            file_item.get_full_name(),
+        )
+
+        outline = []
+
+        def walk(item: DocItem, indent: int):
+            for child in item.children.values():
+                code_type_tell = "Class" if child.content.get(
+                    "type") == "ClassDef" else "Function"
+                outline.append("    " * indent +
+                               f"{code_type_tell} {child.item_name}")
+                walk(child, indent + 1)
+
+        walk(file_item, 0)
+        return project_structure, "\n".join(outline)
+
+    @tracer.traced("prompt building", "prompt")
+    def build_prompt(self, doc_item: DocItem) -> tuple[str, str]:
+        """
+        Build the system and user prompts used to document the given item.
+
+        Args:
+            doc_item (DocItem): The item to document.
+
+        Returns:
+            tuple[str, str]: The system prompt and the user prompt.
+        """
         code_info = doc_item.content
         referenced = len(doc_item.who_reference_me) > 0
 
         code_type = code_info["type"]
         code_name = code_info["name"]
-        code_content = code_info["code_content"]
+        code_content = doc_item.get_code()
         have_return = code_info["have_return"]
         who_reference_me = doc_item.who_reference_me_name_list
         reference_who = doc_item.reference_who_name_list
@@ -81,40 +230,6 @@ class ChatEngine:
             who_reference_me, reference_who, doc_item_path
         )
 
-        def get_referenced_prompt(doc_item: DocItem) -> str:
-            if len(doc_item.reference_who) == 0:
-                return ""
-            prompt = [
-                """As you can see, the code calls the following objects, their code and docs are as following:"""
-            ]
-            for k, reference_item in enumerate(doc_item.reference_who):
-                instance_prompt = (
-                    f"""obj: {reference_item.get_full_name()}\nDocument: \n{
-                        reference_item.md_content[-1] if len(reference_item.md_content) > 0 else 'None'}\n"""
-                    # + f"""Raw code:```\n{
-                    #     reference_item.content['code_content'] if 'code_content' in reference_item.content.keys() else ''}\n```"""
-                    + "=" * 10
-                )
-                prompt.append(instance_prompt)
-            return "\n".join(prompt)
-
-        def get_referencer_prompt(doc_item: DocItem) -> str:
-            if len(doc_item.who_reference_me) == 0:
-                return ""
-            prompt = [
-                """Also, the code has been called by the following objects, their code and docs are as following:"""
-            ]
-            for k, referencer_item in enumerate(doc_item.who_reference_me):
-                instance_prompt = (
-                    f"""obj: {referencer_item.get_full_name()}\nDocument: \n{
-                        referencer_item.md_content[-1] if len(referencer_item.md_content) > 0 else 'None'}\n"""
-                    # + f"""Raw code:```\n{referencer_item.content['code_content']
-                    #                      if 'code_content' in referencer_item.content.keys() else 'None'}\n```"""
-                    + "=" * 10
-                )
-                prompt.append(instance_prompt)
-            return "\n".join(prompt)
-
         def get_relationship_description(referencer_content, reference_letter):
             if referencer_content and reference_letter:
                 has_relationship = "And please include the reference relationship with its callers and callees in the project from a functional perspective"
@@ -125,9 +240,6 @@ class ChatEngine:
             else:
                 return ""\
 
-        max_tokens = self.config.get("max_document_tokens", 1024) or 1024
-        max_attempts = 2  # Set the maximum number of attempts
-
         code_type_tell = "Class" if code_type == "ClassDef" else "Function"
         parameters_or_attribute = (
             "attributes" if code_type == "ClassDef" else "parameters"
@@ -148,6 +260,27 @@ class ChatEngine:
         has_relationship = get_relationship_description(
             referencer_content, reference_letter)
 
+        if self.prompt_layout == "prefix_stable":
+            file_structure, file_outline = self.build_file_context(doc_item)
+            prompt_args = dict(
+                project_structure_prefix=", and the related hierarchical structure of this project is as follows (The current file is marked with an *):",
+                project_structure=file_structure,
+                file_path=doc_item.get_file_name(),
+                file_outline=file_outline,
+                code_type_tell=code_type_tell,
+                code_name=code_name,
+                code_content=code_content,
+                reference_letter=reference_letter,
+                referencer_content=referencer_content,
+                combine_ref_situation=combine_ref_situation,
+                language="English",
+                parameters_or_attribute=parameters_or_attribute,
+                has_relationship=has_relationship,
+                have_return_tell=have_return_tell,
+            )
+            return (self.prefix_stable_system_prompt.format(**prompt_args),
+                    self.prefix_stable_user_prompt.format(**prompt_args))
+
         project_structure_prefix = ", and the related hierarchical structure of this project is as follows (The current object is marked with an *):"
 
         system_prompt = self.system_prompt.format(
@@ -181,6 +314,114 @@ class ChatEngine:
             has_relationship=has_relationship,
             have_return_tell=have_return_tell,
         )
+        return system_prompt, user_prompt
+
+    @property
+    def supports_batches(self) -> bool:
+        return self.batch_system_prompt is not None and self.batch_user_prompt is not None
+
+    @tracer.traced("prompt building", "prompt")
+    def build_batch_prompt(self, doc_items: List[DocItem]) -> tuple[str, str]:
+        """
+        Build the system and user prompts used to document several siblings in one request.
+
+        Args:
+            doc_items (List[DocItem]): The items to document, children of the same parent.
+
+        Returns:
+            tuple[str, str]: The system prompt and the user prompt.
+        """
+        parent = doc_items[0].parent
+        project_structure = build_path_tree(
+            [name for item in doc_items for name in item.who_reference_me_name_list],
+            [name for item in doc_items for name in item.reference_who_name_list],
+            parent.get_full_name(),
+        )
+        objects = []
+        for k, doc_item in enumerate(doc_items, start=1):
+            code_info = doc_item.content
+            code_type_tell = "Class" if code_info["type"] == "ClassDef" else "Function"
+            objects.append(
+                f"""<<<OBJECT {k}>>> {code_type_tell} "{code_info['name']}"\n"""
+                f"""The content of the code is as follows:\n{doc_item.get_code()}\n"""
+                f"""{get_referenced_prompt(doc_item)}\n{get_referencer_prompt(doc_item)}"""
+            )
+
+        prompt_args = dict(
+            project_structure_prefix=", and the related hierarchical structure of this project is as follows (The parent of the objects is marked with an *):",
+            project_structure=project_structure,
+            file_path=doc_items[0].get_file_name(),
+            parent_name=parent.item_name,
+            item_count=len(doc_items),
+            objects="\n".join(objects),
+            language="English",
+        )
+        return self.batch_system_prompt.format(**prompt_args), self.batch_user_prompt.format(**prompt_args)
+
+    def generate_batch_doc(self, doc_items: List[DocItem]) -> Optional[List[str]]:
+        """
+        Document several sibling items with a single request.
+
+        Failures are not retried, the caller is expected to fall back to one request per item.
+
+        Args:
+            doc_items (List[DocItem]): The items to document, children of the same parent.
+
+        Returns:
+            Optional[List[str]]: The document of every item, None when the code of an item is not
+            available, the request failed or its response could not be split.
+        """
+        parent_name = doc_items[0].parent.get_full_name()
+        try:
+            system_prompt, user_prompt = self.build_batch_prompt(doc_items)
+        except CodeUnavailableError as e:
+            logger.warning(f"Batch not sent for the children of {parent_name}: {e}")
+            return None
+
+        # used for debugging purposes only
+        if (self.config["debug"]):
+            with open(
+                    os.path.join(
+                        self.config["repo_path"],
+                        "AI_requests.txt"
+                    ), "a") as f:
+                f.write("\n\n\n ========newwwwwwww========\n\n\n")
+                f.write(system_prompt)
+                f.write(user_prompt)
+
+        logger.info(
+            f"Total tokens ({self.num_tokens_from_string(system_prompt) + self.num_tokens_from_string(user_prompt)}) for a batch of {len(doc_items)} objects.")
+
+        try:
+            self.circuit_breaker.before_request()
+            with self.concurrency.slot() as slot:
+                with tracer.span("llm call", "llm", item=parent_name, batch_size=len(doc_items)):
+                    response: ChatResponse = self.backend.chat(messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt},
+                    ])
+                slot.output_tokens = response.get("eval_count")
+                slot.prompt_tokens = response.get("prompt_eval_count")
+            self.circuit_breaker.record_success()
+        except Exception as e:
+            logger.warning(
+                f"Batch request failed for {len(doc_items)} children of {parent_name}: {e}")
+            self.record_failure(e)
+            return None
+
+        contents = parse_batch_response(
+            response["message"]["content"], len(doc_items))
+        if contents is None:
+            logger.warning(
+                f"Could not split the batch response for {len(doc_items)} children of {parent_name}")
+        return contents
+
+    def generate_doc(self, doc_item: DocItem, file_handler: FileHandler):
+        max_tokens = self.config.get("max_document_tokens", 1024) or 1024
+        retry_config = self.config.get("retry") or {}
+        max_attempts = retry_config.get("max_attempts") or 4
+
+        system_prompt, user_prompt = self.build_prompt(doc_item)
 
         # used for debugging purposes only
         if (self.config["debug"]):
@@ -206,58 +447,53 @@ class ChatEngine:
                 f"Total tokens ({total_tokens})."
             )
 
-        try:
-            client = Client(host=self.config["ollama_host"], timeout=60*60)
-        # TODO : check if the connection is successful with the Ollama server
-        # Make a check connection function for this as below would not work
-        except Exception as e:
-            logger.error(f"Failed to connect to Ollama: {e}")
-            return {
-                "content": f"{doc_item.get_full_name()} - [{doc_item.item_type}] : \ndocumentation to be generated"
-            }
-
-        attempt = 0
-        while attempt < max_attempts:
+        for attempt in range(max_attempts):
             try:
-                response: ChatResponse = client.chat(model=self.config["ollama_model"], messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                    stream=False, keep_alive="60m")
-
-                print(response)
-
-                if response['message'] is None:
-                    attempt += 1
-                    continue
+                self.circuit_breaker.before_request()
+                with self.concurrency.slot() as slot:
+                    with tracer.span("llm call", "llm", item=doc_item.get_full_name()):
+                        response: ChatResponse = self.hedger.chat(self.backend, messages=[
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": user_prompt},
+                        ])
+                    slot.output_tokens = response.get("eval_count")
+                    slot.prompt_tokens = response.get("prompt_eval_count")
+                self.circuit_breaker.record_success()
+
+                if response['message'] is not None:
+                    return response['message']
+                logger.warning(
+                    f"Empty response for {doc_item.get_full_name()}. Attempt {attempt + 1} of {max_attempts}")
 
-                return response['message']
+            except CircuitOpenError as e:
+                # nothing was sent, a later attempt may be the probe that finds the backend back
+                logger.warning(
+                    f"Not sending {doc_item.get_full_name()}: {e}. Attempt {attempt + 1} of {max_attempts}")
 
             except RequestError as e:
                 logger.warning(
                     f"Request error:{e.error} {doc_item.get_full_name()}. Attempt {attempt + 1} of {max_attempts}")
-                time.sleep(3)
-                attempt += 1
+                self.record_failure(e)
 
             except ResponseError as e:
                 logger.warning(
                     f"Response error:{e.error} {doc_item.get_full_name()}. Attempt {attempt + 1} of {max_attempts}")
-                time.sleep(3)
-                attempt += 1
+                self.record_failure(e)
 
             except Exception as e:
                 logger.warning(
                     f"An error occurred.{e} {doc_item.get_full_name()} Attempt {attempt + 1} of {max_attempts}")
                 logger.warning(traceback.format_exc())
-                time.sleep(3)
-                attempt += 1
+                self.record_failure(e)
 
-        else:
-            logger.error(
-                f"Failed to generate documentation for {doc_item.get_full_name()}.")
-            return {
-                "content": f"{doc_item.get_full_name()} - [{doc_item.item_type}] : \ndocumentation to be generated"
-            }
+            if attempt + 1 < max_attempts:
+                time.sleep(backoff_delay(
+                    attempt, retry_config.get("base_delay", 1.0), retry_config.get("max_delay") or 60.0))
+
+        logger.error(
+            f"Failed to generate documentation for {doc_item.get_full_name()}.")
+        raise GenerationFailedError(
+            f"{doc_item.get_full_name()} failed after {attempt + 1} attempts")
         # while attempt < max_attempts:
 
         #     try:
@@ -0,0 +1,201 @@
+import ast
+from typing import Any, Callable, Dict, List, Optional
+
+# Rules recognizing trivial objects on their AST node. A rule returns the fields of its template
+# when the node matches, None otherwise. The first matching rule wins.
+
+
+def get_docstring(node: ast.AST) -> str:
+    return ast.get_docstring(node) or ""
+
+
+def body_without_docstring(node: ast.AST) -> List[ast.stmt]:
+    body = node.body
+    if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+            and isinstance(body[0].value.value, str):
+        body = body[1:]
+    return body
+
+
+def get_params(node: ast.AST) -> List[str]:
+    return [arg.arg for arg in node.args.args] if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) else []
+
+
+def self_attribute(expr: ast.AST, self_name: str) -> Optional[str]:
+    """Returns `attr` when the expression is `self.attr`."""
+    if isinstance(expr, ast.Attribute) and isinstance(expr.value, ast.Name) and expr.value.id == self_name:
+        return expr.attr
+    return None
+
+
+def is_property(node: ast.AST) -> bool:
+    for decorator in getattr(node, "decorator_list", []):
+        if isinstance(decorator, ast.Name) and decorator.id in ["property", "cached_property"]:
+            return True
+        if isinstance(decorator, ast.Attribute) and decorator.attr in ["setter", "deleter", "cached_property"]:
+            return True
+    return False
+
+
+def match_stub(node: ast.AST) -> Optional[Dict[str, Any]]:
+    """Functions and classes whose body only holds `pass` or `...`."""
+    for statement in body_without_docstring(node):
+        if isinstance(statement, ast.Pass):
+            continue
+        if isinstance(statement, ast.Expr) and isinstance(statement.value, ast.Constant) \
+                and statement.value.value is Ellipsis:
+            continue
+        return None
+    return {}
+
+
+def match_getter(node: ast.AST) -> Optional[Dict[str, Any]]:
+    """Methods taking only `self` and returning one of its attributes."""
+    params = get_params(node)
+    body = body_without_docstring(node)
+    if len(params) != 1 or len(body) != 1 or is_property(node) or not isinstance(body[0], ast.Return):
+        return None
+    attribute = self_attribute(body[0].value, params[0])
+    return {"attribute": attribute} if attribute is not None else None
+
+
+def match_setter(node: ast.AST) -> Optional[Dict[str, Any]]:
+    """Methods taking `self` and a value, and assigning the value to one of its attributes."""
+    params = get_params(node)
+    body = body_without_docstring(node)
+    if len(params) != 2 or len(body) != 1 or is_property(node) or not isinstance(body[0], ast.Assign):
+        return None
+    assignment = body[0]
+    if len(assignment.targets) != 1 or not isinstance(assignment.value, ast.Name) \
+            or assignment.value.id != params[1]:
+        return None
+    attribute = self_attribute(assignment.targets[0], params[0])
+    return {"attribute": attribute, "value": params[1]} if attribute is not None else None
+
+
+def match_property(node: ast.AST) -> Optional[Dict[str, Any]]:
+    """Properties and property setters wrapping a single attribute."""
+    if not is_property(node):
+        return None
+    params = get_params(node)
+    body = body_without_docstring(node)
+    if len(params) == 0 or len(body) != 1:
+        return None
+    if isinstance(body[0], ast.Return):
+        attribute = self_attribute(body[0].value, params[0])
+        return {"attribute": attribute, "access": "returns"} if attribute is not None else None
+    if isinstance(body[0], ast.Assign) and len(params) == 2 and len(body[0].targets) == 1 \
+            and isinstance(body[0].value, ast.Name) and body[0].value.id == params[1]:
+        attribute = self_attribute(body[0].targets[0], params[0])
+        return {"attribute": attribute, "access": "sets"} if attribute is not None else None
+    return None
+
+
+def match_init_assign(node: ast.AST) -> Optional[Dict[str, Any]]:
+    """`__init__` methods that only store their arguments or constants as attributes."""
+    if node.name != "__init__":
+        return None
+    params = get_params(node)
+    body = body_without_docstring(node)
+    if len(params) == 0 or len(body) == 0:
+        return None
+    assignments = []
+    for statement in body:
+        if isinstance(statement, ast.Assign) and len(statement.targets) == 1:
+            target, value = statement.targets[0], statement.value
+        elif isinstance(statement, ast.AnnAssign) and statement.value is not None:
+            target, value = statement.target, statement.value
+        else:
+            return None
+        attribute = self_attribute(target, params[0])
+        if attribute is None:
+            return None
+        if isinstance(value, ast.Name) and value.id in params[1:]:
+            assignments.append([attribute, value.id])
+        elif isinstance(value, ast.Constant):
+            assignments.append([attribute, repr(value.value)])
+        else:
+            return None
+    return {"assignments": assignments}
+
+
+FAST_PATH_RULES: Dict[str, Callable[[ast.AST], Optional[Dict[str, Any]]]] = {
+    "stub": match_stub,
+    "getter": match_getter,
+    "setter": match_setter,
+    "property": match_property,
+    "init_assign": match_init_assign,
+}
+
+FAST_PATH_TEMPLATES: Dict[str, str] = {
+    "stub": """**{name}**: The function of {name} is to serve as a placeholder, its body is empty.
+**{parameters_or_attribute}**:{params}
+**Code Description**: {docstring}{name} does not contain any logic yet.
+**Note**: {name} is a stub, meant to be implemented or overridden.""",
+    "getter": """**{name}**: The function of {name} is to return the `{attribute}` attribute of the object.
+**parameters**: This method takes no parameters besides the instance.
+**Code Description**: {docstring}{name} returns `self.{attribute}` without modifying the object.
+**Note**: The returned value is the attribute itself, not a copy.""",
+    "setter": """**{name}**: The function of {name} is to set the `{attribute}` attribute of the object.
+**parameters**:
+· {value}: The new value of `{attribute}`.
+**Code Description**: {docstring}{name} assigns `{value}` to `self.{attribute}` and returns None.
+**Note**: The value is stored as is, without validation.""",
+    "property": """**{name}**: The function of {name} is to expose the `{attribute}` attribute of the object as a property.
+**parameters**: This property takes no parameters besides the instance.
+**Code Description**: {docstring}The property {access} `self.{attribute}` directly.
+**Note**: No computation or validation is performed.""",
+    "init_assign": """**{name}**: The function of {name} is to initialize the attributes of the object.
+**parameters**:{params}
+**Code Description**: {docstring}The constructor only stores its arguments and default values:
+{assignments}
+**Note**: No validation or computation is performed during initialization.""",
+}
+
+
+def match_fast_path(node: ast.AST) -> Optional[Dict[str, Any]]:
+    """
+    Run the fast-path rules on the AST node of a function or class.
+
+    Args:
+        node (ast.AST): A FunctionDef, AsyncFunctionDef or ClassDef node.
+
+    Returns:
+        Optional[Dict[str, Any]]: The name of the matching rule under "rule", its template fields and
+        the docstring of the object, None when no rule matches.
+    """
+    for rule_name, rule in FAST_PATH_RULES.items():
+        if isinstance(node, ast.ClassDef) and rule_name != "stub":
+            continue
+        fields = rule(node)
+        if fields is not None:
+            return {"rule": rule_name, "docstring": get_docstring(node), **fields}
+    return None
+
+
+def render_fast_path_doc(name: str, code_type: str, params: List[str], match: Dict[str, Any],
+                         templates: Optional[Dict[str, str]] = None) -> str:
+    """
+    Fill the template of the matched rule.
+
+    Args:
+        name (str): The name of the object.
+        code_type (str): ClassDef or FunctionDef.
+        params (List[str]): The parameters of the object.
+        match (Dict[str, Any]): The match returned by `match_fast_path`.
+        templates (Dict[str, str], optional): Templates overriding the default ones, by rule name.
+
+    Returns:
+        str: The documentation of the object.
+    """
+    template = (templates or {}).get(
+        match["rule"]) or FAST_PATH_TEMPLATES[match["rule"]]
+    fields = dict(match)
+    explicit_params = [param for param in params if param not in ["self", "cls"]]
+    fields["params"] = ("\n" + "\n".join(f"· {param}" for param in explicit_params)
+                        if explicit_params else " None.")
+    fields["parameters_or_attribute"] = "attributes" if code_type == "ClassDef" else "parameters"
+    fields["docstring"] = f"{match['docstring']}\n" if match.get("docstring") else ""
+    fields["assignments"] = "\n".join(
+        f"· self.{attribute} = {value}" for attribute, value in match.get("assignments", []))
+    return template.format(name=name, **{key: value for key, value in fields.items() if key != "name"})
@@ -2,6 +2,7 @@ import os
 import json
 import git
 import ast
+import copy
 from tqdm import tqdm
 from colorama import Fore, Style
 from typing import List, Dict, Optional, Any
@@ -10,7 +11,23 @@ from typing import List, Dict, Optional, Any
 from dynamodocs.config import CONFIG
 from dynamodocs.mylogger import logger
 from dynamodocs.utils.gitignore_checker import GitignoreChecker
+from dynamodocs.utils.path_filter import get_path_filter
 from dynamodocs.utils.meta_info_utils import latest_verison_substring
+from dynamodocs.tracing import tracer
+from dynamodocs.fast_path import match_fast_path
+from dynamodocs.fingerprint import code_fingerprint
+from dynamodocs.code_store import code_hash, decode_lines, git_blob_id
+
+# structures of the parsed files by absolute path, with the (mtime, size) they were parsed at. A
+# process documenting the repository several times, like the watch mode, only parses the changed files.
+STRUCTURE_CACHE: Dict[str, tuple] = {}
+
+
+def parse_error_message(error: Exception) -> str:
+    """The error of a file that can't be parsed, without the `<unknown>` file name the logger would take for a color tag."""
+    if isinstance(error, SyntaxError):
+        return f"{error.msg}, line {error.lineno}"
+    return str(error).replace("<", "\\<")
 
 
 class FileHandler:
@@ -50,10 +67,14 @@ class FileHandler:
         with open(abs_file_path, "w", encoding="utf-8") as file:
             file.write(content)
 
-    def get_obj_code_info(self, code_type, code_name, start_line, end_line, params, file_path: Optional[str] = None) -> Dict[str, Any]:
+    def get_obj_code_info(self, code_type, code_name, start_line, end_line, params, file_path: Optional[str] = None,
+                          lines: Optional[List[str]] = None, file_blob: Optional[str] = None) -> Dict[str, Any]:
         """
         Get the code information for a given object.
 
+        The code itself is not kept, only the hash of the code and the git blob id of the file, the
+        code is sliced from the file when needed (see code_store.py).
+
         Args:
             code_type (str): The type of the code.
             code_name (str): The name of the code.
@@ -61,6 +82,8 @@ class FileHandler:
             end_line (int): The ending line number of the code.
             parent (str): The parent of the code.
             file_path (str, optional): The file path. Defaults to None.
+            lines (List[str], optional): The lines of the file, read from the file when not given.
+            file_blob (str, optional): The git blob id of the file, given with its lines.
 
         Returns:
             dict: A dictionary containing the code information.
@@ -74,24 +97,29 @@ class FileHandler:
         code_info['code_end_line'] = end_line
         code_info['params'] = params
 
-        with open(
-            os.path.join(
-                self.repo_path, file_path if file_path != None else self.file_path
-            ),
-            "r",
-            encoding="utf-8",
-        ) as code_file:
-            lines = code_file.readlines()
-            code_content = "".join(lines[start_line - 1: end_line])
-            name_column = lines[start_line - 1].find(code_name)
-            if "return" in code_content:
-                have_return = True
-            else:
-                have_return = False
-
-            code_info["have_return"] = have_return
-            code_info["code_content"] = code_content
-            code_info["name_column"] = name_column
+        if lines is None:
+            with open(
+                os.path.join(
+                    self.repo_path, file_path if file_path != None else self.file_path
+                ),
+                "rb",
+            ) as code_file:
+                data = code_file.read()
+            lines = decode_lines(data)
+            file_blob = git_blob_id(data)
+
+        code_content = "".join(lines[start_line - 1: end_line])
+        name_column = lines[start_line - 1].find(code_name)
+        if "return" in code_content:
+            have_return = True
+        else:
+            have_return = False
+
+        code_info["have_return"] = have_return
+        code_info["code_hash"] = code_hash(code_content)
+        code_info["code_size"] = len(code_content)
+        code_info["file_blob"] = file_blob
+        code_info["name_column"] = name_column
 
         return code_info
 
@@ -169,20 +197,30 @@ class FileHandler:
             A list of tuples containing the type of the node (FunctionDef, ClassDef, AsyncFunctionDef),
             the name of the node, the starting line number, the ending line number, the name of the parent node, and a list of parameters (if any).
         """
+        return [self.get_node_structure(node) for node in self.get_object_nodes(code_content)]
+
+    def get_object_nodes(self, code_content) -> List[ast.AST]:
+        """
+        Parses the code and returns the AST nodes of all its functions and classes, in `ast.walk` order.
+
+        Args:
+            code_content: The code content of the whole file to be parsed.
+
+        Returns:
+            A list of FunctionDef, ClassDef and AsyncFunctionDef nodes.
+        """
         tree = ast.parse(code_content)
         self.add_parent_references(tree)
-        functions_and_classes = []
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.ClassDef, ast.AsyncFunctionDef)):
-                start_line = node.lineno
-                end_line = self.get_end_lineno(node)
-                parameters = [arg.arg for arg in node.args.args] if 'args' in dir(node) else [
-                ]
-                functions_and_classes.append(
-                    (type(node).__name__, node.name,
-                     start_line, end_line, parameters)
-                )
-        return functions_and_classes
+        return [node for node in ast.walk(tree)
+                if isinstance(node, (ast.FunctionDef, ast.ClassDef, ast.AsyncFunctionDef))]
+
+    def get_node_structure(self, node) -> tuple:
+        """Returns the (type, name, start line, end line, parameters) tuple of a function or class node."""
+        start_line = node.lineno
+        end_line = self.get_end_lineno(node)
+        parameters = [arg.arg for arg in node.args.args] if 'args' in dir(node) else [
+        ]
+        return (type(node).__name__, node.name, start_line, end_line, parameters)
 
     def generate_file_structure(self, file_path):
         """
@@ -212,18 +250,50 @@ class FileHandler:
             }
         }
         """
-        with open(os.path.join(self.repo_path, file_path), "r", encoding="utf-8") as f:
-            content = f.read()
-            structures = self.get_functions_and_classes(content)
-            file_objects = []
-            for struct in structures:
-                structure_type, name, start_line, end_line, params = struct
-                code_info = self.get_obj_code_info(
-                    structure_type, name, start_line, end_line, params, file_path)
-                file_objects.append(code_info)
-
+        abs_file_path = os.path.join(self.repo_path, file_path)
+        stat = os.stat(abs_file_path)
+        cached = STRUCTURE_CACHE.get(abs_file_path)
+        if cached is not None and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            # the caller owns the returned structure, it is completed with the docs later
+            return copy.deepcopy(cached[1])
+
+        change_detection = CONFIG.get("change_detection") or {}
+        use_fingerprint = change_detection.get("fingerprint", "ast") == "ast"
+        ignore_docstrings = change_detection.get("ignore_docstrings", False)
+        with open(abs_file_path, "rb") as f:
+            data = f.read()
+        lines = decode_lines(data)
+        file_blob = git_blob_id(data)
+        file_objects = []
+        for node in self.get_object_nodes("".join(lines)):
+            structure_type, name, start_line, end_line, params = self.get_node_structure(
+                node)
+            code_info = self.get_obj_code_info(
+                structure_type, name, start_line, end_line, params, file_path, lines, file_blob)
+            if use_fingerprint:
+                # compared instead of the raw code to detect changes, see fingerprint.py
+                code_info["code_fingerprint"] = code_fingerprint(
+                    node, ignore_docstrings)
+            # trivial objects can be documented from a template, see fast_path.py
+            fast_path = match_fast_path(node)
+            if fast_path is not None:
+                code_info["fast_path"] = fast_path
+            file_objects.append(code_info)
+
+        STRUCTURE_CACHE[abs_file_path] = (
+            (stat.st_mtime_ns, stat.st_size), copy.deepcopy(file_objects))
         return file_objects
 
+    def list_structure_files(self, jump_files: List[str]) -> List[str]:
+        """The files generate_overall_structure parses, relative to the repository."""
+        gitignore_checker = GitignoreChecker(
+            directory=self.repo_path,
+            gitignore_path=os.path.join(self.repo_path, ".gitignore"),
+        )
+        return [file_path for file_path in gitignore_checker.check_files_and_folders(path_filter=get_path_filter(CONFIG))
+                if file_path not in jump_files and not file_path.endswith(latest_verison_substring)]
+
+    @tracer.traced("structure extraction")
     def generate_overall_structure(self, file_path_reflections: Dict[str, str], jump_files: List[str]) -> dict:
         repo_structure = {}
         gitignore_checker = GitignoreChecker(
@@ -231,7 +301,9 @@ class FileHandler:
             gitignore_path=os.path.join(self.repo_path, ".gitignore"),
         )
 
-        bar = tqdm(gitignore_checker.check_files_and_folders())
+        # the excluded parts of the repository are not even walked
+        bar = tqdm(gitignore_checker.check_files_and_folders(
+            path_filter=get_path_filter(CONFIG)))
         for not_ignored_files in bar:
             normal_file_names = not_ignored_files
             if not_ignored_files in jump_files:
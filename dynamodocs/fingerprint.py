@@ -0,0 +1,70 @@
+import ast
+import copy
+import hashlib
+from typing import Optional
+
+from dynamodocs.code_store import code_hash
+
+# Fingerprints identify the code of an object by its normalized AST instead of its raw text, so
+# reformatting, comments and whitespace don't change them. They are prefixed by their variant:
+# fingerprints computed with different settings are never compared.
+
+AST_VARIANT = "ast"
+AST_NO_DOCSTRING_VARIANT = "ast-nodoc"
+
+
+def strip_docstrings(node: ast.AST) -> ast.AST:
+    """Removes the docstrings of the node and of all the functions and classes it contains, in place."""
+    for child in ast.walk(node):
+        if not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Module)):
+            continue
+        body = child.body
+        if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+                and isinstance(body[0].value.value, str):
+            # keep the body valid when it only holds the docstring
+            child.body = body[1:] or [ast.Pass()]
+    return node
+
+
+def code_fingerprint(node: ast.AST, ignore_docstrings: bool = False) -> str:
+    """
+    Compute the fingerprint of a function or class from its AST.
+
+    The AST is dumped without positions, which drops everything the parser ignores: formatting,
+    comments, blank lines and trailing whitespace.
+
+    Args:
+        node (ast.AST): A FunctionDef, AsyncFunctionDef or ClassDef node.
+        ignore_docstrings (bool): Whether docstring edits leave the fingerprint unchanged.
+
+    Returns:
+        str: The variant and the hex digest, separated by a colon.
+    """
+    variant = AST_VARIANT
+    if ignore_docstrings:
+        node = strip_docstrings(copy.deepcopy(node))
+        variant = AST_NO_DOCSTRING_VARIANT
+    dump = ast.dump(node, annotate_fields=False, include_attributes=False)
+    return f"{variant}:{hashlib.sha256(dump.encode('utf-8')).hexdigest()}"
+
+
+def content_code_hash(content: dict) -> Optional[str]:
+    """The hash of the raw code of an object, computed from its code in metainfo written before code hashes."""
+    if "code_hash" in content:
+        return content["code_hash"]
+    return code_hash(content["code_content"]) if "code_content" in content else None
+
+
+def same_code(older_content: dict, newer_content: dict) -> bool:
+    """
+    Tell whether the code of an object is unchanged between two versions of its content.
+
+    The fingerprints are compared when both versions have one of the same variant, the hashes of
+    the raw code otherwise (metainfo written before fingerprints existed, or a changed setting).
+    """
+    older_fingerprint = older_content.get("code_fingerprint")
+    newer_fingerprint = newer_content.get("code_fingerprint")
+    if older_fingerprint and newer_fingerprint \
+            and older_fingerprint.split(":", 1)[0] == newer_fingerprint.split(":", 1)[0]:
+        return older_fingerprint == newer_fingerprint
+    return content_code_hash(older_content) == content_code_hash(newer_content)
@@ -0,0 +1,176 @@
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from dynamodocs.backends import LLMBackend
+from dynamodocs.concurrency import ConcurrencyController
+
+
+class RequestHedger:
+    """
+    Sends a second copy of the requests that take longer than usual, and keeps the first answer.
+
+    A request still running after the `percentile` of the recent latencies is duplicated, on another
+    host when there are several. The first successful answer wins and the other request is cancelled.
+    A hedge needs a free concurrency slot, and the hedges are capped to `max_extra_load` times the
+    requests sent, so a slow backend is not flooded with duplicates.
+
+    Args:
+        concurrency (ConcurrencyController): The controller the hedges take their slot from.
+        enabled (bool, optional): Hedge the requests, otherwise they are sent as they are.
+        percentile (float, optional): The percentile of the recent latencies after which a request is hedged.
+        min_samples (int, optional): Latencies observed before any hedge, the percentile is noise before.
+        min_delay (float, optional): The shortest wait before a hedge, in seconds.
+        max_extra_load (float, optional): The most hedges per request sent.
+        window (int, optional): Number of recent latencies the percentile is taken from.
+    """
+
+    def __init__(self, concurrency: ConcurrencyController, enabled: bool = False, percentile: float = 95,
+                 min_samples: int = 20, min_delay: float = 1.0, max_extra_load: float = 0.05, window: int = 200):
+        self.concurrency = concurrency
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_extra_load = max_extra_load
+        self.latencies = deque(maxlen=window)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.skipped = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def from_config(config: Dict[str, Any], concurrency: ConcurrencyController) -> "RequestHedger":
+        hedging_config = config.get("hedging") or {}
+        return RequestHedger(
+            concurrency,
+            enabled=bool(hedging_config.get("enabled")),
+            percentile=hedging_config.get("percentile") or 95,
+            min_samples=hedging_config.get("min_samples") or 20,
+            min_delay=hedging_config.get("min_delay", 1.0),
+            max_extra_load=hedging_config.get("max_extra_load", 0.05),
+        )
+
+    def hedge_delay(self) -> Optional[float]:
+        """The time after which a request is hedged, None while too few latencies were observed."""
+        with self.lock:
+            if len(self.latencies) < self.min_samples:
+                return None
+            latencies = sorted(self.latencies)
+        rank = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))
+        return max(latencies[rank], self.min_delay)
+
+    def expected_remaining(self, elapsed: float) -> float:
+        """
+        The mean time a request still running after `elapsed` seconds would have taken to finish,
+        estimated from the recent latencies, 0 when none was that long.
+        """
+        with self.lock:
+            longer = [latency for latency in self.latencies if latency > elapsed]
+        if not longer:
+            return 0.0
+        return sum(longer) / len(longer) - elapsed
+
+    def take_hedge(self) -> bool:
+        """Count a hedge if the extra load allows it and a concurrency slot is free."""
+        with self.lock:
+            if self.hedges + 1 > self.max_extra_load * self.requests:
+                self.skipped += 1
+                return False
+            if not self.concurrency.try_acquire():
+                self.skipped += 1
+                return False
+            self.hedges += 1
+            return True
+
+    def chat(self, backend: LLMBackend, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Send a request through the backend, hedged when it is slow.
+
+        The caller holds the concurrency slot of the first request, the hedge takes its own.
+
+        Args:
+            backend (LLMBackend): The backend to send the request to.
+            messages (List[Dict[str, str]]): The chat messages of the request.
+
+        Returns:
+            Dict[str, Any]: The first successful response.
+        """
+        with self.lock:
+            self.requests += 1
+        delay = self.hedge_delay() if self.enabled else None
+        if delay is None:
+            start = time.perf_counter()
+            response = backend.chat(messages)
+            self.record_latency(time.perf_counter() - start)
+            return response
+
+        outcomes = queue.Queue()
+        cancel_events = [threading.Event(), threading.Event()]
+        start = time.perf_counter()
+
+        def send(attempt: int):
+            attempt_start = time.perf_counter()
+            try:
+                response = backend.chat_cancellable(
+                    messages, cancel_events[attempt], hedge=attempt == 1)
+            except Exception as e:
+                outcomes.put((attempt, None, e, time.perf_counter() - attempt_start))
+                return
+            outcomes.put((attempt, response, None, time.perf_counter() - attempt_start))
+
+        threading.Thread(target=send, args=(0,), name="request", daemon=True).start()
+        try:
+            outcome = outcomes.get(timeout=delay)
+            pending = 0
+        except queue.Empty:
+            if not self.take_hedge():
+                outcome = outcomes.get()
+                pending = 0
+            else:
+                threading.Thread(target=self.send_hedge, args=(send,),
+                                 name="hedge", daemon=True).start()
+                outcome = outcomes.get()
+                pending = 1
+                if outcome[2] is not None:
+                    # the first one to finish failed, the other one may still succeed
+                    outcome = outcomes.get()
+                    pending = 0
+
+        attempt, response, error, latency = outcome
+        if pending:
+            cancel_events[1 - attempt].set()
+        if error is not None:
+            raise error
+        self.record_latency(latency)
+        if attempt == 1:
+            # the first request was still running, it would have taken as long as the recent ones that did
+            saved = self.expected_remaining(time.perf_counter() - start)
+            with self.lock:
+                self.hedge_wins += 1
+                self.saved_seconds += saved
+        return response
+
+    def send_hedge(self, send) -> None:
+        """Send the hedge, then give its concurrency slot back."""
+        try:
+            send(1)
+        finally:
+            self.concurrency.release_unmeasured()
+
+    def record_latency(self, latency: float) -> None:
+        with self.lock:
+            self.latencies.append(latency)
+
+    def summary(self) -> Optional[str]:
+        if not self.enabled:
+            return None
+        with self.lock:
+            return (f"Hedging: {self.hedges} hedged requests out of {self.requests} "
+                    f"({self.hedges / self.requests if self.requests else 0:.1%} extra load), "
+                    f"{self.hedge_wins} answered first by the hedge, {self.skipped} hedges skipped over the budget or without a free slot, "
+                    f"about {self.saved_seconds:.1f}s of request time saved")
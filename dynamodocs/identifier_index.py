@@ -0,0 +1,125 @@
+import ast
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Set, Tuple
+
+from dynamodocs.mylogger import logger
+from dynamodocs.static_references import module_name_of, resolve_import
+
+# every word that may be an identifier, strings and comments included: an over-approximation of the
+# names jedi may report, it only makes the filter search more than needed
+IDENTIFIER_PATTERN = re.compile(r"[^\W\d]\w*")
+
+# the searches an object needs: none when its name appears nowhere but at its definition, only its
+# own file when no other file may reference it, its own file and the other candidate files otherwise
+SEARCH_NONE = "none"
+SEARCH_FILE = "file"
+SEARCH_PROJECT = "project"
+
+
+class IdentifierIndex:
+    """
+    The files every identifier appears in, and the reverse import graph of the files.
+
+    A reference to an object is an occurrence of its name, so the files the name doesn't appear in
+    never have to be searched. A module-level function or class is moreover only referenced by name
+    from the files importing its module, directly or through other modules: the other files are not
+    candidates either.
+
+    Args:
+        repo_path (str): The repository.
+        file_paths (List[str]): The Python files of the hierarchy, relative to the repository.
+    """
+
+    def __init__(self, repo_path: str, file_paths: List[str]):
+        self.occurrences: Dict[str, Dict[str, int]] = {}
+        module_files = {module_name_of(file_path)[0]: file_path for file_path in file_paths}
+        self.importers: Dict[str, Set[str]] = {file_path: set() for file_path in file_paths}
+        self.reaching_cache: Dict[str, Set[str]] = {}
+        # jedi may still find references in the files that can't be read, they are candidates of every search
+        self.unreadable: Set[str] = set()
+        self.counts = Counter()
+
+        for file_path in file_paths:
+            try:
+                with open(os.path.join(repo_path, file_path), "r", encoding="utf-8") as reader:
+                    text = reader.read()
+            except (OSError, ValueError) as e:
+                logger.warning(f"Identifier index: can't read {file_path}: {e}")
+                self.unreadable.add(file_path)
+                continue
+            for name, count in Counter(IDENTIFIER_PATTERN.findall(text)).items():
+                self.occurrences.setdefault(name, {})[file_path] = count
+            try:
+                imported = self.imported_modules(file_path, ast.parse(text))
+            except SyntaxError:
+                # the imports are unknown, the file may reference any module
+                imported = set(module_files)
+            for module_name in imported:
+                if module_name in module_files and module_files[module_name] != file_path:
+                    self.importers[module_files[module_name]].add(file_path)
+
+    @staticmethod
+    def imported_modules(file_path: str, tree: ast.Module) -> Set[str]:
+        """The modules a file imports, with their parent packages, whose `__init__` is run too."""
+        name, is_package = module_name_of(file_path)
+        imported = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom):
+                base = resolve_import(node.module, node.level, name, is_package)
+                # `from package import module` imports a module too
+                names = [base] + [f"{base}.{alias.name}" if base else alias.name for alias in node.names]
+            else:
+                continue
+            for imported_name in names:
+                parts = imported_name.split(".")
+                imported.update(".".join(parts[:end]) for end in range(1, len(parts) + 1))
+        return imported
+
+    def reaching(self, file_path: str) -> Set[str]:
+        """The files importing a file, directly or through other files."""
+        reaching = self.reaching_cache.get(file_path)
+        if reaching is None:
+            reaching = set()
+            pending = [file_path]
+            while pending:
+                for importer in self.importers.get(pending.pop(), ()):
+                    if importer not in reaching:
+                        reaching.add(importer)
+                        pending.append(importer)
+            self.reaching_cache[file_path] = reaching
+        return reaching
+
+    def search_scope(self, name: str, file_path: str, module_level: bool) -> Tuple[str, List[str]]:
+        """
+        The search the references to an object need, and the other files it is narrowed to.
+
+        Args:
+            name (str): The name of the object.
+            file_path (str): Its file, relative to the repository.
+            module_level (bool): Whether it is defined at the top level of its module.
+
+        Returns:
+            Tuple[str, List[str]]: SEARCH_NONE, SEARCH_FILE or SEARCH_PROJECT, and the other files that may
+            reference the object, sorted, only given with SEARCH_PROJECT.
+        """
+        files = self.occurrences.get(name, {})
+        other_files = set(files) - {file_path}
+        if module_level:
+            other_files &= self.reaching(file_path)
+        other_files |= self.unreadable - {file_path}
+        if other_files:
+            scope = SEARCH_PROJECT
+        elif files.get(file_path, 0) > 1:
+            scope = SEARCH_FILE
+        else:
+            scope = SEARCH_NONE
+        self.counts[scope] += 1
+        return scope, sorted(other_files)
+
+    def summary(self) -> str:
+        return (f"Reference pre-filter: {self.counts[SEARCH_NONE]} searches skipped, "
+                f"{self.counts[SEARCH_FILE]} narrowed to their own file, {self.counts[SEARCH_PROJECT]} on the candidate files")
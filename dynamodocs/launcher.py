@@ -7,7 +7,7 @@ import git
 import itertools
 import shutil
 from tqdm import tqdm
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from functools import partial
 import subprocess
 import shutil
@@ -17,15 +17,30 @@ import time
 import importlib
 
 from dynamodocs.file_handler import FileHandler
+from dynamodocs.code_store import CodeUnavailableError
+from dynamodocs.fast_path import FAST_PATH_RULES
+from dynamodocs.dry_run import Throughput, load_run_stats, plan_tasks, print_plan, record_run_stats
+from dynamodocs.watcher import PollingWatcher
+from dynamodocs.search_index import SearchIndex, heading_anchor
 from dynamodocs.utils.meta_info_utils import latest_verison_substring, make_fake_files, delete_fake_files
+from dynamodocs.utils.gitignore_checker import GitignoreChecker
+from dynamodocs.utils.path_filter import get_path_filter
 from dynamodocs.diff_detector import DiffDetector
 from dynamodocs.project_manager import ProjectManager
 from dynamodocs.engine import ChatEngine
+from dynamodocs.backends import LLMBackend
+from dynamodocs.concurrency import ConcurrencyController
 from dynamodocs.tree_handler import MetaInfo, DocItem, DocItemStatus
+from dynamodocs.shared_structure import SharedStructureStore
 from dynamodocs.mylogger import logger
 from dynamodocs.config import CONFIG
-from dynamodocs.threads import worker
+from dynamodocs.threads import worker, GenerationQueue, TaskManager, Task
+from dynamodocs.tracing import tracer
 
+# the folders of the config, every runner suffixes them with its profile, several runners of
+# different profiles may run in one process
+HIERARCHY_FOLDER = CONFIG["project_hierarchy"]
+MARKDOWN_DOCS_FOLDER = CONFIG["Markdown_Docs_folder"]
 
 def load_whitelist():
     if CONFIG["whitelist_path"] != None:
@@ -40,12 +55,52 @@ def load_whitelist():
         return None
 
 
+def build_chat_engine(profile: str, backend: Optional[LLMBackend] = None,
+                      concurrency: Optional[ConcurrencyController] = None) -> ChatEngine:
+    """
+    The chat engine of a prompt profile.
+
+    Args:
+        profile (str): The profile, a key of `profile_list`.
+        backend (LLMBackend, optional): The backend to send the requests to, built from the config when None.
+        concurrency (ConcurrencyController, optional): The limit of the requests in flight, built from the config when None.
+
+    Returns:
+        ChatEngine: The engine. It reads the config of the current scope, so the runners of a batch
+        run can share it.
+    """
+    prompt_module = importlib.import_module(
+        f"dynamodocs.prompts.{CONFIG['profile_list'][profile]}")
+    SYSTEM_PROMPT = prompt_module.SYSTEM_PROMPT
+    USER_PROMPT = prompt_module.USER_PROMPT
+
+    return ChatEngine(
+        CONFIG=CONFIG, SYSTEM_PROMPT=SYSTEM_PROMPT, USER_PROMPT=USER_PROMPT, backend=backend, concurrency=concurrency,
+        BATCH_SYSTEM_PROMPT=getattr(
+            prompt_module, "BATCH_SYSTEM_PROMPT", None),
+        BATCH_USER_PROMPT=getattr(prompt_module, "BATCH_USER_PROMPT", None),
+        PREFIX_STABLE_SYSTEM_PROMPT=getattr(
+            prompt_module, "PREFIX_STABLE_SYSTEM_PROMPT", None),
+        PREFIX_STABLE_USER_PROMPT=getattr(prompt_module, "PREFIX_STABLE_USER_PROMPT", None), )
+
+
 class Runner:
-    def __init__(self, clear: bool = False, profile: str = "dev", repo_path: str = None):
+    def __init__(self, clear: bool = False, profile: str = "dev", repo_path: str = None, dry_run: bool = False,
+                 paths: Optional[List[str]] = None, chat_engine: Optional[ChatEngine] = None,
+                 generation_queue: Optional[GenerationQueue] = None):
+        # the config of the current scope, the tasks of a batch run are handled in it
+        self.config = CONFIG.current()
         if repo_path is not None:
             CONFIG["repo_path"] = repo_path
-        CONFIG["project_hierarchy"] = CONFIG["project_hierarchy"] + "_" + profile
-        CONFIG["Markdown_Docs_folder"] = CONFIG["Markdown_Docs_folder"] + "_" + profile
+        if paths:
+            # the run is narrowed to these paths, the rest of the metainfo is kept as it is
+            CONFIG["paths"] = {**(CONFIG.get("paths") or {}), "scope": paths}
+        CONFIG["project_hierarchy"] = HIERARCHY_FOLDER + "_" + profile
+        CONFIG["Markdown_Docs_folder"] = MARKDOWN_DOCS_FOLDER + "_" + profile
+        # the structure and references of the repository are parsed once for all the profiles, a dry
+        # run reuses them but doesn't save any
+        self.shared_structure = SharedStructureStore.from_config(
+            CONFIG, CONFIG["repo_path"], HIERARCHY_FOLDER, read_only=dry_run)
 
         self.project_manager = ProjectManager(
             repo_path=CONFIG["repo_path"], project_hierarchy=CONFIG["project_hierarchy"]
@@ -54,15 +109,20 @@ class Runner:
         self.diff_detector = DiffDetector(repo_path=CONFIG["repo_path"])
         print(self.diff_detector.repo_path)
 
-        prompt_module = importlib.import_module(
-            f"dynamodocs.prompts.{CONFIG['profile_list'][profile]}")
-        SYSTEM_PROMPT = prompt_module.SYSTEM_PROMPT
-        USER_PROMPT = prompt_module.USER_PROMPT
-
-        self.chat_engine = ChatEngine(
-            CONFIG=CONFIG, SYSTEM_PROMPT=SYSTEM_PROMPT, USER_PROMPT=USER_PROMPT, )
-
-        if (clear):
+        self.chat_engine = chat_engine if chat_engine is not None else build_chat_engine(profile)
+        # the shared queue of a batch run generates the docs instead of the threads of the runner
+        self.generation_queue = generation_queue
+        self.batching = CONFIG.get("batching") or {}
+        if self.batching.get("enabled") and not self.chat_engine.supports_batches:
+            logger.warning(
+                f"The {profile} profile has no batch prompts, batching is disabled")
+            self.batching = {}
+        # the concurrency controller decides how many of the workers may send a request at once
+        self.thread_count = max(
+            CONFIG["max_thread_count"], self.chat_engine.concurrency.max_limit)
+
+        # a dry run only plans the generation, it leaves the hierarchy and the docs untouched
+        if (clear and not dry_run):
             if os.path.exists(
                 os.path.join(CONFIG["repo_path"],
                              CONFIG["project_hierarchy"])
@@ -83,24 +143,35 @@ class Runner:
         ):
             file_path_reflections, jump_files = make_fake_files()
             self.meta_info = MetaInfo.init_meta_info(
-                file_path_reflections, jump_files)
-            self.meta_info.checkpoint(
-                target_dir_path=os.path.join(
-                    CONFIG["repo_path"], CONFIG["project_hierarchy"]
+                file_path_reflections, jump_files, self.shared_structure)
+            if not dry_run:
+                self.meta_info.checkpoint(
+                    target_dir_path=os.path.join(
+                        CONFIG["repo_path"], CONFIG["project_hierarchy"]
+                    )
                 )
-            )
         else:
             self.meta_info = MetaInfo.from_checkpoint_path(
                 os.path.join(CONFIG["repo_path"], CONFIG["project_hierarchy"])
             )
 
         self.meta_info.white_list = load_whitelist()
-        self.meta_info.checkpoint(
-            target_dir_path=os.path.join(
-                CONFIG["repo_path"], CONFIG["project_hierarchy"]
+        if not dry_run:
+            self.meta_info.checkpoint(
+                target_dir_path=os.path.join(
+                    CONFIG["repo_path"], CONFIG["project_hierarchy"]
+                )
             )
-        )
         self.runner_lock = threading.Lock()
+        # the objects whose generation failed in the current round of the workers
+        self.failed_items: List[DocItem] = []
+        self.fast_path_counts: Dict[str, int] = {}
+        # the totals of the concurrency controller already recorded, a watching runner runs many times
+        self.recorded_totals: Dict[str, float] = {}
+        # document the working tree as it is instead of the staged version of the files
+        self.document_unstaged = False
+        # add the hierarchy and the docs to the git index after a run
+        self.stage_docs = True
 
     def get_all_pys(self, directory):
         """
@@ -149,17 +220,159 @@ class Runner:
         except Exception as e:
             logger.info(f"Failed to generate document after multiple attempts, skipping: {
                         doc_item.get_full_name()}")
-            logger.info("Error:", e)
-            doc_item.item_status = DocItemStatus.doc_has_not_been_generated
+            logger.info(f"Error: {e}")
+            # the object keeps its status, it is queued again once the other tasks are done
+            self.failed_items.append(doc_item)
+
+    def generate_docs_for_a_batch(self, doc_items: List[DocItem]):
+        """
+        Generate the docs of sibling items with a single request, falling back to one request per
+        item when the batch fails or its response cannot be split.
+        """
+        ignore_list = CONFIG.get("ignore_list", [])
+        doc_items = [doc_item for doc_item in doc_items
+                     if DocItem.need_to_generate(doc_item, ignore_list)]
+        if len(doc_items) < 2:
+            for doc_item in doc_items:
+                self.generate_doc_for_a_single_item(doc_item)
+            return
+
+        print(f" -- Generating a batch of {len(doc_items)} documents {Fore.LIGHTYELLOW_EX}{
+            doc_items[0].parent.get_full_name()}{Style.RESET_ALL}")
+        contents = self.chat_engine.generate_batch_doc(doc_items)
+        if contents is None:
+            logger.info(
+                f"Falling back to one request per item for {len(doc_items)} items")
+            for doc_item in doc_items:
+                self.generate_doc_for_a_single_item(doc_item)
+            return
+
+        for doc_item, content in zip(doc_items, contents):
+            doc_item.md_content.append(content)
+            doc_item.item_status = DocItemStatus.doc_upto_date
+            print(
+                f" -- Document successfully appended: {doc_item.get_full_name()}")
+        self.meta_info.checkpoint(
+            target_dir_path=os.path.join(
+                CONFIG["repo_path"], CONFIG["project_hierarchy"]
+            )
+        )
+
+    def collect_batch(self, task_manager: TaskManager, task: Task) -> List[Task]:
+        """
+        Claim the ready siblings of a small item that fit in the batch token budget.
+
+        Only the items whose code has at most `batching.max_item_tokens` tokens are batched, and the
+        code of a whole batch stays within `batching.token_budget` tokens.
+        """
+        max_item_tokens = self.batching.get("max_item_tokens") or 200
+        budget = self.batching.get("token_budget") or 1500
+
+        def code_tokens(doc_item: DocItem) -> Optional[int]:
+            try:
+                return self.chat_engine.num_tokens_from_string(doc_item.get_code())
+            except CodeUnavailableError:
+                # not batched, the request of the item alone fails and it is queued again
+                return None
+
+        first_tokens = code_tokens(task.extra_info)
+        if first_tokens is None or first_tokens > max_item_tokens:
+            return []
+        budget -= first_tokens
+
+        def accept(doc_item: DocItem) -> bool:
+            nonlocal budget
+            tokens = code_tokens(doc_item)
+            if tokens is None or tokens > max_item_tokens or tokens > budget:
+                return False
+            budget -= tokens
+            return True
+
+        return task_manager.claim_group(task, accept, (self.batching.get("max_items") or 8) - 1)
+
+    def run_workers(self, task_manager: TaskManager):
+        """
+        Run the tasks with the worker threads.
+
+        The objects whose generation failed are not written, they keep their status. Once the queue is
+        empty they are queued again, up to `retry.requeue_rounds` times, so a backend restart during
+        the run doesn't leave them undocumented. The ones still failing are retried by the next run.
+        """
+        requeue_rounds = (CONFIG.get("retry") or {}).get("requeue_rounds", 2)
+        ignore_list = CONFIG.get("ignore_list", [])
+        self.failed_items = []
+        for round_number in range(requeue_rounds + 1):
+            # every round gives a backend that was given up on another chance
+            self.chat_engine.circuit_breaker.start_run()
+            if self.generation_queue is not None:
+                self.generation_queue.run(task_manager, *self.worker_handlers(),
+                                          context=partial(CONFIG.scope, self.config))
+            else:
+                threads = [
+                    threading.Thread(
+                        target=worker,
+                        args=(task_manager, process_id,
+                              *self.worker_handlers()),
+                    )
+                    for process_id in range(self.thread_count)
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+            failed_items, self.failed_items = self.failed_items, []
+            if not failed_items or round_number == requeue_rounds:
+                break
+            logger.info(
+                f"Queuing again {len(failed_items)} objects whose generation failed ({round_number + 1}/{requeue_rounds})")
+            failed_ids = {id(item) for item in failed_items}
+            for item in self.meta_info.target_repo_hierarchical_tree.get_preorder_traversal():
+                item.multithread_task_id = -1
+            sync_func = task_manager.sync_func
+            task_manager = self.meta_info.get_task_manager(
+                self.meta_info.target_repo_hierarchical_tree,
+                task_available_func=lambda item: id(item) in failed_ids and DocItem.need_to_generate(item, ignore_list))
+            task_manager.sync_func = sync_func
+
+        if failed_items:
+            logger.warning(
+                f"{len(failed_items)} objects could not be documented, the next run will try them again: "
+                + ", ".join(item.get_full_name() for item in failed_items[:5])
+                + (" ..." if len(failed_items) > 5 else ""))
+
+    def worker_handlers(self) -> tuple:
+        """Returns the handler and the batch function given to the workers."""
+        if self.batching.get("enabled"):
+            return self.generate_docs_for_a_batch, self.collect_batch
+        return self.generate_doc_for_a_single_item, None
+
+    def apply_fast_path(self, ignore_list: List[str]):
+        """Document the trivial objects from templates when the fast path is enabled, and count them."""
+        fast_path = CONFIG.get("fast_path") or {}
+        if not fast_path.get("enabled"):
+            return
+        counts = self.meta_info.apply_fast_path(
+            rules=fast_path.get("rules") or list(FAST_PATH_RULES),
+            ignore_list=ignore_list,
+            templates=fast_path.get("templates"),
+        )
+        for rule, count in counts.items():
+            self.fast_path_counts[rule] = self.fast_path_counts.get(
+                rule, 0) + count
 
     def first_generate(self):
         logger.info("Starting to generate documentation")
         ignore_list = CONFIG.get("ignore_list", [])
+        self.apply_fast_path(ignore_list)
         check_task_available_func = partial(
             DocItem.need_to_generate, ignore_list=ignore_list)
-        task_manager = self.meta_info.get_topology(
-            check_task_available_func
-        )
+        task_manager = self.load_task_graph(check_task_available_func)
+        if task_manager is None:
+            task_manager = self.meta_info.get_topology(
+                check_task_available_func
+            )
+            self.save_task_graph(task_manager)
         # topology_list = [item for item in topology_list if DocItem.need_to_generate(item, ignore_list)]
         before_task_len = len(task_manager.task_dict)
 
@@ -172,21 +385,10 @@ class Runner:
 
         try:
             task_manager.sync_func = self.markdown_refresh
-            threads = [
-                threading.Thread(
-                    target=worker,
-                    args=(
-                        task_manager,
-                        process_id,
-                        self.generate_doc_for_a_single_item,
-                    ),
-                )
-                for process_id in range(CONFIG["max_thread_count"])
-            ]
-            for thread in threads:
-                thread.start()
-            for thread in threads:
-                thread.join()
+            generation_start = time.perf_counter()
+            self.run_workers(task_manager)
+            self.record_run_stats(
+                time.perf_counter() - generation_start, before_task_len)
 
             self.meta_info.document_version = (
                 self.diff_detector.repo.head.commit.hexsha
@@ -201,11 +403,12 @@ class Runner:
                 f"Successfully generated {
                     before_task_len - len(task_manager.task_dict)} documents"
             )
+            self.log_generation_summary()
 
             self.markdown_refresh()
             delete_fake_files()
 
-            logger.info(f"Successfully wrote markdown documents")
+            logger.info("Successfully wrote markdown documents")
 
         except BaseException as e:
             logger.info(
@@ -213,15 +416,128 @@ class Runner:
                     before_task_len - len(task_manager.task_dict)} docs are generated at this time"
             )
 
-    def markdown_refresh(self):
-        with self.runner_lock:
+    def load_task_graph(self, task_available_func) -> Optional[TaskManager]:
+        """The remaining tasks of the interrupted generation, from its saved task graph when it can be reused."""
+        if not self.meta_info.in_generation_process:
+            return None
+        task_manager = self.meta_info.load_task_graph(
+            os.path.join(CONFIG["repo_path"], CONFIG["project_hierarchy"]), task_available_func)
+        if task_manager is not None:
+            logger.info(
+                f"Resuming the saved task graph, {len(task_manager.task_dict)} tasks left")
+        return task_manager
+
+    def save_task_graph(self, task_manager: TaskManager):
+        self.meta_info.save_task_graph(
+            task_manager, os.path.join(CONFIG["repo_path"], CONFIG["project_hierarchy"]))
+
+    def log_generation_summary(self):
+        """
+        Log how many objects skipped the LLM, how the generation requests were throttled and,
+        for several hosts, how they were spread.
+        """
+        if self.fast_path_counts:
+            logger.info(
+                f"Fast path: {sum(self.fast_path_counts.values())} LLM calls avoided ({
+                    ', '.join(f'{rule}: {count}' for rule, count in sorted(self.fast_path_counts.items()))})")
+        logger.info(self.chat_engine.concurrency.summary())
+        if self.shared_structure is not None and self.shared_structure.hits + self.shared_structure.misses > 0:
+            logger.info(self.shared_structure.summary())
+        breaker_summary = self.chat_engine.circuit_breaker.summary()
+        if breaker_summary is not None:
+            logger.info(breaker_summary)
+        hedging_summary = self.chat_engine.hedger.summary()
+        if hedging_summary is not None:
+            logger.info(hedging_summary)
+        backend_report = self.chat_engine.backend.report()
+        if backend_report is not None:
+            logger.info(backend_report)
+
+    def record_run_stats(self, wall_seconds: float, task_count: int):
+        """Record the throughput of the run, the dry run projects the time of the next runs from it."""
+        if self.generation_queue is not None:
+            # the concurrency controller of a batch run counts the requests of all the repositories
+            return
+        totals = self.chat_engine.concurrency.totals()
+        record_run_stats(
+            os.path.join(CONFIG["repo_path"], CONFIG["project_hierarchy"]),
+            {key: value - self.recorded_totals.get(key, 0)
+             for key, value in totals.items()},
+            wall_seconds, task_count)
+        self.recorded_totals = totals
+
+    def dry_run(self):
+        """
+        Plan the generation without running it.
+
+        The changes are detected and the task graph is built like in a real run, then the planned tasks
+        are printed with their prompt tokens, estimated output tokens and time, broken down by file and
+        by reason. Nothing is sent to the LLM and nothing is written to the hierarchy.
+        """
+        ignore_list = CONFIG.get("ignore_list", [])
+        check_task_available_func = partial(
+            DocItem.need_to_generate, ignore_list=ignore_list)
+        try:
+            if self.meta_info.document_version == "":
+                self.apply_fast_path(ignore_list)
+                task_manager = self.load_task_graph(check_task_available_func) \
+                    or self.meta_info.get_topology(check_task_available_func)
+            else:
+                if not self.meta_info.in_generation_process:
+                    file_path_reflections, jump_files = make_fake_files()
+                    new_meta_info = self.detect_changes(
+                        file_path_reflections, jump_files)
+                    new_meta_info.white_list = self.meta_info.white_list
+                    self.meta_info = new_meta_info
+                self.apply_fast_path(ignore_list)
+                task_manager = self.load_task_graph(check_task_available_func) \
+                    or self.meta_info.get_task_manager(
+                        self.meta_info.target_repo_hierarchical_tree, task_available_func=check_task_available_func)
+                for item_name, item_type in self.meta_info.deleted_items_from_older_meta:
+                    print(f"{Fore.LIGHTMAGENTA_EX}[Dir/File/Obj Delete Dected]: {
+                          Style.RESET_ALL} {item_type} {item_name}")
+        finally:
+            delete_fake_files()
+
+        throughput = Throughput.from_runs(load_run_stats(
+            os.path.join(CONFIG["repo_path"], CONFIG["project_hierarchy"])))
+        plan = plan_tasks(task_manager, self.chat_engine, throughput)
+        print_plan(task_manager, plan, throughput, self.thread_count,
+                   fast_path_count=sum(self.fast_path_counts.values()))
+
+    @tracer.traced("markdown refresh")
+    def markdown_refresh(self, file_paths: Optional[List[str]] = None):
+        """
+        Write the markdown docs of the repository.
+
+        Args:
+            file_paths (List[str], optional): Only rewrite the docs of these files, the docs of the
+                ones that don't exist anymore are removed. All the docs are rewritten by default.
+        """
+        with tracer.locked(self.runner_lock, "runner_lock"):
             markdown_folder = os.path.join(
                 CONFIG["repo_path"], CONFIG["Markdown_Docs_folder"])
-            if os.path.exists(markdown_folder):
-                shutil.rmtree(markdown_folder)
-            os.mkdir(markdown_folder)
-
-            file_item_list = self.meta_info.get_all_files()
+            # loaded before the folder is cleared, the pages that didn't change keep their postings
+            search_index = SearchIndex.load(markdown_folder) if (
+                CONFIG.get("search_index") or {}).get("enabled") else None
+            pages = {}
+            if file_paths is None:
+                if os.path.exists(markdown_folder):
+                    shutil.rmtree(markdown_folder)
+                os.mkdir(markdown_folder)
+                file_item_list = self.meta_info.get_all_files()
+            else:
+                file_item_list = []
+                for file_path in file_paths:
+                    file_item = self.meta_info.target_repo_hierarchical_tree.find(
+                        file_path.split("/"))
+                    if file_item is not None:
+                        file_item_list.append(file_item)
+                        continue
+                    markdown_path = os.path.join(
+                        markdown_folder, file_path.replace(".py", ".md"))
+                    if os.path.exists(markdown_path):
+                        os.remove(markdown_path)
             for file_item in tqdm(file_item_list):
 
                 def recursive_check(
@@ -237,20 +553,26 @@ class Runner:
                 if recursive_check(file_item) == False:
                     continue
                 rel_file_path = file_item.get_full_name()
+                objects = []
+                anchors = {}
 
                 def to_markdown(item: DocItem, now_level: int) -> str:
                     markdown_content = ""
-                    markdown_content += (
-                        "#" * now_level +
-                        f" {item.item_type.to_str()} {item.item_name}"
-                    )
+                    heading = f"{item.item_type.to_str()} {item.item_name}"
                     if (
                         "params" in item.content.keys()
                         and len(item.content["params"]) > 0
                     ):
-                        markdown_content += f"({', '.join(
+                        heading += f"({', '.join(
                             item.content['params'])})"
+                    markdown_content += "#" * now_level + f" {heading}"
                     markdown_content += "\n"
+                    objects.append({
+                        "name": item.get_full_name()[len(rel_file_path) + 1:],
+                        "type": item.item_type.to_str(),
+                        "anchor": heading_anchor(heading, anchors),
+                        "text": item.md_content[-1] if len(item.md_content) > 0 else "",
+                    })
                     markdown_content += f"{item.md_content[-1] if len(
                         item.md_content) > 0 else 'Doc is waiting to be generated...'}\n"
                     for _, child in item.children.items():
@@ -274,7 +596,15 @@ class Runner:
                 os.makedirs(os.path.dirname(abs_file_path), exist_ok=True)
                 with open(abs_file_path, "w", encoding="utf-8") as file:
                     file.write(markdown)
-
+                pages[rel_file_path] = {"doc": os.path.relpath(abs_file_path, markdown_folder).replace(os.sep, "/"),
+                                        "markdown": markdown, "objects": objects}
+
+            if search_index is not None:
+                removed = set(search_index.files) if file_paths is None else set(file_paths)
+                indexed = search_index.update(pages, removed - set(pages))
+                search_index.save(markdown_folder)
+                logger.info(
+                    f"Search index updated for {indexed} pages")
             logger.info(
                 f"markdown document has been refreshed at {
                     CONFIG['Markdown_Docs_folder']}"
@@ -289,6 +619,45 @@ class Runner:
         except subprocess.CalledProcessError as e:
             print(f"An error occurred while trying to commit {str(e)}")
 
+    def detect_changes(self, file_path_reflections: Dict[str, str], jump_files: List[str]) -> MetaInfo:
+        """
+        Build the metainfo of the current version of the repository, with the docs of the older one merged.
+
+        When the run is narrowed by `--paths`, only the files in scope are parsed. The other files keep
+        their metainfo, docs and references, like in a staged run.
+
+        Args:
+            file_path_reflections (Dict[str, str]): The fake files of the unstaged changes.
+            jump_files (List[str]): The files to skip.
+
+        Returns:
+            MetaInfo: The new metainfo.
+        """
+        path_filter = get_path_filter(CONFIG)
+        if not path_filter.scope:
+            new_meta_info = MetaInfo.init_meta_info(
+                file_path_reflections, jump_files, self.shared_structure)
+            new_meta_info.load_doc_from_older_meta(self.meta_info)
+            return new_meta_info
+
+        gitignore_checker = GitignoreChecker(
+            directory=CONFIG["repo_path"],
+            gitignore_path=os.path.join(CONFIG["repo_path"], ".gitignore"),
+        )
+        changed_files = [file_path for file_path in gitignore_checker.check_files_and_folders(path_filter)
+                         if file_path not in jump_files and not file_path.endswith(latest_verison_substring)]
+        existing_files = set(changed_files)
+        deleted_files = [file_item.get_full_name() for file_item in self.meta_info.get_all_files()
+                         if path_filter.match(file_item.get_full_name())
+                         and file_item.get_full_name() not in existing_files]
+        logger.info(
+            f"Run narrowed to {', '.join(path_filter.scope)}: {len(changed_files)} files in scope")
+        new_meta_info = MetaInfo.init_meta_info_for_files(
+            self.meta_info, changed_files, deleted_files, file_path_reflections, jump_files)
+        new_meta_info.load_doc_for_files(
+            self.meta_info, changed_files, deleted_files)
+        return new_meta_info
+
     def run(self):
         """
         Runs the document update process.
@@ -310,23 +679,31 @@ class Runner:
             )
             return
 
+        task_manager = None
         if not self.meta_info.in_generation_process:
             logger.info("Starting to detect changes.")
 
-            file_path_reflections, jump_files = make_fake_files()
-            new_meta_info = MetaInfo.init_meta_info(
+            if self.document_unstaged:
+                file_path_reflections, jump_files = {}, []
+            else:
+                file_path_reflections, jump_files = make_fake_files()
+            new_meta_info = self.detect_changes(
                 file_path_reflections, jump_files)
-            new_meta_info.load_doc_from_older_meta(self.meta_info)
 
             self.meta_info = new_meta_info
             self.meta_info.in_generation_process = True
 
         ignore_list = CONFIG.get("ignore_list", [])
+        self.apply_fast_path(ignore_list)
         check_task_available_func = partial(
             DocItem.need_to_generate, ignore_list=ignore_list)
 
-        task_manager = self.meta_info.get_task_manager(
-            self.meta_info.target_repo_hierarchical_tree, task_available_func=check_task_available_func)
+        if task_manager is None:
+            task_manager = self.load_task_graph(check_task_available_func)
+        if task_manager is None:
+            task_manager = self.meta_info.get_task_manager(
+                self.meta_info.target_repo_hierarchical_tree, task_available_func=check_task_available_func)
+            self.save_task_graph(task_manager)
 
         for item_name, item_type in self.meta_info.deleted_items_from_older_meta:
             print(f"{Fore.LIGHTMAGENTA_EX}[Dir/File/Obj Delete Dected]: {
@@ -337,18 +714,10 @@ class Runner:
                 "No tasks in the queue, all documents are completed and up to date.")
 
         task_manager.sync_func = self.markdown_refresh
-        threads = [
-            threading.Thread(
-                target=worker,
-                args=(task_manager, process_id,
-                      self.generate_doc_for_a_single_item),
-            )
-            for process_id in range(CONFIG["max_thread_count"])
-        ]
-        for thread in threads:
-            thread.start()
-        for thread in threads:
-            thread.join()
+        task_count = len(task_manager.task_dict)
+        generation_start = time.perf_counter()
+        self.run_workers(task_manager)
+        self.record_run_stats(time.perf_counter() - generation_start, task_count)
 
         self.meta_info.in_generation_process = False
         self.meta_info.document_version = self.diff_detector.repo.head.commit.hexsha
@@ -359,12 +728,15 @@ class Runner:
             ),
             flash_reference_relation=True,
         )
-        logger.info(f"Doc has been forwarded to the latest version")
+        logger.info("Doc has been forwarded to the latest version")
+        self.log_generation_summary()
 
         self.markdown_refresh()
         delete_fake_files()
 
-        logger.info(f"Starting to git-add DocMetaInfo and newly generated Docs")
+        if not self.stage_docs:
+            return
+        logger.info("Starting to git-add DocMetaInfo and newly generated Docs")
         time.sleep(1)
 
         git_add_result = self.diff_detector.add_unstaged_files()
@@ -373,6 +745,186 @@ class Runner:
             logger.info(
                 f"Added {[file for file in git_add_result]} to staging area")
 
+    def run_staged(self):
+        """
+        Document the staged Python files only, as a pre-commit hook does.
+
+        Only the staged files are parsed, and only the references of their objects and of the objects
+        they may call are resolved again. The rest of the metainfo is reused as it is, so the cost of the
+        hook follows the size of the commit rather than the size of the repository. The docs of the
+        staged files, of their callers and callees, and of their parents are regenerated when needed.
+        """
+        if self.meta_info.document_version == "" or self.meta_info.in_generation_process:
+            # nothing to reuse yet, or an interrupted run to finish first
+            self.run()
+            return
+
+        path_filter = get_path_filter(CONFIG)
+        staged_files = [file_path for file_path in self.diff_detector.get_staged_python_files()
+                        if path_filter.match(file_path)]
+        deleted_files = [file_path for file_path in self.diff_detector.get_staged_deleted_python_files()
+                         if path_filter.match(file_path)]
+        if not staged_files and not deleted_files:
+            logger.info("No staged Python file, nothing to document.")
+            return
+        self.run_files(staged_files, deleted_files)
+        logger.info(
+            f"Docs of {len(staged_files) + len(deleted_files)} staged files forwarded to the latest version")
+
+    def run_files(self, changed_files: List[str], deleted_files: List[str]):
+        """
+        Document some changed and deleted Python files, reusing the metainfo for the rest of the repository.
+
+        Args:
+            changed_files (List[str]): The added or modified files.
+            deleted_files (List[str]): The deleted files.
+        """
+        ignore_list = CONFIG.get("ignore_list", [])
+        if self.document_unstaged:
+            file_path_reflections, jump_files = {}, []
+        else:
+            file_path_reflections, jump_files = make_fake_files()
+        try:
+            new_meta_info = MetaInfo.init_meta_info_for_files(
+                self.meta_info, changed_files, deleted_files, file_path_reflections, jump_files)
+            new_meta_info.load_doc_for_files(
+                self.meta_info, changed_files, deleted_files)
+            self.meta_info = new_meta_info
+            self.meta_info.in_generation_process = True
+
+            self.apply_fast_path(ignore_list)
+            task_manager = self.meta_info.get_task_manager(
+                self.meta_info.target_repo_hierarchical_tree,
+                task_available_func=partial(DocItem.need_to_generate, ignore_list=ignore_list))
+            self.save_task_graph(task_manager)
+            for item_name, item_type in self.meta_info.deleted_items_from_older_meta:
+                print(f"{Fore.LIGHTMAGENTA_EX}[Dir/File/Obj Delete Dected]: {
+                      Style.RESET_ALL} {item_type} {item_name}")
+            self.meta_info.print_task_list(task_manager.task_dict)
+
+            # only the docs of the files with a change are written again
+            affected_files = sorted(set(changed_files) | set(deleted_files) | {
+                task.extra_info.get_file_name() for task in task_manager.task_dict.values()})
+            task_manager.sync_func = partial(
+                self.markdown_refresh, file_paths=affected_files)
+            task_count = len(task_manager.task_dict)
+            generation_start = time.perf_counter()
+            self.run_workers(task_manager)
+            self.record_run_stats(
+                time.perf_counter() - generation_start, task_count)
+
+            self.meta_info.in_generation_process = False
+            self.meta_info.document_version = self.diff_detector.repo.head.commit.hexsha
+            self.meta_info.checkpoint(
+                target_dir_path=os.path.join(
+                    CONFIG["repo_path"], CONFIG["project_hierarchy"]
+                ),
+                flash_reference_relation=True,
+            )
+            self.log_generation_summary()
+            self.markdown_refresh(file_paths=affected_files)
+        finally:
+            delete_fake_files()
+
+        if self.stage_docs:
+            git_add_result = self.diff_detector.add_unstaged_files()
+            if len(git_add_result) > 0:
+                logger.info(
+                    f"Added {[file for file in git_add_result]} to staging area")
+
+    def watched_file_changes(self, changed_paths: List[str], older_index: Dict[str, str],
+                             index: Dict[str, str]) -> Tuple[List[str], List[str]]:
+        """
+        The Python files a watch cycle documents again, and the ones it deletes.
+
+        With `watch.include_unstaged`, they are the files saved or removed since the last cycle.
+        Otherwise only the staged version of the files is documented, and they are the files whose
+        blob changed in the git index.
+
+        Args:
+            changed_paths (List[str]): The paths reported by the watcher.
+            older_index (Dict[str, str]): The blob ids of the Python files of the index at the last cycle.
+            index (Dict[str, str]): The blob ids of the Python files of the index now.
+
+        Returns:
+            Tuple[List[str], List[str]]: The changed files and the deleted files.
+        """
+        if self.document_unstaged:
+            file_paths = [path for path in changed_paths if path.endswith(".py")]
+            changed_files = [path for path in file_paths
+                             if os.path.isfile(os.path.join(CONFIG["repo_path"], path))]
+        else:
+            file_paths = sorted(path for path in set(older_index) | set(index)
+                                if older_index.get(path) != index.get(path))
+            changed_files = [path for path in file_paths if path in index]
+        deleted_files = [path for path in file_paths if path not in changed_files]
+
+        path_filter = get_path_filter(CONFIG)
+        gitignore_checker = GitignoreChecker(
+            directory=CONFIG["repo_path"],
+            gitignore_path=os.path.join(CONFIG["repo_path"], ".gitignore"),
+        )
+        changed_files = [path for path in changed_files
+                         if path_filter.match(path) and not gitignore_checker.is_ignored_file(path)]
+        deleted_files = [path for path in deleted_files if path_filter.match(path)]
+        return changed_files, deleted_files
+
+    def watch(self):
+        """
+        Keep the docs up to date while the repository is being edited.
+
+        The runner stays alive between the runs, so the imports, the backend connection, the jedi
+        caches and the structures of the unchanged files stay warm. The Python files are polled, and a
+        burst of edits triggers a single run once the files are quiet for the debounce delay. Like a
+        staged run, it only parses the changed files and resolves the references touching them again,
+        and a file that doesn't parse keeps its docs until it does. The docs are left out of the git
+        index, staging them is up to the user.
+        """
+        watch_config = CONFIG.get("watch") or {}
+        self.document_unstaged = watch_config.get("include_unstaged", True)
+        self.stage_docs = False
+        watcher = PollingWatcher(
+            CONFIG["repo_path"],
+            skip_dirs=[CONFIG["project_hierarchy"],
+                       CONFIG["Markdown_Docs_folder"]],
+            interval=watch_config.get("interval") or 1.0,
+            debounce=watch_config.get("debounce") or 2.0,
+            path_filter=get_path_filter(CONFIG),
+        )
+        self.run()
+        watcher.rebase_git_state()
+        index = self.diff_detector.get_index_python_blobs()
+        logger.info(
+            f"Watching {CONFIG['repo_path']} for changes, press Ctrl+C to stop")
+        try:
+            while True:
+                changed_paths = watcher.wait_for_changes()
+                logger.info(f"Changes detected: {', '.join(changed_paths[:5])}"
+                            + (f" and {len(changed_paths) - 5} more" if len(changed_paths) > 5 else ""))
+                start = time.perf_counter()
+                try:
+                    older_index, index = index, self.diff_detector.get_index_python_blobs()
+                    if self.meta_info.document_version == "" or self.meta_info.in_generation_process:
+                        # an interrupted run to finish first
+                        self.run()
+                    else:
+                        changed_files, deleted_files = self.watched_file_changes(
+                            changed_paths, older_index, index)
+                        if not changed_files and not deleted_files:
+                            logger.info("No documented file changed")
+                            continue
+                        self.run_files(changed_files, deleted_files)
+                except Exception as e:
+                    # a broken edit must not stop the daemon, the next change retries
+                    logger.error(f"Run failed: {e}")
+                finally:
+                    # also after a cycle with nothing to document, so its changes aren't reported again
+                    watcher.rebase_git_state()
+                logger.info(
+                    f"Docs refreshed in {time.perf_counter() - start:.1f}s")
+        except KeyboardInterrupt:
+            logger.info("Stopped watching")
+
     def add_new_item(self, file_handler, json_data):
         """
         Add new projects to the JSON file and generate corresponding documentation.
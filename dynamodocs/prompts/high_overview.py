@@ -15,3 +15,47 @@ Generate precise content that highlights the aspects of the {code_name} {code_ty
 that are relevant to testing. Avoid speculation or inaccuracies. 
 Now, provide the documentation for {code_name} in {language} professionally, 
 keeping the needs of testers in mind."""
+
+
+BATCH_SYSTEM_PROMPT = """As an AI documentation assistant, your task is to generate documentation
+for the {item_count} following children of {parent_name} in the {file_path} document of the given project. 
+The documentation of each object should include the function, parameters or attributes, code description, 
+and any notes in {language}. This documentation should focus on aspects relevant to testing, 
+such as edge cases, error handling, and return values.
+
+The objects are as follows:
+{objects}
+
+Avoid using Markdown hierarchical heading and divider syntax. 
+You may use English words for function names or variable names.
+Start the document of the object number k with a line containing only <<<DOC k>>> and end it 
+with a line containing only <<<END k>>>, and write the documents of all the objects in order."""
+
+BATCH_USER_PROMPT = """Remember, your audience is testers.
+Generate precise content that highlights the aspects of each object 
+that are relevant to testing. Avoid speculation or inaccuracies. 
+Now, provide the documentation for the {item_count} objects in {language} professionally, 
+each one between its <<<DOC k>>> and <<<END k>>> lines."""
+
+
+# prefix-stable layout: the system prompt is the same for all the objects of a file
+PREFIX_STABLE_SYSTEM_PROMPT = """As an AI documentation assistant, your task is to generate documentation
+for objects of the {file_path} document of the given project. 
+The documentation should include the function, parameters or attributes, code description, 
+and any notes in {language}. This documentation should focus on aspects relevant to testing, 
+such as edge cases, error handling, and return values.
+
+{file_path} contains:
+{file_outline}
+
+Avoid using Markdown hierarchical heading and divider syntax. 
+You may use English words for function names or variable names."""
+
+PREFIX_STABLE_USER_PROMPT = """The code content of the {code_name} {code_type_tell} is as follows:
+{code_content}
+
+Remember, your audience is testers.
+Generate precise content that highlights the aspects of the {code_name} {code_type_tell} 
+that are relevant to testing. Avoid speculation or inaccuracies. 
+Now, provide the documentation for {code_name} in {language} professionally, 
+keeping the needs of testers in mind."""
@@ -0,0 +1,165 @@
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from dynamodocs.mylogger import logger
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request when the backend has been down for too long."""
+    pass
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float, rng: Optional[random.Random] = None) -> float:
+    """
+    The delay before retrying a request, with exponential backoff and full jitter.
+
+    The delay is drawn uniformly between 0 and `base_delay * 2 ** attempt`, capped at `max_delay`, so
+    the workers failing together don't retry together.
+
+    Args:
+        attempt (int): The number of the failed attempt, from 0.
+        base_delay (float): The upper bound of the first delay, in seconds.
+        max_delay (float): The highest upper bound, in seconds.
+        rng (random.Random, optional): The random generator, the module one by default.
+
+    Returns:
+        float: The delay in seconds.
+    """
+    bound = min(max_delay, base_delay * 2 ** attempt)
+    return (rng or random).uniform(0, bound)
+
+
+class CircuitBreaker:
+    """
+    Pauses the dispatch of requests while the backend is unhealthy.
+
+    The circuit opens after `failure_threshold` consecutive backend failures. While it is open, the
+    requests wait instead of failing one after the other. After `cooldown` seconds a single probe
+    request goes through (half-open): its success closes the circuit, its failure opens it again
+    for twice as long, up to `max_cooldown`. Once the backend has been down for `give_up_after`
+    seconds, the requests fail right away instead of waiting, so a run against a dead backend ends,
+    but a probe still goes through every cooldown and its success closes the circuit. A new run
+    gives the backend another `give_up_after` seconds, see `start_run`.
+
+    Args:
+        failure_threshold (int, optional): Consecutive failures opening the circuit, 0 disables it.
+        cooldown (float, optional): Seconds before the first probe.
+        max_cooldown (float, optional): The longest wait between two probes.
+        give_up_after (float, optional): Seconds the backend may stay down before the requests fail.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 10.0, max_cooldown: float = 300.0,
+                 give_up_after: float = 1800.0):
+        self.failure_threshold = failure_threshold
+        self.give_up_after = give_up_after
+        self.base_cooldown = cooldown
+        self.max_cooldown = max(cooldown, max_cooldown)
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.cooldown = cooldown
+        self.opened_at = 0.0
+        self.down_since: Optional[float] = None
+        self.condition = threading.Condition()
+        self.times_opened = 0
+        self.paused_seconds = 0.0
+
+    @staticmethod
+    def from_config(config: Dict[str, Any]) -> "CircuitBreaker":
+        breaker_config = config.get("circuit_breaker") or {}
+        return CircuitBreaker(
+            failure_threshold=breaker_config.get("failure_threshold", 5),
+            cooldown=breaker_config.get("cooldown") or 10.0,
+            max_cooldown=breaker_config.get("max_cooldown") or 300.0,
+            give_up_after=breaker_config.get("give_up_after") or 1800.0,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.failure_threshold > 0
+
+    def start_run(self) -> None:
+        """Give the backend another `give_up_after` seconds, e.g. for a new run of a watching process."""
+        with self.condition:
+            if self.down_since is not None:
+                self.down_since = time.monotonic()
+
+    def before_request(self) -> None:
+        """
+        Block while the circuit is open, and let a single probe through once the cooldown is over.
+
+        Raises:
+            CircuitOpenError: When the backend has been down for `give_up_after` seconds and the
+                request is not the probe.
+        """
+        if not self.enabled:
+            return
+        with self.condition:
+            wait_start = None
+            while True:
+                if self.state == self.CLOSED:
+                    break
+                if self.state == self.OPEN:
+                    remaining = self.opened_at + self.cooldown - time.monotonic()
+                    if remaining <= 0:
+                        self.state = self.HALF_OPEN
+                        logger.info(
+                            "Circuit breaker half-open, probing the backend")
+                        break
+                else:
+                    # a probe is in flight, wait for its outcome
+                    remaining = None
+                if self.down_since is not None and time.monotonic() - self.down_since > self.give_up_after:
+                    raise CircuitOpenError(
+                        f"the backend has been failing for more than {self.give_up_after:.0f}s")
+                if wait_start is None:
+                    wait_start = time.monotonic()
+                self.condition.wait(timeout=remaining)
+            if wait_start is not None:
+                self.paused_seconds += time.monotonic() - wait_start
+
+    def record_success(self) -> None:
+        if not self.enabled:
+            return
+        with self.condition:
+            if self.state != self.CLOSED:
+                logger.info("Circuit breaker closed, the backend answers again")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.cooldown = self.base_cooldown
+            self.down_since = None
+            self.condition.notify_all()
+
+    def record_failure(self) -> None:
+        """Count a backend failure, the requests failing for their own content are not counted."""
+        if not self.enabled:
+            return
+        with self.condition:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN:
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                self._open()
+            elif self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        if self.down_since is None:
+            self.down_since = self.opened_at
+        self.times_opened += 1
+        logger.warning(
+            f"Circuit breaker open after {self.consecutive_failures} consecutive failures, "
+            f"pausing the requests for {self.cooldown:.1f}s")
+        self.condition.notify_all()
+
+    def summary(self) -> Optional[str]:
+        if self.times_opened == 0:
+            return None
+        return (f"Circuit breaker opened {self.times_opened} times, "
+                f"requests paused for {self.paused_seconds:.1f}s in total")
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, List
+
+# The search index is written next to the markdown docs, so a docs portal can search them without
+# scanning and tokenizing the whole tree. Every file keeps the hash of its markdown, and only the
+# files whose markdown changed are tokenized again.
+SEARCH_INDEX_FILE = "search_index.json"
+SEARCH_INDEX_VERSION = 1
+
+TERM_PATTERN = re.compile(r"[a-z0-9_]+")
+MIN_TERM_LENGTH = 2
+STOP_WORDS = frozenset("""
+a an and are as at be been but by can do does for from has have if in into is it its no not of on
+or so such that the their then there these this those to was were which while will with without
+""".split())
+
+
+def heading_anchor(heading: str, seen: Dict[str, int]) -> str:
+    """
+    The anchor of a markdown heading as GitHub renders it: lowercase, punctuation removed, spaces as
+    dashes, and a numbered suffix for the repeated headings of a page.
+
+    Args:
+        heading (str): The text of the heading, without the leading #.
+        seen (Dict[str, int]): The anchors already given in the page, updated.
+
+    Returns:
+        str: The anchor, without the leading #.
+    """
+    anchor = re.sub(r"[^\w\- ]", "", heading.strip().lower()).replace(" ", "-")
+    count = seen.get(anchor, 0)
+    seen[anchor] = count + 1
+    return anchor if count == 0 else f"{anchor}-{count}"
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split a text into its distinct search terms.
+
+    Identifiers are kept whole and their snake_case parts are added, so `load_doc` is found by
+    `load_doc`, `load` and `doc`.
+    """
+    terms = set()
+    for word in TERM_PATTERN.findall(text.lower()):
+        parts = [word] + (word.split("_") if "_" in word else [])
+        for part in parts:
+            if len(part) >= MIN_TERM_LENGTH and part not in STOP_WORDS:
+                terms.add(part)
+    return sorted(terms)
+
+
+def markdown_hash(markdown: str) -> str:
+    return hashlib.sha256(markdown.encode("utf-8")).hexdigest()[:16]
+
+
+class SearchIndex:
+    """
+    An inverted index of the markdown docs.
+
+    The JSON file holds:
+        - files: by source file, the markdown page, the hash of its content and its objects, each one
+          a [qualified name, type, heading anchor] list.
+        - terms: the postings of every term, the object positions by source file.
+        - symbols: the same postings for the object names.
+    """
+
+    def __init__(self, files: Dict[str, Dict[str, Any]] = None, terms: Dict[str, Dict[str, List[int]]] = None,
+                 symbols: Dict[str, Dict[str, List[int]]] = None):
+        self.files = files or {}
+        self.terms = terms or {}
+        self.symbols = symbols or {}
+
+    @staticmethod
+    def load(markdown_folder: str) -> "SearchIndex":
+        """Load the index of the markdown folder, an empty one when it is missing or of another version."""
+        index_path = os.path.join(markdown_folder, SEARCH_INDEX_FILE)
+        if not os.path.exists(index_path):
+            return SearchIndex()
+        try:
+            with open(index_path, "r", encoding="utf-8") as reader:
+                data = json.load(reader)
+        except (OSError, ValueError):
+            return SearchIndex()
+        if data.get("version") != SEARCH_INDEX_VERSION:
+            return SearchIndex()
+        return SearchIndex(data.get("files"), data.get("terms"), data.get("symbols"))
+
+    def save(self, markdown_folder: str) -> None:
+        os.makedirs(markdown_folder, exist_ok=True)
+        with open(os.path.join(markdown_folder, SEARCH_INDEX_FILE), "w", encoding="utf-8") as writer:
+            json.dump({"version": SEARCH_INDEX_VERSION, "files": self.files, "terms": self.terms,
+                       "symbols": self.symbols}, writer, ensure_ascii=False, separators=(",", ":"))
+
+    def update(self, pages: Dict[str, Dict[str, Any]], removed: Iterable[str]) -> int:
+        """
+        Index the changed pages and forget the removed ones.
+
+        Args:
+            pages (Dict[str, Dict[str, Any]]): By source file, the rendered page: its markdown path
+                under "doc", its content under "markdown", and its objects under "objects", each one a
+                dict with the "name", "type", "anchor" and indexed "text" of the object.
+            removed (Iterable[str]): The source files whose page doesn't exist anymore.
+
+        Returns:
+            int: The number of pages indexed again.
+        """
+        changed = {file_path: page for file_path, page in pages.items()
+                   if self.files.get(file_path, {}).get("hash") != markdown_hash(page["markdown"])}
+        stale = set(changed) | {file_path for file_path in removed if file_path in self.files}
+        if not stale:
+            return 0
+        for postings_by_key in [self.terms, self.symbols]:
+            for key in list(postings_by_key):
+                postings = postings_by_key[key]
+                for file_path in stale.intersection(postings):
+                    del postings[file_path]
+                if not postings:
+                    del postings_by_key[key]
+        for file_path in stale:
+            self.files.pop(file_path, None)
+
+        for file_path, page in changed.items():
+            self.files[file_path] = {
+                "doc": page["doc"],
+                "hash": markdown_hash(page["markdown"]),
+                "objects": [[obj["name"], obj["type"], obj["anchor"]] for obj in page["objects"]],
+            }
+            for position, obj in enumerate(page["objects"]):
+                short_name = obj["name"].rsplit("/", 1)[-1]
+                self.symbols.setdefault(short_name, {}).setdefault(
+                    file_path, []).append(position)
+                for term in tokenize(f"{short_name} {obj['text']}"):
+                    self.terms.setdefault(term, {}).setdefault(
+                        file_path, []).append(position)
+        return len(changed)
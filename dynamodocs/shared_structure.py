@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from dynamodocs.code_store import git_blob_id
+from dynamodocs.mylogger import logger
+
+SHARED_STRUCTURE_VERSION = 1
+# the hierarchy folder of the config suffixed with this is the store of all the profiles
+SHARED_STRUCTURE_SUFFIX = "_shared"
+MAX_ENTRIES = 8
+
+# the sections of the config the parsed structure depends on
+STRUCTURE_CONFIG_KEYS = ["change_detection", "fast_path"]
+# and the ones the references depend on, with the white list of the run
+REFERENCES_CONFIG_KEYS = ["references", "paths", "ignore_list"]
+
+
+def config_digest(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class SharedStructureStore:
+    """
+    The structure of the repository and its resolved references, shared by the prompt profiles.
+
+    Every profile keeps its own hierarchy folder, with its docs and statuses, but the objects, their
+    code ranges and hashes, and the references between them only depend on the content of the files.
+    They are saved once under a key hashing the git blob ids of the parsed files and the config they
+    are parsed with, so the next profile, or the next run of the same commit, loads them instead of
+    parsing the files and resolving the references again.
+
+    Args:
+        folder (str): The folder of the store, created on the first write.
+        max_entries (int, optional): The structures and reference sets kept, the least recently used are removed.
+        read_only (bool, optional): Only load the saved entries, e.g. for a dry run that leaves the repository untouched.
+    """
+
+    def __init__(self, folder: str, max_entries: int = MAX_ENTRIES, read_only: bool = False):
+        self.folder = folder
+        self.max_entries = max_entries
+        self.read_only = read_only
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def from_config(config: dict, repo_path: str, hierarchy_folder: str,
+                    read_only: bool = False) -> Optional["SharedStructureStore"]:
+        """The store of the repository, None when `shared_structure.enabled` is off."""
+        shared_config = config.get("shared_structure") or {}
+        if not shared_config.get("enabled", False):
+            return None
+        return SharedStructureStore(
+            os.path.join(repo_path, hierarchy_folder + SHARED_STRUCTURE_SUFFIX),
+            shared_config.get("max_entries", MAX_ENTRIES), read_only)
+
+    @staticmethod
+    def structure_key(config: dict, repo_path: str, file_paths: List[str]) -> Optional[str]:
+        """
+        The key of the structure of these files as they are now on disk.
+
+        Args:
+            config (dict): The configuration of the run.
+            repo_path (str): The repository.
+            file_paths (List[str]): The files the structure is parsed from, relative to the repository.
+
+        Returns:
+            Optional[str]: The key, None when a file can't be read.
+        """
+        blob_ids = []
+        for file_path in sorted(file_paths):
+            try:
+                with open(os.path.join(repo_path, file_path), "rb") as reader:
+                    blob_ids.append([file_path, git_blob_id(reader.read())])
+            except OSError:
+                return None
+        return config_digest(SHARED_STRUCTURE_VERSION, blob_ids,
+                             {key: config.get(key) for key in STRUCTURE_CONFIG_KEYS})
+
+    @staticmethod
+    def references_key(config: dict, structure_key: str, white_list: Optional[List[Dict]],
+                       fake_file_reflection: Dict[str, str], jump_files: List[str]) -> str:
+        """The key of the references resolved on a structure, with a white list and the skipped files."""
+        return config_digest(structure_key, white_list, sorted(fake_file_reflection.values()), sorted(jump_files),
+                             {key: config.get(key) for key in REFERENCES_CONFIG_KEYS})
+
+    def entry_path(self, kind: str, key: str) -> str:
+        return os.path.join(self.folder, kind, f"{key}.json")
+
+    def load(self, kind: str, key: str) -> Optional[Any]:
+        """The entry of a kind, "structure" or "references", saved under a key, None when there is none."""
+        path = self.entry_path(kind, key)
+        try:
+            with open(path, "r", encoding="utf-8") as reader:
+                entry = json.load(reader)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if entry.get("version") != SHARED_STRUCTURE_VERSION:
+            self.misses += 1
+            return None
+        if not self.read_only:
+            # the least recently used entries are pruned first
+            os.utime(path)
+        self.hits += 1
+        return entry["data"]
+
+    def save(self, kind: str, key: str, data: Any) -> None:
+        if self.read_only:
+            return
+        path = self.entry_path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # another profile may run on the same store, the entry is replaced at once
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as writer:
+            json.dump({"version": SHARED_STRUCTURE_VERSION, "data": data},
+                      writer, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, path)
+        self.prune(kind)
+
+    def prune(self, kind: str) -> None:
+        kind_folder = os.path.join(self.folder, kind)
+        entries = [os.path.join(kind_folder, name) for name in os.listdir(kind_folder) if name.endswith(".json")]
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[self.max_entries:]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Shared structure: can't remove {path}: {e}")
+
+    def summary(self) -> str:
+        return f"Shared structure: {self.hits} entries reused, {self.misses} parsed again"
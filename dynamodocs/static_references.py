@@ -0,0 +1,694 @@
+import ast
+import builtins
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+from dynamodocs.mylogger import logger
+
+# The static resolver finds the references to the functions and classes of the repository from the
+# ASTs of its files only: one symbol table per scope, the imports between the modules, and the
+# attribute lookups through modules, classes and their bases, `self`, `cls`, `super()`, annotated
+# parameters and variables assigned an instance of a class. The names it meets where it can't tell
+# their target are recorded, the definitions of these names are left to jedi.
+
+BUILTIN_NAMES = frozenset(dir(builtins))
+
+Reference = Tuple[str, int, int]
+
+# bindings whose value is unknown: a variable, or a name bound to different definitions or imports
+LOCAL = "local"
+UNKNOWN = "unknown"
+GLOBAL = "global"
+NONLOCAL = "nonlocal"
+EXTERNAL = "external"
+
+
+class Definition:
+    """A function or class of the repository, with the references found to it."""
+
+    def __init__(self, module: "ModuleInfo", node: ast.AST, scope: "Scope"):
+        self.module = module
+        self.node = node
+        self.name = node.name
+        self.is_class = isinstance(node, ast.ClassDef)
+        # the scope the bases and decorators are evaluated in
+        self.scope = scope
+        self.members: Dict[str, Definition] = {}
+        # the names of the class body that are not a single method or nested class
+        self.other_attributes: Set[str] = set()
+        # the values assigned to `self.<name>` in the methods
+        self.instance_attributes: Dict[str, Assigned] = {}
+        self.references: List[Reference] = []
+
+
+class ModuleInfo:
+    def __init__(self, name: str, file_path: str, tree: ast.Module, is_package: bool):
+        self.name = name
+        self.file_path = file_path
+        self.tree = tree
+        self.is_package = is_package
+        self.scope: Optional[Scope] = None
+
+
+class Instance:
+    """An instance of a class of the repository."""
+
+    def __init__(self, definition: Definition):
+        self.definition = definition
+
+
+class Super:
+    """The `super()` of a method, its attributes are looked up in the bases of the class."""
+
+    def __init__(self, definition: Definition):
+        self.definition = definition
+
+
+class ModuleRef:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class ImportedName:
+    def __init__(self, module_name: str, name: str):
+        self.module_name = module_name
+        self.name = name
+
+
+class Assigned:
+    """A name bound by assignments, to the values of their expressions in their scopes."""
+
+    def __init__(self, values: List[Tuple[Optional[ast.AST], "Scope"]]):
+        self.values = values
+
+
+def is_variable(binding: object) -> bool:
+    return binding == LOCAL or isinstance(binding, Assigned)
+
+
+class Scope:
+    """A module, class, function or comprehension scope, with the names bound in it."""
+
+    def __init__(self, kind: str, parent: Optional["Scope"], owner: Optional[Definition] = None):
+        self.kind = kind
+        self.parent = parent
+        self.owner = owner
+        self.bindings: Dict[str, object] = {}
+        self.star_imports: List[str] = []
+        # the first parameter of a method
+        self.self_name: Optional[str] = None
+
+    def bind(self, name: str, binding: object) -> None:
+        current = self.bindings.get(name)
+        if current in [GLOBAL, NONLOCAL]:
+            return
+        if isinstance(binding, Assigned) and isinstance(current, Assigned):
+            current.values.extend(binding.values)
+        elif current is None or binding in [GLOBAL, NONLOCAL]:
+            self.bindings[name] = binding
+        elif is_variable(current) and is_variable(binding):
+            self.bindings[name] = LOCAL
+        else:
+            # bound to different things, the value depends on the control flow
+            self.bindings[name] = UNKNOWN
+
+    def enclosing_class(self) -> Optional[Definition]:
+        """The class of the method this scope is the body of."""
+        if self.kind == "function" and self.parent is not None and self.parent.kind == "class":
+            return self.parent.owner
+        return None
+
+
+def module_name_of(file_path: str) -> Tuple[str, bool]:
+    """The dotted name of the module of a file relative to the repository, and whether it is a package."""
+    parts = file_path.replace(os.sep, "/")[:-len(".py")].split("/")
+    if parts[-1] == "__init__":
+        return ".".join(parts[:-1]), True
+    return ".".join(parts), False
+
+
+def resolve_import(module_name: Optional[str], level: int, current_name: str, is_package: bool) -> str:
+    """The absolute name of the module of a `from ... import` statement in the module `current_name`."""
+    if level == 0:
+        return module_name or ""
+    package_parts = current_name.split(".") if is_package else current_name.split(".")[:-1]
+    package_parts = package_parts[:len(package_parts) - (level - 1)]
+    return ".".join(part for part in package_parts + [module_name or ""] if part)
+
+
+def annotation_class(annotation: Optional[ast.AST]) -> Optional[ast.AST]:
+    """The expression of the class an annotation names, `Optional[X]` and "X" give X."""
+    if isinstance(annotation, ast.Constant) and isinstance(annotation.value, str):
+        try:
+            annotation = ast.parse(annotation.value, mode="eval").body
+        except SyntaxError:
+            return None
+    if isinstance(annotation, ast.Subscript):
+        generic = annotation.value
+        generic_name = generic.id if isinstance(generic, ast.Name) else getattr(generic, "attr", None)
+        return annotation_class(annotation.slice) if generic_name == "Optional" else None
+    if isinstance(annotation, (ast.Name, ast.Attribute)):
+        return annotation
+    return None
+
+
+class StaticReferenceResolver:
+    """
+    Finds the references to the functions and classes of the repository from the ASTs of its files.
+
+    Args:
+        repo_path (str): The repository.
+        file_paths (List[str]): The Python files to index, relative to the repository.
+    """
+
+    def __init__(self, repo_path: str, file_paths: List[str]):
+        self.repo_path = repo_path
+        self.modules: Dict[str, ModuleInfo] = {}
+        self.definitions: Dict[Tuple[str, int, str], Definition] = {}
+        self.scopes: Dict[int, Scope] = {}
+        # the names used where their target is unknown, the definitions of these names are left to jedi
+        self.unresolved_names: Set[str] = set()
+        self.resolving: Set[int] = set()
+        self.resolved_count = 0
+        self.fallback_count = 0
+
+        for file_path in file_paths:
+            try:
+                with open(os.path.join(repo_path, file_path), "r", encoding="utf-8") as reader:
+                    tree = ast.parse(reader.read())
+            except (OSError, SyntaxError, ValueError) as e:
+                logger.warning(f"Static references: can't parse {file_path}: {e}")
+                continue
+            name, is_package = module_name_of(file_path)
+            self.modules[name] = ModuleInfo(name, file_path, tree, is_package)
+        for module in self.modules.values():
+            module.scope = ScopeBuilder(self, module).build()
+        for module in self.modules.values():
+            ReferenceCollector(self, module).collect()
+        for module in self.modules.values():
+            module.tree = None
+        self.scopes.clear()
+
+    def summary(self) -> str:
+        return (f"Static references: {self.resolved_count} objects resolved from the ASTs, "
+                f"{self.fallback_count} left to jedi")
+
+    def find_references(self, variable_name: str, file_path: str, line_number: int,
+                        in_file_only: bool = False) -> Optional[List[Reference]]:
+        """
+        The references to a function or class, like `find_all_referencer` returns them.
+
+        Args:
+            variable_name (str): The name of the function or class.
+            file_path (str): Its file, relative to the repository.
+            line_number (int): The line of its `def` or `class` keyword.
+            in_file_only (bool, optional): Only return the references in the same file.
+
+        Returns:
+            Optional[List[Reference]]: The file, line and column of every reference. None when the name
+            is used somewhere the resolver can't tell what it refers to, jedi has to find them then.
+        """
+        definition = self.definitions.get((file_path, line_number, variable_name))
+        if definition is None or variable_name in self.unresolved_names:
+            self.fallback_count += 1
+            return None
+        self.resolved_count += 1
+        references = definition.references
+        if in_file_only:
+            references = [reference for reference in references if reference[0] == file_path]
+        return list(references)
+
+    def lookup(self, scope: Scope, name: str) -> object:
+        """The binding of a name read in a scope, None when no scope binds it."""
+        current = scope
+        first = True
+        while current is not None:
+            # the names of a class body are not visible from its methods
+            if first or current.kind != "class":
+                binding = current.bindings.get(name)
+                if binding == GLOBAL:
+                    return self.lookup(self.module_scope(current), name)
+                if binding is not None and binding != NONLOCAL:
+                    return binding
+                if current.kind == "module" and current.star_imports:
+                    unindexed = []
+                    for module_name in current.star_imports:
+                        module = self.modules.get(module_name)
+                        if module is None:
+                            unindexed.append(module_name)
+                        elif name in module.scope.bindings:
+                            return module.scope.bindings[name]
+                    if unindexed:
+                        return UNKNOWN if any(self.in_repository(module_name) for module_name in unindexed) else EXTERNAL
+            first = False
+            current = current.parent
+        return None
+
+    def in_repository(self, module_name: str) -> bool:
+        """Whether a module that is not indexed is a file of the repository, excluded from the docs."""
+        path = os.path.join(self.repo_path, *module_name.split("."))
+        return os.path.isfile(f"{path}.py") or os.path.isfile(os.path.join(path, "__init__.py"))
+
+    def unindexed_module(self, module_name: str) -> object:
+        """The value of a module that is not indexed: unknown if it is in the repository."""
+        return None if self.in_repository(module_name) else EXTERNAL
+
+    @staticmethod
+    def module_scope(scope: Scope) -> Scope:
+        while scope.parent is not None:
+            scope = scope.parent
+        return scope
+
+    def resolve_binding(self, binding: object) -> object:
+        """
+        The value of a binding: a Definition, ModuleInfo, Instance or Super of the repository,
+        EXTERNAL for the values defined outside of it, None when it is unknown.
+        """
+        if binding is None or binding in [LOCAL, UNKNOWN]:
+            return None
+        if isinstance(binding, (Definition, Instance, Super)) or binding == EXTERNAL:
+            return binding
+        if isinstance(binding, ModuleRef):
+            return self.modules.get(binding.name) or self.unindexed_module(binding.name)
+        if id(binding) in self.resolving:
+            # an import or assignment cycle
+            return None
+        self.resolving.add(id(binding))
+        try:
+            if isinstance(binding, ImportedName):
+                module = self.modules.get(binding.module_name)
+                if module is None:
+                    return self.modules.get(f"{binding.module_name}.{binding.name}") \
+                        or self.unindexed_module(binding.module_name)
+                return self.member(module, binding.name)
+            if isinstance(binding, Assigned):
+                values = [self.resolve_value(value, scope) for value, scope in binding.values]
+                if all(value is values[0] for value in values):
+                    return values[0]
+                if all(isinstance(value, Instance) and value.definition is values[0].definition
+                       for value in values):
+                    return values[0]
+        finally:
+            self.resolving.discard(id(binding))
+        return None
+
+    def resolve_value(self, node: Optional[ast.AST], scope: Scope) -> object:
+        """The value of an assigned expression, the call of a class gives one of its instances."""
+        if node is None:
+            return None
+        if isinstance(node, ast.Call) and not self.is_super(node, scope):
+            function = self.resolve(node.func, scope)
+            if isinstance(function, Definition) and function.is_class:
+                return Instance(function)
+            if isinstance(function, Definition):
+                # a function annotated to return an instance of a class
+                returned = annotation_class(function.node.returns)
+                if returned is not None:
+                    return self.resolve_value(ast.Call(func=returned, args=[], keywords=[]), function.scope)
+            return EXTERNAL if function == EXTERNAL else None
+        return self.resolve(node, scope)
+
+    def is_super(self, node: ast.Call, scope: Scope) -> bool:
+        return isinstance(node.func, ast.Name) and node.func.id == "super" and self.lookup(scope, "super") is None
+
+    def resolve(self, node: ast.AST, scope: Scope) -> object:
+        """The value of an expression, see resolve_binding."""
+        if isinstance(node, ast.Name):
+            binding = self.lookup(scope, node.id)
+            if binding is None:
+                return EXTERNAL if node.id in BUILTIN_NAMES else None
+            return self.resolve_binding(binding)
+        if isinstance(node, ast.Attribute):
+            value = self.resolve(node.value, scope)
+            if value is None or value == EXTERNAL:
+                return value
+            return self.member(value, node.attr)
+        if isinstance(node, ast.Call):
+            if self.is_super(node, scope):
+                method_scope = scope
+                while method_scope.kind == "comprehension":
+                    method_scope = method_scope.parent
+                owner = method_scope.enclosing_class()
+                return Super(owner) if owner is not None else None
+            return self.resolve_value(node, scope)
+        if isinstance(node, (ast.Constant, ast.JoinedStr)):
+            return EXTERNAL
+        return None
+
+    def class_member(self, definition: Definition, name: str, instance: bool, skip_own: bool = False,
+                     seen: Optional[Set[int]] = None) -> object:
+        """An attribute of a class or of its bases, see resolve_binding."""
+        seen = seen if seen is not None else set()
+        if id(definition) in seen:
+            return None
+        seen.add(id(definition))
+        if not skip_own:
+            if name in definition.other_attributes:
+                return None
+            if name in definition.members:
+                return definition.members[name]
+            if instance and name in definition.instance_attributes:
+                return self.resolve_binding(definition.instance_attributes[name])
+        for base in definition.node.bases:
+            base_value = self.resolve(base, definition.scope)
+            if isinstance(base_value, Definition) and base_value.is_class:
+                member = self.class_member(base_value, name, instance, seen=seen)
+                if member is not None:
+                    return member
+        if name.startswith("__") and name.endswith("__"):
+            # the special attributes every object has
+            return EXTERNAL
+        # inherited from a base outside of the repository, or set from outside of the class
+        return None
+
+    def member(self, value: object, name: str) -> object:
+        """The attribute `name` of a value, see resolve_binding."""
+        if isinstance(value, ModuleInfo):
+            submodule = self.modules.get(f"{value.name}.{name}")
+            if name in value.scope.bindings:
+                resolved = self.resolve_binding(value.scope.bindings[name])
+                return submodule if resolved is None and submodule is not None else resolved
+            if submodule is not None:
+                return submodule
+            for module_name in value.scope.star_imports:
+                module = self.modules.get(module_name)
+                if module is not None and name in module.scope.bindings:
+                    return self.resolve_binding(module.scope.bindings[name])
+            return None
+        if isinstance(value, Definition):
+            if value.is_class:
+                return self.class_member(value, name, instance=False)
+            # the attributes every function has
+            return EXTERNAL
+        if isinstance(value, Instance):
+            return self.class_member(value.definition, name, instance=True)
+        if isinstance(value, Super):
+            return self.class_member(value.definition, name, instance=True, skip_own=True)
+        return None
+
+
+class ScopeBuilder(ast.NodeVisitor):
+    """The first pass: the scopes of a module with the names bound in each of them, and its definitions."""
+
+    def __init__(self, resolver: StaticReferenceResolver, module: ModuleInfo):
+        self.resolver = resolver
+        self.module = module
+        self.scope: Optional[Scope] = None
+
+    def build(self) -> Scope:
+        self.scope = Scope("module", None)
+        self.resolver.scopes[id(self.module.tree)] = self.scope
+        for statement in self.module.tree.body:
+            self.visit(statement)
+        return self.scope
+
+    def bind_target(self, target: ast.AST, value: Optional[ast.AST] = None, scope: Optional[Scope] = None) -> None:
+        scope = scope or self.scope
+        if isinstance(target, ast.Name):
+            scope.bind(target.id, Assigned([(value, self.scope)]) if value is not None else LOCAL)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for element in target.elts:
+                self.bind_target(element, scope=scope)
+        elif isinstance(target, ast.Starred):
+            self.bind_target(target.value, scope=scope)
+        else:
+            owner = self.scope.enclosing_class()
+            if isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name) \
+                    and owner is not None and target.value.id == self.scope.self_name:
+                attribute = owner.instance_attributes.setdefault(target.attr, Assigned([]))
+                attribute.values.append((value, self.scope))
+            self.visit(target)
+
+    def visit_definition(self, node: ast.AST) -> Definition:
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        definition = Definition(self.module, node, self.scope)
+        self.resolver.definitions[(self.module.file_path, node.lineno, node.name)] = definition
+        if self.scope.kind == "class":
+            self.scope.owner.members[node.name] = definition
+        if node.name in self.scope.bindings:
+            # jedi sees the redefinitions of a name as references to each other
+            self.resolver.unresolved_names.add(node.name)
+        self.scope.bind(node.name, definition)
+        return definition
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        for base in node.bases + [keyword.value for keyword in node.keywords]:
+            self.visit(base)
+        definition = self.visit_definition(node)
+        parent = self.scope
+        self.scope = Scope("class", parent, definition)
+        self.resolver.scopes[id(node)] = self.scope
+        for statement in node.body:
+            self.visit(statement)
+        for name, binding in self.scope.bindings.items():
+            if not isinstance(binding, Definition):
+                definition.other_attributes.add(name)
+        self.scope = parent
+
+    def visit_FunctionDef(self, node: ast.AST) -> None:
+        definition = self.visit_definition(node)
+        self.visit_function(node, definition)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node: ast.Lambda) -> None:
+        self.visit_function(node, None)
+
+    def visit_function(self, node: ast.AST, definition: Optional[Definition]) -> None:
+        for default in node.args.defaults + [default for default in node.args.kw_defaults if default is not None]:
+            self.visit(default)
+        parent = self.scope
+        self.scope = Scope("function", parent, definition)
+        self.resolver.scopes[id(node)] = self.scope
+        owner = self.scope.enclosing_class()
+        decorators = {decorator.id for decorator in getattr(node, "decorator_list", [])
+                      if isinstance(decorator, ast.Name)}
+        positional = node.args.posonlyargs + node.args.args
+        for argument in positional + node.args.kwonlyargs:
+            if owner is not None and argument is positional[0] and "staticmethod" not in decorators:
+                # the instance, or the class of a classmethod
+                self.scope.bind(argument.arg, owner if "classmethod" in decorators else Instance(owner))
+                self.scope.self_name = argument.arg
+                continue
+            annotation = annotation_class(argument.annotation)
+            if annotation is not None:
+                self.scope.bind(argument.arg, Assigned([(ast.Call(func=annotation, args=[], keywords=[]), parent)]))
+            else:
+                self.scope.bind(argument.arg, LOCAL)
+        for argument in [node.args.vararg, node.args.kwarg]:
+            if argument is not None:
+                self.scope.bind(argument.arg, LOCAL)
+        for statement in [node.body] if isinstance(node, ast.Lambda) else node.body:
+            self.visit(statement)
+        self.scope = parent
+
+    def visit_comprehension_scope(self, node: ast.AST, elements: List[ast.AST]) -> None:
+        # the first iterable is evaluated in the enclosing scope
+        self.visit(node.generators[0].iter)
+        parent = self.scope
+        self.scope = Scope("comprehension", parent)
+        self.resolver.scopes[id(node)] = self.scope
+        for index, generator in enumerate(node.generators):
+            if index > 0:
+                self.visit(generator.iter)
+            self.bind_target(generator.target)
+            for condition in generator.ifs:
+                self.visit(condition)
+        for element in elements:
+            self.visit(element)
+        self.scope = parent
+
+    def visit_ListComp(self, node: ast.AST) -> None:
+        self.visit_comprehension_scope(node, [node.elt])
+
+    visit_SetComp = visit_ListComp
+    visit_GeneratorExp = visit_ListComp
+
+    def visit_DictComp(self, node: ast.DictComp) -> None:
+        self.visit_comprehension_scope(node, [node.key, node.value])
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            if alias.asname is not None:
+                self.scope.bind(alias.asname, ModuleRef(alias.name))
+            else:
+                # `import a.b` binds `a`, from which `a.b` is an attribute
+                top_name = alias.name.split(".")[0]
+                if not isinstance(self.scope.bindings.get(top_name), ModuleRef):
+                    self.scope.bind(top_name, ModuleRef(top_name))
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        module_name = resolve_import(node.module, node.level, self.module.name, self.module.is_package)
+        for alias in node.names:
+            if alias.name == "*":
+                self.scope.star_imports.append(module_name)
+            else:
+                self.scope.bind(alias.asname or alias.name, ImportedName(module_name, alias.name))
+
+    def visit_Global(self, node: ast.Global) -> None:
+        for name in node.names:
+            self.scope.bind(name, GLOBAL)
+
+    def visit_Nonlocal(self, node: ast.Nonlocal) -> None:
+        for name in node.names:
+            self.scope.bind(name, NONLOCAL)
+
+    def visit_Assign(self, node: ast.Assign) -> None:
+        self.visit(node.value)
+        for target in node.targets:
+            self.bind_target(target, node.value)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> None:
+        self.visit(node.annotation)
+        if node.value is not None:
+            self.visit(node.value)
+            self.bind_target(node.target, node.value)
+            return
+        annotation = annotation_class(node.annotation)
+        if isinstance(node.target, ast.Name) and annotation is not None:
+            self.scope.bind(node.target.id, Assigned([(ast.Call(func=annotation, args=[], keywords=[]), self.scope)]))
+        else:
+            self.bind_target(node.target)
+
+    def visit_AugAssign(self, node: ast.AugAssign) -> None:
+        self.visit(node.value)
+        self.bind_target(node.target)
+
+    def visit_NamedExpr(self, node: ast.NamedExpr) -> None:
+        self.visit(node.value)
+        # in a comprehension, the target is bound in the enclosing function
+        scope = self.scope
+        while scope.kind == "comprehension":
+            scope = scope.parent
+        self.bind_target(node.target, node.value, scope=scope)
+
+    def visit_For(self, node: ast.AST) -> None:
+        self.visit(node.iter)
+        self.bind_target(node.target)
+        for statement in node.body + node.orelse:
+            self.visit(statement)
+
+    visit_AsyncFor = visit_For
+
+    def visit_withitem(self, node: ast.withitem) -> None:
+        self.visit(node.context_expr)
+        if node.optional_vars is not None:
+            self.bind_target(node.optional_vars)
+
+    def visit_ExceptHandler(self, node: ast.ExceptHandler) -> None:
+        if node.type is not None:
+            self.visit(node.type)
+        if node.name is not None:
+            self.scope.bind(node.name, LOCAL)
+        for statement in node.body:
+            self.visit(statement)
+
+    def visit_Delete(self, node: ast.Delete) -> None:
+        for target in node.targets:
+            self.bind_target(target)
+
+    def visit_MatchAs(self, node: ast.AST) -> None:
+        if node.name is not None:
+            self.scope.bind(node.name, LOCAL)
+        self.generic_visit(node)
+
+    def visit_MatchStar(self, node: ast.AST) -> None:
+        if node.name is not None:
+            self.scope.bind(node.name, LOCAL)
+
+    def visit_MatchMapping(self, node: ast.AST) -> None:
+        if node.rest is not None:
+            self.scope.bind(node.rest, LOCAL)
+        self.generic_visit(node)
+
+
+class ReferenceCollector(ast.NodeVisitor):
+    """The second pass: resolves the names and attributes a module reads, and records their references."""
+
+    def __init__(self, resolver: StaticReferenceResolver, module: ModuleInfo):
+        self.resolver = resolver
+        self.module = module
+        self.scope = resolver.scopes[id(module.tree)]
+
+    def collect(self) -> None:
+        self.visit(self.module.tree)
+
+    def record(self, target: object, name: str, line: int, column: int) -> None:
+        if isinstance(target, Definition):
+            # a use under another name, like an import alias, is not a reference to the definition name
+            if target.name == name:
+                target.references.append((self.module.file_path, line, column))
+        elif target is None:
+            self.resolver.unresolved_names.add(name)
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if not isinstance(node.ctx, ast.Load):
+            return
+        if is_variable(self.resolver.lookup(self.scope, node.id)):
+            # jedi doesn't see a variable as a reference to the definitions of the same name
+            return
+        self.record(self.resolver.resolve(node, self.scope), node.id, node.lineno, node.col_offset)
+
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        self.visit(node.value)
+        value = self.resolver.resolve(node.value, self.scope)
+        if value == EXTERNAL:
+            return
+        target = None if value is None else self.resolver.member(value, node.attr)
+        # the attribute name ends the expression, which may span several lines
+        self.record(target, node.attr, node.end_lineno, node.end_col_offset - len(node.attr))
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        module_name = resolve_import(node.module, node.level, self.module.name, self.module.is_package)
+        for alias in node.names:
+            if alias.name != "*":
+                target = self.resolver.resolve_binding(ImportedName(module_name, alias.name))
+                self.record(target, alias.name, alias.lineno, alias.col_offset)
+
+    def visit_in_scope(self, node: ast.AST, children: List[ast.AST]) -> None:
+        parent = self.scope
+        self.scope = self.resolver.scopes[id(node)]
+        for child in children:
+            self.visit(child)
+        self.scope = parent
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        for child in node.decorator_list + node.bases + [keyword.value for keyword in node.keywords]:
+            self.visit(child)
+        self.visit_in_scope(node, node.body)
+
+    def visit_function(self, node: ast.AST) -> None:
+        arguments = node.args
+        for child in arguments.defaults + [default for default in arguments.kw_defaults if default is not None]:
+            self.visit(child)
+        if isinstance(node, ast.Lambda):
+            self.visit_in_scope(node, [node.body])
+            return
+        all_arguments = arguments.posonlyargs + arguments.args + arguments.kwonlyargs + [arguments.vararg, arguments.kwarg]
+        for argument in all_arguments:
+            if argument is not None and argument.annotation is not None:
+                self.visit(argument.annotation)
+        for child in node.decorator_list + ([node.returns] if node.returns is not None else []):
+            self.visit(child)
+        self.visit_in_scope(node, node.body)
+
+    visit_FunctionDef = visit_function
+    visit_AsyncFunctionDef = visit_function
+    visit_Lambda = visit_function
+
+    def visit_comprehension_scope(self, node: ast.AST, elements: List[ast.AST]) -> None:
+        self.visit(node.generators[0].iter)
+        children = []
+        for index, generator in enumerate(node.generators):
+            children += ([generator.iter] if index > 0 else []) + [generator.target] + generator.ifs
+        self.visit_in_scope(node, children + elements)
+
+    def visit_ListComp(self, node: ast.AST) -> None:
+        self.visit_comprehension_scope(node, [node.elt])
+
+    visit_SetComp = visit_ListComp
+    visit_GeneratorExp = visit_ListComp
+
+    def visit_DictComp(self, node: ast.DictComp) -> None:
+        self.visit_comprehension_scope(node, [node.key, node.value])
@@ -2,16 +2,28 @@ from __future__ import annotations
 import threading
 import time
 import random
-from typing import List, Callable, Dict, Any
+import heapq
+from collections import deque
+from contextlib import nullcontext
+from typing import List, Callable, Dict, Any, Optional
 from colorama import Fore, Style
 
+from dynamodocs.mylogger import logger
+from dynamodocs.tracing import tracer
+
 
 class Task:
-    def __init__(self, task_id: int, dependencies: List[Task], extra_info: Any = None):
+    def __init__(self, task_id: int, dependencies: List[Task], extra_info: Any = None, cost: float = 1.0,
+                 group: Any = None, affinity: Any = None):
         self.task_id = task_id
         self.extra_info = extra_info
         self.dependencies = dependencies
+        self.dependents: List[Task] = []
         self.status = 0
+        self.cost = cost
+        self.priority = 0.0
+        self.group = group
+        self.affinity = affinity
 
 
 class TaskManager:
@@ -24,6 +36,9 @@ class TaskManager:
         Attributes:
         - task_dict (Dict[int, Task]): A dictionary that maps task IDs to Task objects.
         - task_lock (threading.Lock): A lock used for thread synchronization when accessing the task_dict.
+        - ready_heap (List[tuple]): A heap of the (negated priority, ID) of the tasks whose dependencies are all completed.
+        - ready_groups (Dict[Any, List[int]]): The IDs of the ready tasks of every group, may hold stale IDs.
+        - ready_affinities (Dict[Any, deque]): The IDs of the ready tasks of every affinity, may hold stale IDs.
         - now_id (int): The current task ID.
         - query_id (int): The current query ID.
         - sync_func (None): A placeholder for a synchronization function.
@@ -31,6 +46,9 @@ class TaskManager:
         """
         self.task_dict: Dict[int, Task] = {}
         self.task_lock = threading.Lock()
+        self.ready_heap: List[tuple] = []
+        self.ready_groups: Dict[Any, List[int]] = {}
+        self.ready_affinities: Dict[Any, deque] = {}
         self.now_id = 0
         self.query_id = 0
         self.sync_func = None
@@ -39,53 +57,139 @@ class TaskManager:
     def all_success(self) -> bool:
         return len(self.task_dict) == 0
 
-    def add_task(self, dependency_task_id: List[int], extra=None) -> int:
+    def add_task(self, dependency_task_id: List[int], extra=None, cost: float = 1.0, group: Any = None,
+                 affinity: Any = None) -> int:
         """
         Adds a new task to the task dictionary.
 
         Args:
             dependency_task_id (List[int]): List of task IDs that the new task depends on.
             extra (Any, optional): Extra information associated with the task. Defaults to None.
+            cost (float, optional): The estimated run time of the task, used by `prioritize`. Defaults to 1.0.
+            group (Any, optional): The group of the task, ready tasks of a group can be claimed together with `claim_group`.
+            affinity (Any, optional): The affinity of the task, a worker asking for a given affinity gets such a task first.
 
         Returns:
             int: The ID of the newly added task.
         """
-        with self.task_lock:
+        with tracer.locked(self.task_lock, "task_lock"):
             depend_tasks = [self.task_dict[task_id]
                             for task_id in dependency_task_id]
-            self.task_dict[self.now_id] = Task(
-                task_id=self.now_id, dependencies=depend_tasks, extra_info=extra
+            new_task = Task(
+                task_id=self.now_id, dependencies=depend_tasks, extra_info=extra, cost=cost, group=group,
+                affinity=affinity
             )
+            for depend_task in depend_tasks:
+                depend_task.dependents.append(new_task)
+            self.task_dict[self.now_id] = new_task
+            if len(depend_tasks) == 0:
+                self._push_ready(new_task)
             self.now_id += 1
             return self.now_id - 1
 
-    def get_next_task(self, process_id: int) -> tuple[Task, int]:
+    def _push_ready(self, task: Task) -> None:
+        heapq.heappush(self.ready_heap, (-task.priority, task.task_id))
+        if task.group is not None:
+            self.ready_groups.setdefault(task.group, []).append(task.task_id)
+        if task.affinity is not None:
+            self.ready_affinities.setdefault(
+                task.affinity, deque()).append(task.task_id)
+
+    def _ready_task(self, task_id: int) -> Optional[Task]:
+        task = self.task_dict.get(task_id)
+        if task is None or task.status != 0 or len(task.dependencies) > 0:
+            return None
+        return task
+
+    def _pop_ready(self, affinity: Any) -> Optional[Task]:
+        if affinity is not None:
+            candidates = self.ready_affinities.get(affinity)
+            while candidates:
+                task = self._ready_task(candidates.popleft())
+                if task is not None:
+                    return task
+            self.ready_affinities.pop(affinity, None)
+        while self.ready_heap:
+            _, task_id = heapq.heappop(self.ready_heap)
+            task = self._ready_task(task_id)
+            if task is not None:
+                return task
+        return None
+
+    def prioritize(self) -> None:
+        """
+        Give every task the priority of its critical path, and reorder the ready tasks accordingly.
+
+        The priority of a task is its cost plus the highest priority among its dependents, i.e. the
+        cost of the longest chain of work that cannot start before the task is done. Starting these
+        chains first keeps the workers busy at the end of the run. Dependents are always added after
+        their dependencies, so the priorities are computed in a single pass by decreasing ID.
+        """
+        with tracer.locked(self.task_lock, "task_lock"):
+            for task_id in sorted(self.task_dict, reverse=True):
+                task = self.task_dict[task_id]
+                task.priority = task.cost + max(
+                    (dependent.priority for dependent in task.dependents), default=0.0)
+            self.ready_heap = [(-task.priority, task.task_id) for task in self.task_dict.values()
+                               if task.status == 0 and len(task.dependencies) == 0]
+            heapq.heapify(self.ready_heap)
+
+    def get_next_task(self, process_id: int, affinity: Any = None) -> tuple[Task, int]:
         """
         Get the next task for a given process ID.
 
+        Ready tasks with the requested affinity are handed out first, in the order they became ready.
+        Otherwise ready tasks are handed out by decreasing priority, then in the order they were added.
+
         Args:
             process_id (int): The ID of the process.
+            affinity (Any, optional): The affinity of the last task of the process.
 
         Returns:
             tuple: A tuple containing the next task object and its ID.
                    If there are no available tasks, returns (None, -1).
         """
-        with self.task_lock:
+        with tracer.locked(self.task_lock, "task_lock"):
             self.query_id += 1
-            for task_id in self.task_dict.keys():
-                ready = (
-                    len(self.task_dict[task_id].dependencies) == 0
-                ) and self.task_dict[task_id].status == 0
-                if ready:
-                    self.task_dict[task_id].status = 1
-                    print(
-                        f"{Fore.RED}[process {process_id}]{Style.RESET_ALL}: get task({task_id}), remain({
-                            len(self.task_dict)})"
-                    )
-                    if self.query_id % 10 == 0:
-                        self.sync_func()
-                    return self.task_dict[task_id], task_id
-            return None, -1
+            task = self._pop_ready(affinity)
+            if task is None:
+                return None, -1
+            task.status = 1
+            print(
+                f"{Fore.RED}[process {process_id}]{Style.RESET_ALL}: get task({task.task_id}), remain({
+                    len(self.task_dict)})"
+            )
+            if self.query_id % 10 == 0:
+                self.sync_func()
+            return task, task.task_id
+
+    def claim_group(self, task: Task, accept: Callable[[Any], bool], max_count: int) -> List[Task]:
+        """
+        Claim other ready tasks of the same group as `task`, to process them together with it.
+
+        Args:
+            task (Task): A task claimed by the caller.
+            accept (Callable): Called with the extra information of every candidate, returns whether to take it.
+            max_count (int): The maximum number of tasks to claim.
+
+        Returns:
+            List[Task]: The claimed tasks, which the caller must mark as completed.
+        """
+        with tracer.locked(self.task_lock, "task_lock"):
+            claimed = []
+            still_ready = []
+            for task_id in self.ready_groups.pop(task.group, []):
+                other = self._ready_task(task_id)
+                if other is None:
+                    continue
+                if len(claimed) < max_count and accept(other.extra_info):
+                    other.status = 1
+                    claimed.append(other)
+                else:
+                    still_ready.append(task_id)
+            if still_ready:
+                self.ready_groups[task.group] = still_ready
+            return claimed
 
     def mark_completed(self, task_id: int) -> None:
         """
@@ -95,15 +199,18 @@ class TaskManager:
             task_id (int): The ID of the task to mark as completed.
 
         """
-        with self.task_lock:
+        with tracer.locked(self.task_lock, "task_lock"):
             target_task = self.task_dict[task_id]
-            for task in self.task_dict.values():
+            for task in target_task.dependents:
                 if target_task in task.dependencies:
                     task.dependencies.remove(target_task)
+                    if len(task.dependencies) == 0 and task.status == 0:
+                        self._push_ready(task)
             self.task_dict.pop(task_id)
 
 
-def worker(task_manager: TaskManager, process_id: int, handler: Callable):
+def worker(task_manager: TaskManager, process_id: int, handler: Callable,
+           batch_func: Optional[Callable[[TaskManager, Task], List[Task]]] = None):
     """
     Worker function that performs tasks assigned by the task manager.
 
@@ -111,19 +218,178 @@ def worker(task_manager: TaskManager, process_id: int, handler: Callable):
         task_manager: The task manager object that assigns tasks to workers.
         process_id (int): The ID of the current worker process.
         handler (Callable): The function that handles the tasks.
+        batch_func (Callable, optional): Claims more tasks to handle together with a claimed one.
+            When given, the handler is called with the list of the extra information of the batch.
 
     Returns:
         None
     """
+    affinity = None
     while True:
         if task_manager.all_success:
             return
-        task, task_id = task_manager.get_next_task(process_id)
+        task, task_id = task_manager.get_next_task(process_id, affinity)
         if task is None:
-            time.sleep(0.5)
+            with tracer.span("queue wait", "queue"):
+                time.sleep(0.5)
             continue
-        handler(task.extra_info)
+        # stay on related tasks, e.g. the objects of the same file sharing a prompt prefix
+        affinity = task.affinity
+        handle_task(task_manager, task, handler, batch_func)
+
+
+def handle_task(task_manager: TaskManager, task: Task, handler: Callable,
+                batch_func: Optional[Callable[[TaskManager, Task], List[Task]]] = None) -> List[Task]:
+    """
+    Handle a claimed task, with the other tasks batch_func claims along with it, and mark them completed.
+
+    Returns:
+        List[Task]: The handled tasks.
+    """
+    if batch_func is None:
+        with tracer.span("task", "task", task_id=task.task_id):
+            handler(task.extra_info)
         task_manager.mark_completed(task.task_id)
+        return [task]
+    batch = [task] + batch_func(task_manager, task)
+    with tracer.span("task", "task", task_id=task.task_id, batch_size=len(batch)):
+        handler([batch_task.extra_info for batch_task in batch])
+    for batch_task in batch:
+        task_manager.mark_completed(batch_task.task_id)
+    return batch
+
+
+class QueueEntry:
+    """The tasks of a task manager in a GenerationQueue, with how much the workers served it."""
+
+    def __init__(self, task_manager: TaskManager, handler: Callable, batch_func: Optional[Callable],
+                 context: Callable, served_cost: float):
+        self.task_manager = task_manager
+        self.handler = handler
+        self.batch_func = batch_func
+        self.context = context
+        self.served_cost = served_cost
+        self.in_flight = 0
+        self.done = threading.Event()
+        # the exception a task raised, the other tasks of the task manager are not handled anymore
+        self.error: Optional[BaseException] = None
+
+
+class GenerationQueue:
+    """
+    One pool of workers running the tasks of several task managers, e.g. one per repository of a batch run.
+
+    The size of the pool is the one concurrency limit of all the task managers. Every worker takes its
+    next task from the task manager served the least so far, by the estimated cost of the tasks handed
+    out to it, among the ones with a ready task. A repository with a long queue doesn't hold up the
+    others, and the workers left idle by a repository waiting on dependencies serve the others. A task
+    manager added later starts at the least served cost of the others, so it doesn't take all the
+    workers until it catches up.
+
+    Args:
+        thread_count (int): The number of workers.
+    """
+
+    def __init__(self, thread_count: int):
+        self.thread_count = thread_count
+        self.entries: List[QueueEntry] = []
+        self.condition = threading.Condition()
+        self.closed = False
+        self.threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        self.threads = [threading.Thread(target=self.worker, args=(process_id,), name=f"generation {process_id}",
+                                         daemon=True)
+                        for process_id in range(self.thread_count)]
+        for thread in self.threads:
+            thread.start()
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join()
+
+    def run(self, task_manager: TaskManager, handler: Callable,
+            batch_func: Optional[Callable[[TaskManager, Task], List[Task]]] = None,
+            context: Callable = nullcontext) -> None:
+        """
+        Run the tasks of a task manager with the workers of the queue, alongside the other task managers.
+
+        Args:
+            task_manager (TaskManager): The tasks.
+            handler (Callable): The function that handles the tasks, as given to `worker`.
+            batch_func (Callable, optional): Claims more tasks to handle together with a claimed one, as given to `worker`.
+            context (Callable, optional): Returns the context manager the tasks are claimed and handled in,
+                e.g. the scope of the config of their repository.
+
+        Returns:
+            None, once all the tasks are completed.
+
+        Raises:
+            RuntimeError: When a task raised, once the tasks the workers had already claimed are handled.
+        """
+        if task_manager.all_success:
+            return
+        with self.condition:
+            served_cost = min((entry.served_cost for entry in self.entries), default=0.0)
+            entry = QueueEntry(task_manager, handler, batch_func, context, served_cost)
+            self.entries.append(entry)
+            self.condition.notify_all()
+        entry.done.wait()
+        with self.condition:
+            self.condition.wait_for(lambda: entry.in_flight == 0)
+            self.entries.remove(entry)
+        if entry.error is not None:
+            raise RuntimeError("A task of the generation queue failed") from entry.error
+
+    def claim(self, process_id: int, last_entry: Optional[QueueEntry], affinity: Any) -> tuple:
+        """The least served entry with a ready task, and the task claimed from it, (None, None) when no task is ready."""
+        with self.condition:
+            entries = sorted((entry for entry in self.entries if not entry.done.is_set()),
+                             key=lambda entry: (entry.served_cost, entry.in_flight))
+        for entry in entries:
+            with entry.context():
+                task, _ = entry.task_manager.get_next_task(
+                    process_id, affinity if entry is last_entry else None)
+            if task is not None:
+                with self.condition:
+                    entry.in_flight += 1
+                    # charged when claimed, the workers claiming at the same time spread on the entries
+                    entry.served_cost += task.cost
+                return entry, task
+        return None, None
+
+    def worker(self, process_id: int) -> None:
+        last_entry, affinity = None, None
+        while True:
+            with self.condition:
+                if self.closed:
+                    return
+            entry, task = self.claim(process_id, last_entry, affinity)
+            if task is None:
+                with tracer.span("queue wait", "queue"):
+                    with self.condition:
+                        self.condition.wait(0.5)
+                continue
+            last_entry, affinity = entry, task.affinity
+            handled = [task]
+            try:
+                with entry.context():
+                    handled = handle_task(entry.task_manager, task, entry.handler, entry.batch_func)
+            except Exception as e:
+                # the task is never completed, the run waiting on its task manager is released with the error
+                logger.exception("Generation queue: a task failed, the run of its task manager is stopped")
+                entry.error = e
+            finally:
+                with self.condition:
+                    entry.in_flight -= 1
+                    entry.served_cost += sum(handled_task.cost for handled_task in handled[1:])
+                    if entry.error is not None or entry.task_manager.all_success:
+                        entry.done.set()
+                    # the completed tasks may have made others ready
+                    self.condition.notify_all()
 
 
 if __name__ == "__main__":
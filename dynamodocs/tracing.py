@@ -0,0 +1,157 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, List
+from prettytable import PrettyTable
+
+
+class Span:
+    """Context manager recording one complete event of the tracer."""
+
+    def __init__(self, tracer: "Tracer", name: str, category: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.tracer.record(self.name, self.category, self.start,
+                           time.perf_counter_ns(), self.args)
+        return False
+
+
+class LockSpan:
+    """Acquires a lock like `with lock:`, recording the time spent waiting for it."""
+
+    def __init__(self, tracer: "Tracer", lock: threading.Lock, name: str):
+        self.tracer = tracer
+        self.lock = lock
+        self.name = name
+
+    def __enter__(self):
+        start = time.perf_counter_ns()
+        self.lock.acquire()
+        self.tracer.record(f"wait {self.name}", "lock",
+                           start, time.perf_counter_ns(), {})
+        return self.lock
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.lock.release()
+        return False
+
+
+class Tracer:
+    """
+    Lightweight tracer recording timed spans of a documentation run.
+
+    The tracer is disabled by default, in which case `span` and `locked` cost next to nothing.
+    Once enabled, every span is kept in memory with its thread, and can be exported as a Chrome
+    trace-event file (open it in chrome://tracing or https://ui.perfetto.dev) or summarized in a table.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events: List[Dict[str, Any]] = []
+        self.thread_names: Dict[int, str] = {}
+        self.events_lock = threading.Lock()
+        self.origin_ns = time.perf_counter_ns()
+
+    def enable(self) -> None:
+        self.enabled = True
+        self.origin_ns = time.perf_counter_ns()
+
+    def span(self, name: str, category: str = "stage", **args):
+        """
+        Returns a context manager timing the enclosed block.
+
+        Args:
+            name (str): The name of the span, spans with the same name are summed up in the summary.
+            category (str, optional): The category of the span, e.g. stage, task, llm or lock.
+            **args: Extra values attached to the event.
+        """
+        if not self.enabled:
+            return nullcontext()
+        return Span(self, name, category, args)
+
+    def traced(self, name: str, category: str = "stage"):
+        """Decorator wrapping every call of the decorated function in a span."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name, category):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def locked(self, lock: threading.Lock, name: str):
+        """Returns a context manager holding `lock`, which records the wait for it as a `wait <name>` span."""
+        if not self.enabled:
+            return lock
+        return LockSpan(self, lock, name)
+
+    def record(self, name: str, category: str, start_ns: int, end_ns: int, args: Dict[str, Any]) -> None:
+        thread = threading.current_thread()
+        with self.events_lock:
+            self.thread_names.setdefault(thread.ident, thread.name)
+            self.events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start_ns - self.origin_ns) / 1000,
+                "dur": (end_ns - start_ns) / 1000,
+                "pid": os.getpid(),
+                "tid": thread.ident,
+                "args": args,
+            })
+
+    def export_chrome_trace(self, path: str) -> None:
+        """Write the recorded spans to `path` in the Chrome trace-event JSON format."""
+        with self.events_lock:
+            metadata = [
+                {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+                 "args": {"name": thread_name}}
+                for tid, thread_name in self.thread_names.items()
+            ]
+            trace = {"traceEvents": metadata + list(self.events),
+                     "displayTimeUnit": "ms"}
+        with open(path, "w", encoding="utf-8") as writer:
+            json.dump(trace, writer)
+
+    def summary_table(self) -> PrettyTable:
+        """
+        Summarize the spans by name.
+
+        The share column is relative to the wall time between the first and the last recorded event.
+        Spans of parallel workers are summed, so their share can exceed 100%.
+        """
+        table = PrettyTable(["span", "category", "count",
+                            "total (s)", "mean (s)", "max (s)", "share of wall time"])
+        with self.events_lock:
+            events = list(self.events)
+        if not events:
+            return table
+        wall_us = max(event["ts"] + event["dur"] for event in events) - \
+            min(event["ts"] for event in events)
+        grouped: Dict[tuple, List[float]] = {}
+        for event in events:
+            grouped.setdefault(
+                (event["name"], event["cat"]), []).append(event["dur"])
+        for (name, category), durations in sorted(grouped.items(), key=lambda x: -sum(x[1])):
+            total = sum(durations)
+            table.add_row([
+                name, category, len(durations),
+                f"{total / 1e6:.3f}", f"{total / len(durations) / 1e6:.4f}",
+                f"{max(durations) / 1e6:.3f}",
+                f"{100 * total / wall_us:.1f}%" if wall_us > 0 else "-",
+            ])
+        return table
+
+
+tracer = Tracer()
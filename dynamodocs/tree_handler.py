@@ -6,16 +6,41 @@ from typing import Any, Dict, List, Optional
 from colorama import Fore, Style
 from prettytable import PrettyTable
 from tqdm import tqdm
-from functools import partial
+from functools import lru_cache, partial
 import jedi
 import os
 import json
+import heapq
+import ast
+import copy
 
 from dynamodocs.config import CONFIG
 from dynamodocs.mylogger import logger
-from dynamodocs.file_handler import FileHandler
+from dynamodocs.file_handler import FileHandler, parse_error_message
 from dynamodocs.utils.meta_info_utils import latest_verison_substring
+from dynamodocs.utils.path_filter import get_path_filter
 from dynamodocs.threads import TaskManager, Task
+from dynamodocs.tracing import tracer
+from dynamodocs.fast_path import render_fast_path_doc
+from dynamodocs.fingerprint import same_code
+from dynamodocs.doc_history import DOC_HISTORY_FOLDER, DocHistoryStore
+from dynamodocs.code_store import get_code_store
+from dynamodocs.static_references import StaticReferenceResolver
+from dynamodocs.identifier_index import IdentifierIndex, SEARCH_FILE, SEARCH_NONE
+from dynamodocs.shared_structure import SharedStructureStore
+
+
+# rough token model of a generation request, used to estimate which tasks take the longest
+CHARS_PER_TOKEN = 4
+PROMPT_TEMPLATE_TOKENS = 600
+EXPECTED_DOC_TOKENS = 400
+# prompt tokens are processed about this many times faster than tokens are generated
+PREFILL_SPEEDUP = 10
+
+# the task graph of the generation in process, saved next to the hierarchy checkpoint so an
+# interrupted run resumes without resolving the references and building the graph again
+TASK_GRAPH_FILE = "task_graph.json"
+TASK_GRAPH_VERSION = 1
 
 
 @unique
@@ -69,6 +94,8 @@ class DocItem:
     code_start_line: int = -1
     code_end_line: int = -1
     md_content: List[str] = field(default_factory=list)
+    # hashes of the older docs in the DocHistoryStore, from the oldest
+    md_history: List[str] = field(default_factory=list)
     content: Dict[Any, Any] = field(default_factory=dict)
 
     children: Dict[str, DocItem] = field(default_factory=dict)
@@ -122,18 +149,13 @@ class DocItem:
         if (doc_item.item_status == DocItemStatus.doc_upto_date) or (doc_item.item_type in [DocItemType._file, DocItemType._dir, DocItemType._repo]):
             return False
 
-        rel_file_path = doc_item.get_full_name()
-        doc_item = doc_item.parent
-        while doc_item:
-            if doc_item.item_type == DocItemType._file:
-                if any(
-                    rel_file_path.startswith(ignore_item) for ignore_item in ignore_list
-                ):
-                    return False
-                else:
-                    return True
-            doc_item = doc_item.parent
-        return False
+        file_item = doc_item.parent
+        while file_item and file_item.item_type != DocItemType._file:
+            file_item = file_item.parent
+        if file_item is None:
+            return False
+        # the ignored files are not parsed anymore, but an entry can also name an object of a file
+        return not ignore_list or not doc_item.get_full_name().startswith(tuple(ignore_list))
 
     @staticmethod
     def check_has_task(doc: DocItem, ignore_list: List[str]) -> bool:
@@ -153,6 +175,27 @@ class DocItem:
             DocItem.check_has_task(child, ignore_list)
             doc.has_task = child.has_task or doc.has_task
 
+    def estimate_generation_cost(self) -> float:
+        """
+        Estimate the relative time needed to generate the doc of this item, 1.0 being the time to
+        generate a doc of average length.
+
+        The prompt size is estimated from the code and from the docs of the related objects it embeds,
+        with the expected doc length standing in for the docs that are not generated yet.
+
+        Returns:
+            float: The estimated cost.
+        """
+        code_tokens = self.content.get("code_size", len(self.content.get(
+            "code_content", ""))) / CHARS_PER_TOKEN
+        related_tokens = sum(
+            len(item.md_content[-1]) /
+            CHARS_PER_TOKEN if item.md_content else EXPECTED_DOC_TOKENS
+            for item in self.reference_who + self.who_reference_me
+        )
+        prompt_tokens = PROMPT_TEMPLATE_TOKENS + code_tokens + related_tokens
+        return 1 + prompt_tokens / PREFILL_SPEEDUP / EXPECTED_DOC_TOKENS
+
     def get_preorder_traversal(self, _travel_list: Optional[List[DocItem]] = None) -> List[DocItem]:
         """
         Returns a list of `DocItem` objects in preorder traversal.
@@ -225,6 +268,13 @@ class DocItem:
         name_list = name_list[1:]
         return "/".join(name_list)
 
+    def get_code(self) -> str:
+        """Returns the code of the object, sliced from its file when needed, see code_store.py."""
+        file_item = self
+        while file_item.parent is not None and file_item.item_type != DocItemType._file:
+            file_item = file_item.parent
+        return get_code_store(CONFIG["repo_path"]).get_code(file_item.get_full_name(), self.content)
+
     def get_file_name(self) -> str:
         """Returns the file name of the doc_item.
 
@@ -294,7 +344,57 @@ class DocItem:
                                   diff_status=diff_status, ignore_list=ignore_list)
 
 
-def find_all_referencer(repo_path: str, variable_name, file_path: str, line_number, column_number, in_file_only: bool = False):
+# jedi is not thread-safe, the runners of a batch run resolve their references one at a time
+JEDI_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def get_jedi_project(repo_path: str) -> jedi.Project:
+    """The jedi project of a repository, shared by all the reference lookups of the process."""
+    return jedi.Project(repo_path)
+
+
+def find_referencers_in_files(project: jedi.Project, repo_path: str, variable_name, file_path: str, line_number,
+                               column_number, candidate_files: List[str]) -> list:
+    """
+    Find the references to a variable in some files only, instead of the whole project.
+
+    Every occurrence of the name in the files is resolved by jedi, the ones resolving to the variable
+    are references, like the project search of jedi checks the files containing the name.
+
+    Args:
+        project (jedi.Project): The jedi project of the repository.
+        repo_path (str): The path to the repository.
+        variable_name: The name of the variable to find references for.
+        file_path (str): The path to the file where the variable is defined.
+        line_number: The line number where the variable is defined.
+        column_number: The column number where the variable is defined.
+        candidate_files (List[str]): The files to search, relative to the repository.
+
+    Returns:
+        list: The jedi names of the references.
+    """
+    definition_path = os.path.abspath(os.path.join(repo_path, file_path))
+    references = []
+    for candidate_file in candidate_files:
+        try:
+            script = jedi.Script(path=os.path.join(
+                repo_path, candidate_file), project=project)
+            for name in script.get_names(all_scopes=True, definitions=True, references=True):
+                if name.name != variable_name:
+                    continue
+                if any(definition.module_path is not None
+                       and os.path.abspath(definition.module_path) == definition_path
+                       and definition.line == line_number and definition.column == column_number
+                       for definition in name.goto(follow_imports=True)):
+                    references.append(name)
+        except Exception as e:
+            logger.error(f"Error in finding references in {candidate_file}: {e}")
+    return references
+
+
+def find_all_referencer(repo_path: str, variable_name, file_path: str, line_number, column_number, in_file_only: bool = False,
+                        candidate_files: Optional[List[str]] = None):
     """
     Find all references to a variable in a given repository.
 
@@ -305,19 +405,27 @@ def find_all_referencer(repo_path: str, variable_name, file_path: str, line_numb
         line_number: The line number where the variable is defined.
         column_number: The column number where the variable is defined.
         in_file_only (bool, optional): If True, only search for references within the same file. Defaults to False.
+        candidate_files (List[str], optional): The only other files that may reference the variable, e.g.
+            given by the identifier index. They are searched one by one instead of the whole project.
 
     Returns:
         list: A list of tuples containing the module path, line number, and column number of each reference.
     """
     # file_path = os.path.relpath(file_path, repo_path)
     try:
-        script = jedi.Script(path=os.path.join(repo_path, file_path))
-        if in_file_only:
-            references = script.get_references(
-                line=line_number, column=column_number, scope="file")
-        else:
-            references = script.get_references(
-                line=line_number, column=column_number)
+        with JEDI_LOCK:
+            project = get_jedi_project(repo_path)
+            script = jedi.Script(path=os.path.join(
+                repo_path, file_path), project=project)
+            if in_file_only or candidate_files is not None:
+                references = script.get_references(
+                    line=line_number, column=column_number, scope="file")
+            else:
+                references = script.get_references(
+                    line=line_number, column=column_number)
+            if candidate_files and not in_file_only:
+                references += find_referencers_in_files(
+                    project, repo_path, variable_name, file_path, line_number, column_number, candidate_files)
         variable_references = [ref for ref in references if ref.name == variable_name
                                and not (ref.line == line_number and ref.column == column_number)]
 
@@ -347,21 +455,59 @@ class MetaInfo:
     jump_files: List[str] = field(default_factory=list)
     deleted_items_from_older_meta: List[List] = field(default_factory=list)
     in_generation_process: bool = False
+    # versions dropped from the doc history since its blobs were last collected
+    dropped_doc_versions: int = 0
+    # the AST index of the references, built once by reference pass when the static resolver is on
+    static_references: Optional[StaticReferenceResolver] = None
+    # the identifier occurrences and reverse import graph narrowing the reference searches
+    identifier_index: Optional[IdentifierIndex] = None
+    # the structure and references shared with the other profiles, and the key of this structure in it
+    shared_structure: Optional[SharedStructureStore] = None
+    structure_key: Optional[str] = None
+    # the changed files that couldn't be parsed, they keep the structure and docs of the older metainfo
+    unparsable_files: List[str] = field(default_factory=list)
 
     checkpoint_lock: threading.Lock = threading.Lock()
 
     @staticmethod
-    def init_meta_info(file_path_reflections: Dict[str, str], jump_files: List[str]) -> MetaInfo:
+    def init_meta_info(file_path_reflections: Dict[str, str], jump_files: List[str],
+                       shared_structure: Optional[SharedStructureStore] = None) -> MetaInfo:
+        """
+        Build the metainfo of the whole repository, without docs.
+
+        Args:
+            file_path_reflections (Dict[str, str]): The fake files of the unstaged changes.
+            jump_files (List[str]): The files to skip.
+            shared_structure (SharedStructureStore, optional): The store of the profiles, the structure
+                is loaded from it when another profile already parsed the same files, and saved to it otherwise.
+
+        Returns:
+            MetaInfo: The new metainfo.
+        """
         abs_path = CONFIG["repo_path"]
         print(f"{Fore.LIGHTRED_EX}Initializing Metainfo: {
               Style.RESET_ALL} from {abs_path}")
         file_handler = FileHandler(abs_path, None)
-        repo_structure = file_handler.generate_overall_structure(
-            file_path_reflections, jump_files)
+        structure_key, repo_structure = None, None
+        if shared_structure is not None:
+            structure_key = SharedStructureStore.structure_key(
+                CONFIG, abs_path, file_handler.list_structure_files(jump_files))
+            if structure_key is not None:
+                repo_structure = shared_structure.load("structure", structure_key)
+        if repo_structure is not None:
+            logger.info("Structure loaded from the shared structure of the profiles")
+        else:
+            repo_structure = file_handler.generate_overall_structure(
+                file_path_reflections, jump_files)
+            if structure_key is not None:
+                shared_structure.save("structure", structure_key, repo_structure)
         metainfo = MetaInfo.from_project_hierarchy_json(repo_structure)
         metainfo.repo_path = abs_path
         metainfo.fake_file_reflection = file_path_reflections
         metainfo.jump_files = jump_files
+        if structure_key is not None:
+            metainfo.shared_structure = shared_structure
+            metainfo.structure_key = structure_key
         return metainfo
 
     @staticmethod
@@ -391,6 +537,7 @@ class MetaInfo:
         )
         return metainfo
 
+    @tracer.traced("checkpoint")
     def checkpoint(self, target_dir_path: str, flash_reference_relation: bool = False) -> None:
         """
         Save the MetaInfo object to the specified directory.
@@ -399,10 +546,15 @@ class MetaInfo:
             target_dir_path (str): The path to the target directory where the MetaInfo will be saved.
             flash_reference_relation (bool, optional): Whether to include flash reference relation in the saved MetaInfo. Defaults to False.
         """
-        with self.checkpoint_lock:
+        with tracer.locked(self.checkpoint_lock, "checkpoint_lock"):
             print(f"{Fore.GREEN}MetaInfo is Refreshed and Saved{Style.RESET_ALL}")
             if not os.path.exists(target_dir_path):
                 os.makedirs(target_dir_path)
+            history_store = DocHistoryStore(
+                os.path.join(target_dir_path, DOC_HISTORY_FOLDER))
+            if not self.in_generation_process:
+                # the workers append to the docs without the lock, they are archived once they are done
+                self.archive_doc_history(history_store)
             now_hierarchy_json = self.to_hierarchy_json(
                 flash_reference_relation=flash_reference_relation
             )
@@ -422,6 +574,163 @@ class MetaInfo:
                 }
                 json.dump(meta, writer, indent=2, ensure_ascii=False)
 
+            task_graph_path = os.path.join(target_dir_path, TASK_GRAPH_FILE)
+            if not self.in_generation_process and os.path.exists(task_graph_path):
+                # the generation is over, its task graph can't be resumed anymore
+                os.remove(task_graph_path)
+
+            if not self.in_generation_process and self.dropped_doc_versions > 0:
+                removed = history_store.collect_garbage(
+                    digest for item in self.target_repo_hierarchical_tree.get_preorder_traversal()
+                    for digest in item.md_history)
+                logger.info(
+                    f"Doc history: {removed} blobs of dropped versions removed")
+                self.dropped_doc_versions = 0
+
+    def archive_doc_history(self, history_store: DocHistoryStore) -> None:
+        """
+        Move the older docs of every object to the history store, only its latest doc stays inline.
+
+        Each object keeps the hashes of its last `doc_history.max_versions` older docs, a version
+        equal to the previous one is not listed twice. With `max_versions: 0` the older docs are dropped.
+        It must not run while workers generate docs, the docs they append could be lost.
+
+        Args:
+            history_store (DocHistoryStore): The store of the hierarchy folder.
+        """
+        max_versions = (CONFIG.get("doc_history") or {}).get("max_versions", 10)
+        for item in self.target_repo_hierarchical_tree.get_preorder_traversal():
+            if len(item.md_content) <= 1 and len(item.md_history) <= max_versions:
+                continue
+            if max_versions > 0:
+                for older_doc in item.md_content[:-1]:
+                    digest = history_store.put(older_doc)
+                    if not item.md_history or item.md_history[-1] != digest:
+                        item.md_history.append(digest)
+            else:
+                self.dropped_doc_versions += len(item.md_content) - 1
+            item.md_content = item.md_content[-1:]
+            if len(item.md_history) > max_versions:
+                self.dropped_doc_versions += len(item.md_history) - max_versions
+                item.md_history = item.md_history[len(item.md_history) - max_versions:]
+
+    def get_tree_keys(self) -> Dict[int, List[str]]:
+        """The keys leading from the root to every item of the tree, by item id."""
+        tree_keys = {}
+
+        def walk(item: DocItem, keys: List[str]) -> None:
+            tree_keys[id(item)] = keys
+            for key, child in item.children.items():
+                walk(child, keys + [key])
+
+        walk(self.target_repo_hierarchical_tree, [])
+        return tree_keys
+
+    @tracer.traced("checkpoint")
+    def save_task_graph(self, task_manager: TaskManager, target_dir_path: str) -> None:
+        """
+        Save the scheduled tasks with their dependencies, and the references the prompts are built from.
+
+        The completion of the tasks is not saved here: the checkpoint written after every generated
+        doc already records the status of its object.
+
+        Args:
+            task_manager (TaskManager): The scheduled tasks, before any of them runs.
+            target_dir_path (str): The hierarchy checkpoint folder.
+        """
+        tree_keys = self.get_tree_keys()
+        tasks = [
+            {"id": task_id, "item": tree_keys[id(task.extra_info)], "cost": task.cost,
+             "dependencies": [dependency.task_id for dependency in task.dependencies]}
+            for task_id, task in sorted(task_manager.task_dict.items())
+        ]
+        references = self.dump_references(tree_keys)
+        os.makedirs(target_dir_path, exist_ok=True)
+        with open(os.path.join(target_dir_path, TASK_GRAPH_FILE), "w", encoding="utf-8") as writer:
+            json.dump({"version": TASK_GRAPH_VERSION, "doc_version": self.document_version,
+                       "tasks": tasks, "references": references},
+                      writer, ensure_ascii=False, separators=(",", ":"))
+
+    @tracer.traced("topology")
+    def load_task_graph(self, checkpoint_dir_path: str, task_available_func) -> Optional[TaskManager]:
+        """
+        Rebuild the task graph of an interrupted generation, with the tasks left to run.
+
+        The references are linked again from the saved graph, and the tasks whose object is
+        already documented are dropped, with the dependencies on them.
+
+        Args:
+            checkpoint_dir_path (str): The hierarchy checkpoint folder.
+            task_available_func: Tells whether the object of a task still needs its doc.
+
+        Returns:
+            Optional[TaskManager]: The remaining tasks, None when no saved graph matches the hierarchy.
+        """
+        task_graph_path = os.path.join(checkpoint_dir_path, TASK_GRAPH_FILE)
+        if not os.path.exists(task_graph_path):
+            return None
+        with open(task_graph_path, "r", encoding="utf-8") as reader:
+            task_graph = json.load(reader)
+        if task_graph.get("version") != TASK_GRAPH_VERSION or task_graph.get("doc_version") != self.document_version:
+            return None
+
+        task_items = [self.find_by_tree_keys(task["item"]) for task in task_graph["tasks"]]
+        if any(item is None for item in task_items) or not self.link_saved_references(task_graph["references"]):
+            return None
+
+        prefix_stable = CONFIG.get("prompt_layout") == "prefix_stable"
+        task_manager = TaskManager()
+        task_ids: Dict[int, int] = {}
+        for task, item in zip(task_graph["tasks"], task_items):
+            if task_available_func is not None and not task_available_func(item):
+                continue
+            task_ids[task["id"]] = task_manager.add_task(
+                dependency_task_id=[task_ids[dependency] for dependency in task["dependencies"]
+                                    if dependency in task_ids],
+                extra=item, cost=task["cost"], group=id(item.parent),
+                affinity=item.get_file_name() if prefix_stable else None,
+            )
+            item.multithread_task_id = task_ids[task["id"]]
+        if (CONFIG.get("task_priority") or "critical_path") == "critical_path":
+            task_manager.prioritize()
+        return task_manager
+
+    def find_by_tree_keys(self, keys: List[str]) -> Optional[DocItem]:
+        return self.target_repo_hierarchical_tree.find(keys) if keys else self.target_repo_hierarchical_tree
+
+    def dump_references(self, tree_keys: Optional[Dict[int, List[str]]] = None) -> List[list]:
+        """The references of the tree, as `[item keys, [[referenced keys, special reference type], ...]]` lists."""
+        tree_keys = tree_keys or self.get_tree_keys()
+        return [
+            [tree_keys[id(item)], [[tree_keys[id(referenced)], special]
+                                   for referenced, special in zip(item.reference_who, item.special_reference_type)]]
+            for item in self.target_repo_hierarchical_tree.get_preorder_traversal() if item.reference_who
+        ]
+
+    def link_saved_references(self, saved_references: List[list]) -> bool:
+        """
+        Replace the references of the tree with the ones saved by dump_references.
+
+        Returns:
+            bool: False when an item of the saved references is not in the tree, the references are left untouched then.
+        """
+        references = []
+        for item_keys, referenced_list in saved_references:
+            item = self.find_by_tree_keys(item_keys)
+            referenced_items = [(self.find_by_tree_keys(keys), special) for keys, special in referenced_list]
+            if item is None or any(referenced is None for referenced, _ in referenced_items):
+                return False
+            references.append((item, referenced_items))
+
+        for item in self.target_repo_hierarchical_tree.get_preorder_traversal():
+            item.reference_who, item.who_reference_me, item.special_reference_type = [], [], []
+        for item, referenced_items in references:
+            for referenced, special in referenced_items:
+                item.reference_who.append(referenced)
+                item.special_reference_type.append(special)
+                referenced.who_reference_me.append(item)
+        return True
+
     def print_task_list(self, task_dict: Dict[int, Task]):
         task_table = PrettyTable(
             ["task_id", "Doc Generation Reason", "Path", "dependency"])
@@ -450,6 +759,7 @@ class MetaInfo:
         return MetaInfo.from_project_hierarchy_json(project_hierarchy_json)
 
     @staticmethod
+    @tracer.traced("build hierarchy")
     def from_project_hierarchy_json(project_hierarchy_json) -> MetaInfo:
         target_meta_info = MetaInfo(
             target_repo_hierarchical_tree=DocItem(
@@ -500,6 +810,7 @@ class MetaInfo:
                     item_name=value["name"],
                     content=value,
                     md_content=value["md_content"],
+                    md_history=value.get("md_history", []),
                     code_start_line=value["code_start_line"],
                     code_end_line=value["code_end_line"],
                 )
@@ -579,6 +890,7 @@ class MetaInfo:
                 temp_json_obj["name"] = now_obj.item_name
                 temp_json_obj["type"] = now_obj.item_type.to_str()
                 temp_json_obj["md_content"] = now_obj.md_content
+                temp_json_obj["md_history"] = now_obj.md_history
                 temp_json_obj["item_status"] = now_obj.item_status.name
 
                 if flash_reference_relation:
@@ -642,18 +954,44 @@ class MetaInfo:
                 return now_node
         return now_node
 
+    def begin_reference_pass(self) -> None:
+        """Index the files for the pre-filter and the static resolver, when they are configured, before resolving references."""
+        references_config = CONFIG.get("references") or {}
+        file_paths = [file_node.get_full_name() for file_node in self.get_all_files()]
+        self.identifier_index = IdentifierIndex(
+            self.repo_path, file_paths) if references_config.get("prefilter", False) else None
+        self.static_references = StaticReferenceResolver(
+            self.repo_path, file_paths) if references_config.get("resolver", "jedi") == "static" else None
+
+    def end_reference_pass(self) -> None:
+        for index in [self.identifier_index, self.static_references]:
+            if index is not None:
+                logger.info(index.summary())
+        self.identifier_index, self.static_references = None, None
+
+    @tracer.traced("references")
     def parse_reference(self):
+        references_key = None
+        if self.shared_structure is not None:
+            references_key = SharedStructureStore.references_key(
+                CONFIG, self.structure_key, self.white_list, self.fake_file_reflection, self.jump_files)
+            saved_references = self.shared_structure.load("references", references_key)
+            if saved_references is not None and self.link_saved_references(saved_references):
+                logger.info("References linked from the shared structure of the profiles")
+                return
+
         file_nodes = self.get_all_files()
+        self.begin_reference_pass()
 
         white_list_file_names, white_list_obj_names = (
-            [],
-            [],
+            set(),
+            set(),
         )
         if self.white_list != None:
-            white_list_file_names = [cont["file_path"]
-                                     for cont in self.white_list]
-            white_list_obj_names = [cont["id_text"]
-                                    for cont in self.white_list]
+            white_list_file_names = {cont["file_path"]
+                                     for cont in self.white_list}
+            white_list_obj_names = {cont["id_text"]
+                                    for cont in self.white_list}
 
         for file_node in tqdm(file_nodes, desc="parsing bidirectional reference"):
             assert not file_node.get_full_name().endswith(latest_verison_substring)
@@ -662,7 +1000,7 @@ class MetaInfo:
             rel_file_path = file_node.get_full_name()
             assert rel_file_path not in self.jump_files
 
-            if white_list_file_names != [] and (
+            if white_list_file_names and (
                 file_node.get_file_name() not in white_list_file_names
             ):
                 continue
@@ -670,112 +1008,184 @@ class MetaInfo:
             def walk_file(now_obj: DocItem):
                 nonlocal ref_count, white_list_file_names
                 in_file_only = False
-                if white_list_obj_names != [] and (
+                if white_list_obj_names and (
                     now_obj.item_name not in white_list_obj_names
                 ):
                     in_file_only = True
 
-                reference_list = find_all_referencer(
-                    repo_path=self.repo_path,
-                    variable_name=now_obj.item_name,
-                    file_path=rel_file_path,
-                    line_number=now_obj.content["code_start_line"],
-                    column_number=now_obj.content["name_column"],
-                    in_file_only=in_file_only,
-                )
-                for referencer_pos in reference_list:
-                    referencer_file_ral_path = referencer_pos[0]
-                    if referencer_file_ral_path in self.fake_file_reflection.values():
-                        print(
-                            f"{Fore.LIGHTBLUE_EX}[Reference From Unstaged Version, skip]{
-                                Style.RESET_ALL} {referencer_file_ral_path} -> {now_obj.get_full_name()}"
-                        )
-                        continue
-                    elif referencer_file_ral_path in self.jump_files:
-                        print(
-                            f"{Fore.LIGHTBLUE_EX}[Reference From Unstracked Version, skip]{
-                                Style.RESET_ALL} {referencer_file_ral_path} -> {now_obj.get_full_name()}"
-                        )
-                        continue
-
-                    target_file_hiera = referencer_file_ral_path.split("/")
-
-                    referencer_file_item = self.target_repo_hierarchical_tree.find(
-                        target_file_hiera)
-                    if referencer_file_item == None:
-                        print(
-                            f"{Fore.LIGHTRED_EX}Error: Find \"{referencer_file_ral_path}\"(not in target repo){
-                                Style.RESET_ALL} referenced {now_obj.get_full_name()}"
-                        )
-                        continue
-                    referencer_node: DocItem = self.find_obj_with_lineno(
-                        referencer_file_item, referencer_pos[1])
-                    if referencer_node.item_name == now_obj.item_name:
-                        logger.info(
-                            f"Jedi find {now_obj.get_full_name(
-                            )} with name_duplicate_reference, skipped"
-                        )
-                        continue
-
-                    if DocItem.check_and_return_ancestor(now_obj, referencer_node) == None:
-                        if now_obj not in referencer_node.reference_who:
-                            special_reference_type = (referencer_node.item_type in [
-                                                      DocItemType._function, DocItemType._sub_function, DocItemType._class_method]) and referencer_node.code_start_line == referencer_pos[1]
-                            referencer_node.special_reference_type.append(
-                                special_reference_type)
-                            referencer_node.reference_who.append(now_obj)
-                            now_obj.who_reference_me.append(referencer_node)
-                            ref_count += 1
+                ref_count += self.add_references(
+                    now_obj, rel_file_path, in_file_only)
                 for _, child in now_obj.children.items():
                     walk_file(child)
 
             for _, child in file_node.children.items():
                 walk_file(child)
+        self.end_reference_pass()
+        if references_key is not None:
+            self.shared_structure.save("references", references_key, self.dump_references())
+
+    def add_references(self, now_obj: DocItem, rel_file_path: str, in_file_only: bool = False) -> int:
+        """
+        Find the referencers of an object and link them both ways.
+
+        The pre-filter skips the search, or narrows it to the file of the object when no other file may
+        reference it, and to the files that may reference it otherwise. The static resolver finds them from the ASTs when it is configured, jedi finds
+        the ones it can't.
+
+        Args:
+            now_obj (DocItem): The referenced object.
+            rel_file_path (str): The file of the object.
+            in_file_only (bool): Only look for referencers in the same file.
+
+        Returns:
+            int: The number of new links.
+        """
+        ref_count = 0
+        candidate_files = None
+        if self.identifier_index is not None:
+            search_scope, candidate_files = self.identifier_index.search_scope(
+                now_obj.item_name, rel_file_path, now_obj.parent.item_type == DocItemType._file)
+            if search_scope == SEARCH_NONE:
+                return ref_count
+            in_file_only = in_file_only or search_scope == SEARCH_FILE
+        path_filter = get_path_filter(CONFIG, scoped=False)
+        reference_list = None
+        if self.static_references is not None:
+            reference_list = self.static_references.find_references(
+                now_obj.item_name, rel_file_path, now_obj.content["code_start_line"], in_file_only)
+        if reference_list is None:
+            reference_list = find_all_referencer(
+                repo_path=self.repo_path,
+                variable_name=now_obj.item_name,
+                file_path=rel_file_path,
+                line_number=now_obj.content["code_start_line"],
+                column_number=now_obj.content["name_column"],
+                in_file_only=in_file_only,
+                candidate_files=candidate_files,
+            )
+        for referencer_pos in reference_list:
+            referencer_file_ral_path = referencer_pos[0]
+            if referencer_file_ral_path in self.fake_file_reflection.values():
+                print(
+                    f"{Fore.LIGHTBLUE_EX}[Reference From Unstaged Version, skip]{
+                        Style.RESET_ALL} {referencer_file_ral_path} -> {now_obj.get_full_name()}"
+                )
+                continue
+            elif referencer_file_ral_path in self.jump_files:
+                print(
+                    f"{Fore.LIGHTBLUE_EX}[Reference From Unstracked Version, skip]{
+                        Style.RESET_ALL} {referencer_file_ral_path} -> {now_obj.get_full_name()}"
+                )
+                continue
+            elif not path_filter.match(referencer_file_ral_path):
+                # jedi searches the whole project, the excluded files are not documented
+                continue
+
+            target_file_hiera = referencer_file_ral_path.split("/")
+
+            referencer_file_item = self.target_repo_hierarchical_tree.find(
+                target_file_hiera)
+            if referencer_file_item == None:
+                print(
+                    f"{Fore.LIGHTRED_EX}Error: Find \"{referencer_file_ral_path}\"(not in target repo){
+                        Style.RESET_ALL} referenced {now_obj.get_full_name()}"
+                )
+                continue
+            referencer_node: DocItem = self.find_obj_with_lineno(
+                referencer_file_item, referencer_pos[1])
+            if referencer_node.item_name == now_obj.item_name:
+                logger.info(
+                    f"Jedi find {now_obj.get_full_name(
+                    )} with name_duplicate_reference, skipped"
+                )
+                continue
 
+            if DocItem.check_and_return_ancestor(now_obj, referencer_node) == None:
+                if now_obj not in referencer_node.reference_who:
+                    special_reference_type = (referencer_node.item_type in [
+                                              DocItemType._function, DocItemType._sub_function, DocItemType._class_method]) and referencer_node.code_start_line == referencer_pos[1]
+                    referencer_node.special_reference_type.append(
+                        special_reference_type)
+                    referencer_node.reference_who.append(now_obj)
+                    now_obj.who_reference_me.append(referencer_node)
+                    ref_count += 1
+        return ref_count
+
+    @tracer.traced("topology")
     def get_task_manager(self, now_node: DocItem, task_available_func) -> TaskManager:
         doc_items = now_node.get_preorder_traversal()
         if self.white_list != None:
 
+            white_list_keys = {(cont["file_path"], cont["id_text"])
+                               for cont in self.white_list}
+
             def in_white_list(item: DocItem):
-                for cont in self.white_list:
-                    if (
-                        item.get_file_name() == cont["file_path"]
-                        and item.item_name == cont["id_text"]
-                    ):
-                        return True
-                return False
+                return (item.get_file_name(), item.item_name) in white_list_keys
 
             doc_items = list(filter(in_white_list, doc_items))
         doc_items = list(filter(task_available_func, doc_items))
         doc_items = sorted(doc_items, key=lambda x: x.depth)
-        deal_items = []
         task_manager = TaskManager()
         bar = tqdm(total=len(doc_items), desc="parsing topology task-list")
-        while doc_items:
-            min_break_level = 1e7
+        # prefix-stable prompts are shared by the objects of a file, keep a worker on the same file
+        prefix_stable = CONFIG.get("prompt_layout") == "prefix_stable"
+
+        available_cache: Dict[int, bool] = {}
+
+        def is_available(item: DocItem) -> bool:
+            if id(item) not in available_cache:
+                available_cache[id(item)] = task_available_func == None or task_available_func(
+                    item)
+            return available_cache[id(item)]
+
+        # An item is ready once all its available children and referenced objects are dealt with.
+        # Ready items are taken in `doc_items` order, the same order a linear scan would find them in.
+        order = {id(item): index for index, item in enumerate(doc_items)}
+        remaining: Dict[int, int] = {}
+        remaining_non_special: Dict[int, int] = {}
+        waiting: Dict[int, List[tuple]] = {}
+        for item in doc_items:
+            remaining[id(item)] = 0
+            remaining_non_special[id(item)] = 0
+            for _, child in item.children.items():
+                if is_available(child):
+                    remaining[id(item)] += 1
+                    waiting.setdefault(id(child), []).append((item, True))
+            for referenced, special in zip(item.reference_who, item.special_reference_type):
+                if is_available(referenced):
+                    remaining[id(item)] += 1
+                    if not special:
+                        remaining_non_special[id(item)] += 1
+                    waiting.setdefault(id(referenced), []).append(
+                        (item, special))
+        ready_heap = [order[id(item)]
+                      for item in doc_items if remaining[id(item)] == 0]
+        heapq.heapify(ready_heap)
+        break_heap = [(remaining_non_special[id(item)], order[id(item)])
+                      for item in doc_items]
+        heapq.heapify(break_heap)
+        dealt = set()
+
+        while len(dealt) < len(doc_items):
             target_item = None
-            for item in doc_items:
-                best_break_level = 0
-                second_best_break_level = 0
-                for _, child in item.children.items():
-                    if task_available_func(child) and (child not in deal_items):
-                        best_break_level += 1
-                for referenced, special in zip(item.reference_who, item.special_reference_type):
-                    if task_available_func(referenced) and (referenced not in deal_items):
-                        best_break_level += 1
-                    if task_available_func(referenced) and (not special) and (referenced not in deal_items):
-                        second_best_break_level += 1
-                if best_break_level == 0:
-                    min_break_level = -1
-                    target_item = item
+            while ready_heap:
+                index = heapq.heappop(ready_heap)
+                if id(doc_items[index]) not in dealt:
+                    target_item = doc_items[index]
                     break
-                if second_best_break_level < min_break_level:
-                    target_item = item
-                    min_break_level = second_best_break_level
 
-            if min_break_level > 0:
-                print(f"circle-reference(second-best still failed), level={
-                      min_break_level}: {target_item.get_full_name()}")
+            if target_item is None:
+                # circle-reference: break it at the first item with the fewest non-special pending references
+                while break_heap:
+                    break_level, index = heapq.heappop(break_heap)
+                    item = doc_items[index]
+                    if id(item) not in dealt and remaining_non_special[id(item)] == break_level:
+                        target_item = item
+                        min_break_level = break_level
+                        break
+                if min_break_level > 0:
+                    print(f"circle-reference(second-best still failed), level={
+                          min_break_level}: {target_item.get_full_name()}")
 
             item_denp_task_ids = []
             for _, child in target_item.children.items():
@@ -790,18 +1200,56 @@ class MetaInfo:
 
             item_denp_task_ids = list(set(item_denp_task_ids))
 
-            if task_available_func == None or task_available_func(target_item):
+            if is_available(target_item):
                 task_id = task_manager.add_task(
-                    dependency_task_id=item_denp_task_ids, extra=target_item
+                    dependency_task_id=item_denp_task_ids, extra=target_item,
+                    cost=target_item.estimate_generation_cost(),
+                    group=id(target_item.parent),
+                    affinity=target_item.get_file_name() if prefix_stable else None,
                 )
                 target_item.multithread_task_id = task_id
 
-            deal_items.append(target_item)
-            doc_items.remove(target_item)
+            dealt.add(id(target_item))
+            for waiting_item, special in waiting.get(id(target_item), []):
+                remaining[id(waiting_item)] -= 1
+                if not special:
+                    remaining_non_special[id(waiting_item)] -= 1
+                    if id(waiting_item) not in dealt:
+                        heapq.heappush(break_heap, (remaining_non_special[id(waiting_item)],
+                                                    order[id(waiting_item)]))
+                if remaining[id(waiting_item)] == 0 and id(waiting_item) not in dealt:
+                    heapq.heappush(ready_heap, order[id(waiting_item)])
             bar.update(1)
 
+        if (CONFIG.get("task_priority") or "critical_path") == "critical_path":
+            task_manager.prioritize()
         return task_manager
 
+    def apply_fast_path(self, rules: List[str], ignore_list: List[str], templates: Optional[Dict[str, str]] = None) -> Dict[str, int]:
+        """
+        Document the objects matched by a fast-path rule from the rule template, without the LLM.
+
+        The documented objects are marked as up to date, so they never become generation tasks.
+
+        Args:
+            rules (List[str]): The names of the enabled rules.
+            ignore_list (List[str]): A list of paths to ignore.
+            templates (Dict[str, str], optional): Templates overriding the default ones, by rule name.
+
+        Returns:
+            Dict[str, int]: The number of documented objects per rule.
+        """
+        counts: Dict[str, int] = {}
+        for item in self.target_repo_hierarchical_tree.get_preorder_traversal():
+            match = item.content.get("fast_path") if item.content else None
+            if match is None or match["rule"] not in rules or not DocItem.need_to_generate(item, ignore_list):
+                continue
+            item.md_content.append(render_fast_path_doc(
+                item.item_name, item.content["type"], item.content.get("params") or [], match, templates))
+            item.item_status = DocItemStatus.doc_upto_date
+            counts[match["rule"]] = counts.get(match["rule"], 0) + 1
+        return counts
+
     def get_topology(self, task_available_func) -> TaskManager:
         self.parse_reference()
         task_manager = self.get_task_manager(
@@ -809,6 +1257,7 @@ class MetaInfo:
         )
         return task_manager
 
+    @tracer.traced("merge older meta")
     def load_doc_from_older_meta(self, older_meta: MetaInfo):
         logger.info("merge doc from an older version of metainfo")
         root_item = self.target_repo_hierarchical_tree
@@ -848,13 +1297,11 @@ class MetaInfo:
                     [now_older_item.get_full_name(), now_older_item.item_type.name])
                 return
             result_item.md_content = now_older_item.md_content
+            result_item.md_history = now_older_item.md_history
             result_item.item_status = now_older_item.item_status
-            if "code_content" in now_older_item.content.keys():
-                assert "code_content" in result_item.content.keys()
-                if (
-                    now_older_item.content["code_content"]
-                    != result_item.content["code_content"]
-                ):
+            if "code_start_line" in now_older_item.content.keys():
+                assert "code_start_line" in result_item.content.keys()
+                if not same_code(now_older_item.content, result_item.content):
                     result_item.item_status = DocItemStatus.doc_code_changed
 
             for _, child in now_older_item.children.items():
@@ -871,7 +1318,10 @@ class MetaInfo:
             new_reference_names = [
                 name.get_full_name(strict=True) for name in result_item.who_reference_me
             ]
-            old_reference_names = now_older_item.who_reference_me_name_list
+            # a metainfo kept in memory, like in watch mode, has its references parsed but not its name lists
+            old_reference_names = [
+                name.get_full_name(strict=True) for name in now_older_item.who_reference_me
+            ] if now_older_item.who_reference_me else now_older_item.who_reference_me_name_list
 
             if not (set(new_reference_names) == set(old_reference_names)) and (
                 result_item.item_status == DocItemStatus.doc_upto_date
@@ -889,6 +1339,215 @@ class MetaInfo:
 
         self.deleted_items_from_older_meta = deleted_items
 
+    def find_by_reference_name(self, name: str) -> Optional[DocItem]:
+        """Find an item by the name written in the reference lists of the hierarchy json."""
+        path = [part.removesuffix("(name_duplicate_version)")
+                for part in name.split("/")]
+        return self.target_repo_hierarchical_tree.find(path)
+
+    def link_references_from_names(self) -> None:
+        """
+        Link the items from the reference names loaded from the hierarchy json, without resolving the
+        references again. The names that don't match any item anymore are dropped.
+        """
+        for item in self.target_repo_hierarchical_tree.get_preorder_traversal():
+            if item.item_type in [DocItemType._repo, DocItemType._dir, DocItemType._file]:
+                continue
+            item.reference_who, special_reference_type = [], []
+            for index, name in enumerate(item.reference_who_name_list):
+                reference_item = self.find_by_reference_name(name)
+                if reference_item is None:
+                    continue
+                item.reference_who.append(reference_item)
+                special_reference_type.append(
+                    item.special_reference_type[index] if index < len(item.special_reference_type) else False)
+            item.special_reference_type = special_reference_type
+            item.who_reference_me = [referencer for referencer in map(self.find_by_reference_name, item.who_reference_me_name_list)
+                                     if referencer is not None]
+            for referencer in item.who_reference_me:
+                # the references of the files, from their imports, are only saved on the referenced side
+                if referencer.item_type == DocItemType._file:
+                    referencer.reference_who.append(item)
+                    referencer.special_reference_type.append(False)
+
+    @staticmethod
+    def init_meta_info_for_files(older_meta: MetaInfo, changed_files: List[str], deleted_files: List[str],
+                                 file_path_reflections: Dict[str, str], jump_files: List[str]) -> MetaInfo:
+        """
+        Build the metainfo of the repository after some files changed, reusing the older metainfo for
+        everything else. Only the changed files are parsed, the other files keep their objects, docs,
+        statuses and references. A changed file that can't be parsed, e.g. with a syntax error, is
+        reported and kept as it was in the older metainfo, it is listed in `unparsable_files`.
+
+        Args:
+            older_meta (MetaInfo): The metainfo loaded from the checkpoint.
+            changed_files (List[str]): The added or modified files.
+            deleted_files (List[str]): The deleted files.
+            file_path_reflections (Dict[str, str]): The fake files of the unstaged changes.
+            jump_files (List[str]): The files to skip.
+
+        Returns:
+            MetaInfo: The new metainfo, whose references are linked but not updated for the changed files yet.
+        """
+        print(f"{Fore.LIGHTRED_EX}Initializing Metainfo: {
+              Style.RESET_ALL} from {len(changed_files)} changed files")
+        # the items of the older metainfo keep their content, the new one works on a copy
+        hierarchy_json = copy.deepcopy(older_meta.to_hierarchy_json())
+        for file_path in deleted_files:
+            hierarchy_json.pop(file_path, None)
+        file_handler = FileHandler(CONFIG["repo_path"], None)
+        unparsable_files = []
+        for file_path in changed_files:
+            try:
+                hierarchy_json[file_path] = file_handler.generate_file_structure(
+                    file_path)
+            except (SyntaxError, ValueError) as e:
+                logger.warning(
+                    f"Can't parse {file_path}, its docs are kept as they are until it parses again: {parse_error_message(e)}")
+                unparsable_files.append(file_path)
+        metainfo = MetaInfo.from_project_hierarchy_json(hierarchy_json)
+        metainfo.unparsable_files = unparsable_files
+        metainfo.repo_path = CONFIG["repo_path"]
+        metainfo.document_version = older_meta.document_version
+        metainfo.fake_file_reflection = file_path_reflections
+        metainfo.jump_files = jump_files
+        metainfo.white_list = older_meta.white_list
+        metainfo.link_references_from_names()
+        return metainfo
+
+    @tracer.traced("merge older meta")
+    def load_doc_for_files(self, older_meta: MetaInfo, changed_files: List[str], deleted_files: List[str]) -> None:
+        """
+        Merge the docs of the changed files from the older metainfo, and update the references touching them.
+
+        The references of the objects of the changed files are resolved again, as well as the
+        references of the objects they may call: the objects they referenced before and the objects
+        named by an identifier of the changed files. The references between the other files are kept.
+
+        Args:
+            older_meta (MetaInfo): The metainfo loaded from the checkpoint.
+            changed_files (List[str]): The added or modified files.
+            deleted_files (List[str]): The deleted files.
+        """
+        # the files that couldn't be parsed are unchanged in the metainfo
+        changed_files = [file_path for file_path in changed_files
+                         if file_path not in self.unparsable_files]
+        logger.info(
+            f"merge doc of {len(changed_files)} changed files from an older version of metainfo")
+
+        def tree_keys(item: DocItem) -> List[str]:
+            keys = []
+            while item.parent is not None:
+                keys.insert(0, next(key for key, child in item.parent.children.items()
+                                    if child is item))
+                item = item.parent
+            return keys
+
+        def find_in(meta: MetaInfo, item: DocItem) -> Optional[DocItem]:
+            return meta.target_repo_hierarchical_tree.find(tree_keys(item))
+
+        def file_objects(meta: MetaInfo, file_path: str) -> List[DocItem]:
+            file_item = meta.target_repo_hierarchical_tree.find(
+                file_path.split("/"))
+            return file_item.get_preorder_traversal()[1:] if file_item is not None else []
+
+        deleted_items = []
+        for file_path in deleted_files:
+            for older_item in file_objects(older_meta, file_path):
+                deleted_items.append(
+                    [older_item.get_full_name(), older_item.item_type.name])
+
+        changed_items = []
+        for file_path in changed_files:
+            changed_items.extend(file_objects(self, file_path))
+            file_item = self.target_repo_hierarchical_tree.find(
+                file_path.split("/"))
+            if file_item is not None:
+                # the imports of the file reference objects too
+                file_item.reference_who, file_item.special_reference_type = [], []
+            for older_item in file_objects(older_meta, file_path):
+                result_item = find_in(self, older_item)
+                if result_item is None:
+                    deleted_items.append(
+                        [older_item.get_full_name(), older_item.item_type.name])
+                    continue
+                result_item.md_content = older_item.md_content
+                result_item.md_history = older_item.md_history
+                result_item.item_status = older_item.item_status
+                if not same_code(older_item.content, result_item.content):
+                    result_item.item_status = DocItemStatus.doc_code_changed
+
+        # drop the links touching the changed files, they are resolved again below
+        changed_ids = {id(item) for item in changed_items}
+        changed_ids.update(id(self.target_repo_hierarchical_tree.find(file_path.split("/")))
+                           for file_path in changed_files)
+        for item in self.target_repo_hierarchical_tree.get_preorder_traversal():
+            if id(item) in changed_ids:
+                item.reference_who, item.who_reference_me, item.special_reference_type = [], [], []
+                continue
+            kept = [(reference, special) for reference, special in zip(item.reference_who, item.special_reference_type)
+                    if id(reference) not in changed_ids]
+            item.reference_who = [reference for reference, _ in kept]
+            item.special_reference_type = [special for _, special in kept]
+            item.who_reference_me = [referencer for referencer in item.who_reference_me
+                                     if id(referencer) not in changed_ids]
+
+        # the objects the changed files may reference: jedi only finds a reference where the name appears
+        identifiers = set()
+        for file_path in changed_files:
+            try:
+                with open(os.path.join(self.repo_path, file_path), "r", encoding="utf-8") as reader:
+                    tree = ast.parse(reader.read())
+            except (SyntaxError, ValueError) as e:
+                # edited again since it was parsed, the references of its own objects are still resolved
+                logger.warning(
+                    f"Can't parse {file_path}, the objects it calls are not searched again: {parse_error_message(e)}")
+                continue
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Name):
+                    identifiers.add(node.id)
+                elif isinstance(node, ast.Attribute):
+                    identifiers.add(node.attr)
+                elif isinstance(node, ast.alias):
+                    identifiers.add(node.name.split(".")[-1])
+        scope = list(changed_items)
+        scope_ids = set(changed_ids)
+        older_callees = [self.find_by_reference_name(name) for file_path in changed_files
+                         for older_item in file_objects(older_meta, file_path)
+                         for name in older_item.reference_who_name_list]
+        for item in older_callees + [item for item in self.target_repo_hierarchical_tree.get_preorder_traversal()
+                                     if item.item_name in identifiers]:
+            if item is None or id(item) in scope_ids or item.item_type in [
+                    DocItemType._repo, DocItemType._dir, DocItemType._file]:
+                continue
+            scope.append(item)
+            scope_ids.add(id(item))
+
+        white_list_file_names = {cont["file_path"]
+                                 for cont in self.white_list} if self.white_list != None else set()
+        white_list_obj_names = {cont["id_text"]
+                                for cont in self.white_list} if self.white_list != None else set()
+        self.begin_reference_pass()
+        for item in tqdm(scope, desc="parsing bidirectional reference of the changed files"):
+            if white_list_file_names and item.get_file_name() not in white_list_file_names:
+                continue
+            self.add_references(item, item.get_file_name(),
+                                in_file_only=bool(white_list_obj_names) and item.item_name not in white_list_obj_names)
+        self.end_reference_pass()
+
+        for item in scope:
+            older_item = find_in(older_meta, item)
+            if older_item is None or item.item_status != DocItemStatus.doc_upto_date:
+                continue
+            new_reference_names = {referencer.get_full_name(strict=True)
+                                   for referencer in item.who_reference_me}
+            old_reference_names = set(older_item.who_reference_me_name_list)
+            if new_reference_names != old_reference_names:
+                item.item_status = DocItemStatus.doc_has_no_referencer if new_reference_names <= old_reference_names \
+                    else DocItemStatus.doc_has_new_referencer
+
+        self.deleted_items_from_older_meta = deleted_items
+
 
 if __name__ == "__main__":
     repo_path = "/home/niraj/stuff/coding/projects/DynamoDocs"
@@ -1,5 +1,8 @@
 import os
 import fnmatch
+from typing import Optional
+
+from dynamodocs.utils.path_filter import PathFilter
 
 
 class GitignoreChecker:
@@ -96,21 +99,41 @@ class GitignoreChecker:
                 return True
         return False
 
-    def check_files_and_folders(self) -> list:
+    def is_ignored_file(self, relative_path: str) -> bool:
+        """
+        Check a single file, relative to self.directory, like check_files_and_folders does when walking to it.
+
+        Args:
+            relative_path (str): The path of the file.
+
+        Returns:
+            bool: True if the file or one of its folders is ignored, False otherwise.
+        """
+        *folders, file = relative_path.split("/")
+        return any(self._is_ignored(folder, self.folder_patterns, is_dir=True) for folder in folders) \
+            or self._is_ignored(file, self.file_patterns)
+
+    def check_files_and_folders(self, path_filter: Optional[PathFilter] = None) -> list:
         """
         Check all files and folders in the given directory against the split gitignore patterns.
         Return a list of files that are not ignored and have the '.py' extension.
         The returned file paths are relative to the self.directory.
 
+        Args:
+            path_filter (PathFilter, optional): Only walk the folders that may contain documented
+                files, and only return the documented files.
+
         Returns:
             list: A list of paths to files that are not ignored and have the '.py' extension.
         """
         not_ignored_files = []
         for root, dirs, files in os.walk(self.directory):
+            rel_root = os.path.relpath(root, self.directory)
             dirs[:] = [
                 d
                 for d in dirs
                 if not self._is_ignored(d, self.folder_patterns, is_dir=True)
+                and (path_filter is None or path_filter.may_contain(os.path.normpath(os.path.join(rel_root, d))))
             ]
 
             for file in files:
@@ -118,7 +141,7 @@ class GitignoreChecker:
                 relative_path = os.path.relpath(file_path, self.directory)
                 if not self._is_ignored(
                     file, self.file_patterns
-                ) and file_path.endswith(".py"):
+                ) and file_path.endswith(".py") and (path_filter is None or path_filter.match(relative_path)):
                     not_ignored_files.append(relative_path)
 
         return not_ignored_files
@@ -0,0 +1,178 @@
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+GLOB_CHARS = "*?["
+
+
+def glob_to_regex(pattern: str) -> str:
+    """
+    Translate a glob of a path relative to the repository into a regex.
+
+    `**` matches any number of folders, `*` and `?` match within a folder name. A pattern matching a
+    folder also matches everything under it, so `tests` and `tests/**` are the same.
+
+    Args:
+        pattern (str): The glob, with `/` separators.
+
+    Returns:
+        str: A regex to full-match against the relative paths.
+    """
+    pattern = pattern.strip().strip("/")
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+            continue
+        if char == "*":
+            regex += "[^/]*"
+        elif char == "?":
+            regex += "[^/]"
+        elif char == "[" and "]" in pattern[i + 1:]:
+            end = pattern.index("]", i + 1)
+            content = pattern[i + 1:end]
+            if content.startswith("!"):
+                content = "^" + content[1:]
+            regex += "[" + content.replace("\\", "\\\\") + "]"
+            i = end
+        else:
+            regex += re.escape(char)
+        i += 1
+    return regex + "(?:/.*)?"
+
+
+def literal_prefix(pattern: str) -> str:
+    """The folders of a glob before its first wildcard, e.g. `src/pkg` for `src/pkg/*/test_*.py`."""
+    folders = []
+    for part in pattern.strip().strip("/").split("/"):
+        if any(char in part for char in GLOB_CHARS):
+            break
+        folders.append(part)
+    return "/".join(folders)
+
+
+def compile_union(regexes: List[str]) -> Optional[re.Pattern]:
+    if not regexes:
+        return None
+    return re.compile("|".join(f"(?:{regex})" for regex in regexes))
+
+
+class PathFilter:
+    """
+    Decides which Python files of the repository are documented, from include and exclude globs.
+
+    All the globs are compiled into one regex per kind, and the answers are cached by path, so the
+    filter can be applied while walking the repository and for every reference jedi reports. A path
+    is matched when it matches an include glob (any path when there is none), matches a scope glob
+    (any path when there is none), and matches no exclude glob nor ignored prefix.
+    """
+
+    def __init__(self, include: Sequence[str] = (), exclude: Sequence[str] = (),
+                 ignore_prefixes: Sequence[str] = (), scope: Sequence[str] = ()):
+        """
+        Args:
+            include (Sequence[str]): The globs of the documented paths.
+            exclude (Sequence[str]): The globs of the paths never parsed.
+            ignore_prefixes (Sequence[str]): Path prefixes never parsed, the `ignore_list` entries.
+            scope (Sequence[str]): The globs narrowing a single run, given by `--paths`.
+        """
+        self.include = list(include)
+        self.exclude = list(exclude)
+        self.ignore_prefixes = list(ignore_prefixes)
+        self.scope = list(scope)
+        self.include_regex = compile_union(
+            [glob_to_regex(pattern) for pattern in self.include])
+        self.scope_regex = compile_union(
+            [glob_to_regex(pattern) for pattern in self.scope])
+        # the ignore_list entries are plain prefixes, `tests` also ignores `tests_utils.py`
+        self.exclude_regex = compile_union([glob_to_regex(pattern) for pattern in self.exclude]
+                                           + [re.escape(prefix) + ".*" for prefix in self.ignore_prefixes])
+        self.include_prefixes = [literal_prefix(pattern) for pattern in self.include]
+        self.scope_prefixes = [literal_prefix(pattern) for pattern in self.scope]
+        self.cache: Dict[str, bool] = {}
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.include or self.exclude or self.ignore_prefixes or self.scope)
+
+    def without_scope(self) -> "PathFilter":
+        """The filter of the whole documented repository, not narrowed to the paths of the run."""
+        return compile_path_filter(tuple(self.include), tuple(self.exclude), tuple(self.ignore_prefixes))
+
+    def match(self, path: str) -> bool:
+        """
+        Tell whether a file is documented.
+
+        Args:
+            path (str): The path of the file, relative to the repository.
+
+        Returns:
+            bool: True if the file is documented.
+        """
+        matched = self.cache.get(path)
+        if matched is None:
+            normalized = path.replace(os.sep, "/")
+            matched = (self.include_regex is None or self.include_regex.fullmatch(normalized) is not None) \
+                and (self.scope_regex is None or self.scope_regex.fullmatch(normalized) is not None) \
+                and (self.exclude_regex is None or self.exclude_regex.fullmatch(normalized) is None)
+            self.cache[path] = matched
+        return matched
+
+    def may_contain(self, dir_path: str) -> bool:
+        """
+        Tell whether a folder may contain documented files, so the walk can skip the others entirely.
+
+        Args:
+            dir_path (str): The path of the folder, relative to the repository.
+
+        Returns:
+            bool: False if no file under the folder is documented.
+        """
+        normalized = dir_path.replace(os.sep, "/").strip("/")
+        if normalized in ["", "."]:
+            return True
+        if self.exclude_regex is not None and (self.exclude_regex.fullmatch(normalized)
+                                               or self.exclude_regex.fullmatch(normalized + "/")):
+            return False
+
+        def reachable(prefixes: List[str]) -> bool:
+            # the folder is under the fixed part of a glob, or on the way to it
+            return not prefixes or any(
+                prefix == "" or normalized == prefix or normalized.startswith(prefix + "/")
+                or prefix.startswith(normalized + "/") for prefix in prefixes)
+
+        return reachable(self.include_prefixes) and reachable(self.scope_prefixes)
+
+
+@lru_cache(maxsize=None)
+def compile_path_filter(include: tuple = (), exclude: tuple = (), ignore_prefixes: tuple = (),
+                        scope: tuple = ()) -> PathFilter:
+    return PathFilter(include, exclude, ignore_prefixes, scope)
+
+
+def get_path_filter(config: dict, scoped: bool = True) -> PathFilter:
+    """
+    The path filter of the configuration, compiled once for each set of globs.
+
+    Args:
+        config (dict): The configuration, with the `paths` entry and the `ignore_list`.
+        scoped (bool): Narrow the filter to the `--paths` of the run, stored under `paths.scope`.
+
+    Returns:
+        PathFilter: The compiled filter.
+    """
+    paths_config = config.get("paths") or {}
+    return compile_path_filter(
+        tuple(paths_config.get("include") or []),
+        tuple(paths_config.get("exclude") or []),
+        tuple(config.get("ignore_list") or []),
+        tuple(paths_config.get("scope") or []) if scoped else (),
+    )
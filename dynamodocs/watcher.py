@@ -0,0 +1,107 @@
+import os
+import time
+from typing import Dict, List, Optional
+
+import git
+
+from dynamodocs.utils.meta_info_utils import latest_verison_substring
+from dynamodocs.utils.path_filter import PathFilter
+
+
+class PollingWatcher:
+    """
+    Watches the Python files of a repository by polling their modification times.
+
+    Besides the files, the commit of HEAD and the git index are watched, because the staged and
+    committed versions decide what a run documents.
+    """
+
+    def __init__(self, repo_path: str, skip_dirs: List[str], interval: float = 1.0, debounce: float = 2.0,
+                 path_filter: Optional[PathFilter] = None):
+        """
+        Args:
+            repo_path (str): The repository to watch.
+            skip_dirs (List[str]): Top-level folders not to watch, like the hierarchy and the docs.
+            interval (float): Seconds between two polls.
+            debounce (float): Seconds without any change before a burst of edits is reported.
+            path_filter (PathFilter, optional): Only watch the documented files.
+        """
+        self.repo_path = repo_path
+        self.skip_dirs = set(skip_dirs)
+        self.interval = interval
+        self.debounce = debounce
+        self.path_filter = path_filter
+        self.repo = git.Repo(repo_path)
+        self.last_snapshot = self.snapshot()
+
+    def snapshot(self) -> Dict[str, tuple]:
+        """Returns the (mtime, size) of every watched file by path relative to the repository, and the git state."""
+        state = {}
+        for root, dirs, files in os.walk(self.repo_path):
+            rel_root = os.path.relpath(root, self.repo_path)
+            dirs[:] = [d for d in dirs if not d.startswith(".")
+                       and not (rel_root == "." and d in self.skip_dirs)
+                       and (self.path_filter is None
+                            or self.path_filter.may_contain(os.path.normpath(os.path.join(rel_root, d))))]
+            for file in files:
+                # the fake files of a run come and go, they are not edits
+                if not file.endswith(".py") or file.endswith(latest_verison_substring):
+                    continue
+                path = os.path.join(root, file)
+                if self.path_filter is not None and not self.path_filter.match(
+                        os.path.relpath(path, self.repo_path)):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                state[os.path.relpath(path, self.repo_path)] = (
+                    stat.st_mtime_ns, stat.st_size)
+        index_path = os.path.join(self.repo.git_dir, "index")
+        if os.path.exists(index_path):
+            state[".git/index"] = (os.stat(index_path).st_mtime_ns,)
+        try:
+            state[".git/HEAD"] = (self.repo.head.commit.hexsha,)
+        except ValueError:
+            # no commit yet
+            pass
+        return state
+
+    def changed_paths(self, snapshot: Dict[str, tuple]) -> List[str]:
+        return sorted(path for path in set(snapshot) | set(self.last_snapshot)
+                      if snapshot.get(path) != self.last_snapshot.get(path))
+
+    def wait_for_changes(self) -> List[str]:
+        """
+        Block until some watched files change, then until they stop changing for `debounce` seconds.
+
+        Returns:
+            List[str]: The paths that changed since the last call.
+        """
+        while True:
+            time.sleep(self.interval)
+            snapshot = self.snapshot()
+            if self.changed_paths(snapshot):
+                break
+        quiet_since = time.perf_counter()
+        while time.perf_counter() - quiet_since < self.debounce:
+            time.sleep(min(self.interval, self.debounce))
+            newer_snapshot = self.snapshot()
+            if newer_snapshot != snapshot:
+                snapshot = newer_snapshot
+                quiet_since = time.perf_counter()
+        changed = self.changed_paths(snapshot)
+        self.last_snapshot = snapshot
+        return changed
+
+    def rebase_git_state(self) -> None:
+        """
+        Take the current git state as the reference, so the docs a run adds to the index are not
+        reported. The files keep their reference, edits made during the run are still reported.
+        """
+        snapshot = self.snapshot()
+        for path in [".git/index", ".git/HEAD"]:
+            if path in snapshot:
+                self.last_snapshot[path] = snapshot[path]
+            else:
+                self.last_snapshot.pop(path, None)
@@ -0,0 +1,36 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def load_template_config() -> None:
+    """dynamodocs reads config.yml from the working directory when imported, the tests run on the template."""
+    config_dir = tempfile.mkdtemp(prefix="dynamodocs-config-")
+    shutil.copy(os.path.join(REPO_ROOT, "config.yml.template"), os.path.join(config_dir, "config.yml"))
+    working_dir = os.getcwd()
+    os.chdir(config_dir)
+    try:
+        import dynamodocs.config  # noqa: F401
+    finally:
+        os.chdir(working_dir)
+        shutil.rmtree(config_dir, ignore_errors=True)
+
+
+load_template_config()
+
+
+@pytest.fixture
+def repo_config(tmp_path):
+    """The config of the template within a scope, documenting an empty repository in a temporary folder."""
+    from dynamodocs.config import CONFIG
+
+    config = CONFIG.copy()
+    config["repo_path"] = str(tmp_path)
+    with CONFIG.scope(config):
+        yield config
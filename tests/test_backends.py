@@ -0,0 +1,154 @@
+import threading
+
+import pytest
+from ollama import ChatResponse, Message, ResponseError
+
+from dynamodocs.backends import (LLMBackend, MultiHostBackend, NoHealthyHostError, RecordReplayBackend,
+                                 RequestCancelledError, SimulatedBackend, messages_key, parse_hosts)
+
+MESSAGES = [{"role": "system", "content": "Document the code."}, {"role": "user", "content": "def f(): pass"}]
+
+
+class OllamaLikeBackend(LLMBackend):
+    """Answers like OllamaBackend.chat, with the pydantic response of the Ollama client."""
+
+    def __init__(self, contents):
+        self.contents = list(contents)
+        self.calls = 0
+
+    def chat(self, messages):
+        self.calls += 1
+        return ChatResponse(model="codellama", created_at="2026-01-01T00:00:00Z", done=True,
+                            message=Message(role="assistant", content=self.contents.pop(0)),
+                            prompt_eval_count=12, eval_count=34)
+
+
+def test_records_an_ollama_chat_response_and_replays_it(tmp_path):
+    path = str(tmp_path / "recordings.jsonl")
+    recorder = RecordReplayBackend("record", path, OllamaLikeBackend(["first doc", "second doc"]))
+    assert recorder.chat(MESSAGES)["message"]["content"] == "first doc"
+    recorder.chat(MESSAGES)
+
+    player = RecordReplayBackend("replay", path)
+    response = player.chat(MESSAGES)
+    assert response["message"]["role"] == "assistant"
+    assert response["message"]["content"] == "first doc"
+    assert response["eval_count"] == 34
+    assert response["prompt_eval_count"] == 12
+    # identical prompts replay in order, then the last response again
+    assert player.chat(MESSAGES)["message"]["content"] == "second doc"
+    assert player.chat(MESSAGES)["message"]["content"] == "second doc"
+
+
+def test_replay_of_an_unrecorded_request_fails_or_falls_through(tmp_path):
+    path = str(tmp_path / "recordings.jsonl")
+    RecordReplayBackend("record", path, OllamaLikeBackend(["doc"])).chat(MESSAGES)
+    other_messages = [{"role": "user", "content": "def g(): pass"}]
+
+    with pytest.raises(ResponseError):
+        RecordReplayBackend("replay", path).chat(other_messages)
+
+    fallback = OllamaLikeBackend(["live doc"])
+    player = RecordReplayBackend("replay", path, fallback, fallthrough=True)
+    assert player.chat(other_messages)["message"]["content"] == "live doc"
+    assert fallback.calls == 1
+
+
+def test_invalid_modes_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        RecordReplayBackend("rewind", str(tmp_path / "recordings.jsonl"))
+    with pytest.raises(ValueError):
+        RecordReplayBackend("record", str(tmp_path / "recordings.jsonl"))
+
+
+def test_simulated_backend_is_deterministic_for_a_seed():
+    first = SimulatedBackend(latency={"distribution": "constant", "mean": 0}, output_tokens=20, seed=3)
+    second = SimulatedBackend(latency={"distribution": "constant", "mean": 0}, output_tokens=20, seed=3)
+    assert first.chat(MESSAGES)["message"]["content"] == second.chat(MESSAGES)["message"]["content"]
+    assert messages_key(MESSAGES) != messages_key(MESSAGES[:1])
+
+
+def test_simulated_backend_only_prefills_past_the_cached_prefix():
+    backend = SimulatedBackend(prefix_cache_slots=2)
+    assert backend.prefill(MESSAGES) == 6
+    longer = MESSAGES + [{"role": "user", "content": "and g"}]
+    assert backend.prefill(longer) == 2
+
+
+def test_simulated_backend_stops_a_cancelled_request():
+    backend = SimulatedBackend(latency={"distribution": "constant", "mean": 5.0}, seed=0)
+    cancelled = threading.Event()
+    cancelled.set()
+    with pytest.raises(RequestCancelledError):
+        backend.chat_cancellable(MESSAGES, cancelled)
+
+
+class HostBackend(LLMBackend):
+    """A host answering with its name, or failing with `error` while it is set."""
+
+    def __init__(self, name, error=None):
+        self.name = name
+        self.error = error
+        self.calls = 0
+
+    def chat(self, messages):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return {"message": {"role": "assistant", "content": self.name}, "eval_count": 1}
+
+    def ping(self):
+        if self.error is not None:
+            raise self.error
+
+
+def multi_host(*backends, failure_threshold=2):
+    return MultiHostBackend({backend.name: backend for backend in backends},
+                            max_in_flight={backend.name: 2 for backend in backends},
+                            failure_threshold=failure_threshold, health_check_interval=0)
+
+
+def test_parse_hosts():
+    assert parse_hosts("http://a", 4) == {"http://a": 4}
+    assert parse_hosts(["http://a", {"host": "http://b", "max_in_flight": 2}, {"host": "http://c"}], 4) == {
+        "http://a": 4, "http://b": 2, "http://c": 4}
+
+
+def test_requests_of_the_same_system_prompt_stick_to_a_host():
+    backend = multi_host(HostBackend("a"), HostBackend("b"))
+    hosts = {backend.chat(MESSAGES)["message"]["content"] for _ in range(3)}
+    assert len(hosts) == 1
+    # the hedge of a request goes to another host than the one of its prefix
+    hedge_host = backend.chat_cancellable(MESSAGES, None, hedge=True)["message"]["content"]
+    assert hedge_host not in hosts
+
+
+def test_a_failing_host_fails_over_and_is_marked_unhealthy():
+    down, up = HostBackend("a", error=ConnectionError("refused")), HostBackend("b")
+    backend = multi_host(down, up)
+    for _ in range(3):
+        assert backend.chat([{"role": "system", "content": str(_)}])["message"]["content"] == "b"
+    assert not backend.hosts[0].healthy
+    assert backend.hosts[0].failovers == 2
+    assert down.calls == 2
+
+    down.error = None
+    backend.check_hosts()
+    assert backend.hosts[0].healthy
+
+
+def test_request_errors_are_not_failed_over():
+    first, second = HostBackend("a", error=ResponseError("bad request", 400)), HostBackend("b")
+    backend = multi_host(first, second)
+    backend.hosts[1].in_flight = 2
+    with pytest.raises(ResponseError):
+        backend.chat(MESSAGES)
+    assert second.calls == 0 and backend.hosts[0].healthy
+
+
+def test_no_healthy_host():
+    backend = multi_host(HostBackend("a", error=ConnectionError("refused")), failure_threshold=1)
+    with pytest.raises(ConnectionError):
+        backend.chat(MESSAGES)
+    with pytest.raises(NoHealthyHostError):
+        backend.chat(MESSAGES)
@@ -0,0 +1,14 @@
+import os
+
+from dynamodocs.batch import load_repo_list
+
+
+def test_repo_list_reads_the_list_files_and_drops_duplicates(tmp_path):
+    list_path = tmp_path / "repos.txt"
+    list_path.write_text("# the services\n/srv/api\n\n/srv/web\n  /srv/api  \n")
+    assert load_repo_list([str(list_path), "/srv/worker", "/srv/web"]) == ["/srv/api", "/srv/web", "/srv/worker"]
+
+
+def test_repo_paths_are_made_absolute(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert load_repo_list(["repo", "./repo"]) == [os.path.join(str(tmp_path), "repo")]
@@ -0,0 +1,58 @@
+import os
+
+import git
+import pytest
+
+from dynamodocs.code_store import CodeStore, CodeUnavailableError, get_code_store, git_blob_id
+
+SOURCE = "def f():\n    return 1\n\n\ndef g():\n    return 2\n"
+
+
+def content(name, start, end, source=SOURCE):
+    return {"name": name, "code_start_line": start, "code_end_line": end,
+            "file_blob": git_blob_id(source.encode("utf-8"))}
+
+
+def make_repo(tmp_path, stage=True):
+    repo_path = str(tmp_path)
+    repo = git.Repo.init(repo_path)
+    (tmp_path / "module.py").write_text(SOURCE)
+    if stage:
+        repo.index.add(["module.py"])
+        repo.index.commit("init")
+    return repo_path
+
+
+def test_blob_id_is_the_one_of_git(tmp_path):
+    repo_path = make_repo(tmp_path)
+    assert git_blob_id(SOURCE.encode("utf-8")) == git.Repo(repo_path).git.hash_object("module.py")
+
+
+def test_code_is_sliced_from_the_working_tree(tmp_path):
+    store = CodeStore(make_repo(tmp_path, stage=False))
+    assert store.get_code("module.py", content("g", 5, 6)) == "def g():\n    return 2\n"
+    assert store.get_code("module.py", {"code_content": "legacy"}) == "legacy"
+
+
+def test_code_of_an_edited_file_comes_from_git(tmp_path):
+    repo_path = make_repo(tmp_path)
+    (tmp_path / "module.py").write_text("# edited\n" + SOURCE)
+    store = CodeStore(repo_path)
+    assert store.get_code("module.py", content("f", 1, 2)) == "def f():\n    return 1\n"
+
+
+def test_unavailable_code(tmp_path):
+    repo_path = make_repo(tmp_path, stage=False)
+    os.remove(os.path.join(repo_path, "module.py"))
+    with pytest.raises(CodeUnavailableError):
+        CodeStore(repo_path).get_code("module.py", content("f", 1, 2))
+
+
+def test_files_are_cached_by_blob(tmp_path):
+    repo_path = make_repo(tmp_path, stage=False)
+    store = CodeStore(repo_path, max_cached_files=1)
+    store.get_code("module.py", content("f", 1, 2))
+    (tmp_path / "other.py").write_text("x = 1\n")
+    store.get_code("other.py", content("x", 1, 1, "x = 1\n"))
+    assert list(store.cache) == [git_blob_id(b"x = 1\n")]
+    assert get_code_store(repo_path) is get_code_store(repo_path)
@@ -0,0 +1,66 @@
+import pytest
+
+from dynamodocs.concurrency import ConcurrencyController
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        ConcurrencyController(policy="unknown")
+
+
+def test_fixed_policy_keeps_the_limit():
+    controller = ConcurrencyController(policy="fixed", max_limit=4)
+    for _ in range(5):
+        controller.acquire()
+        controller.release(latency=1.0, error=True)
+    assert controller.current_limit == 4
+    assert controller.totals()["errors"] == 5
+
+
+def test_aimd_grows_by_one_per_window_of_healthy_requests():
+    controller = ConcurrencyController(policy="aimd", min_limit=1, max_limit=3)
+    limits = []
+    for _ in range(6):
+        controller.acquire()
+        controller.release(latency=1.0, output_tokens=10)
+        limits.append(controller.current_limit)
+    assert limits == [2, 2, 3, 3, 3, 3]
+
+
+def test_aimd_decreases_once_per_congestion_episode():
+    controller = ConcurrencyController(policy="aimd", min_limit=1, max_limit=10, initial=10, backoff=0.5)
+    controller.release(latency=1.0, output_tokens=100)
+    for _ in range(3):
+        controller.release(latency=1.0, error=True)
+    assert controller.current_limit == 5
+    # long answers are not congestion, the latency is compared per generated token
+    controller.release(latency=5.0, output_tokens=500)
+    assert controller.current_limit == 5
+    # the decrease waits for a window of completions since the last one
+    controller.release(latency=10.0, output_tokens=100)
+    assert controller.current_limit == 5
+    controller.release(latency=10.0, output_tokens=100)
+    assert controller.current_limit == 2
+
+
+def test_slots_limit_the_requests_in_flight_and_count_the_errors():
+    controller = ConcurrencyController(policy="fixed", max_limit=1)
+    with controller.slot() as slot:
+        slot.output_tokens, slot.prompt_tokens = 20, 100
+        assert not controller.try_acquire()
+    with pytest.raises(RuntimeError):
+        with controller.slot():
+            raise RuntimeError("backend down")
+    assert controller.try_acquire()
+    controller.release_unmeasured()
+    assert controller.in_flight == 0
+    totals = controller.totals()
+    assert (totals["requests"], totals["errors"], totals["output_tokens"], totals["prompt_tokens"]) == (2, 1, 20, 100)
+
+
+def test_from_config_falls_back_to_the_thread_count():
+    controller = ConcurrencyController.from_config({"max_thread_count": 6, "concurrency": None})
+    assert (controller.policy, controller.current_limit) == ("fixed", 6)
+    controller = ConcurrencyController.from_config(
+        {"max_thread_count": 6, "concurrency": {"policy": "aimd", "min": 2}})
+    assert (controller.min_limit, controller.max_limit, controller.current_limit) == (2, 6, 2)
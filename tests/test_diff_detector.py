@@ -0,0 +1,49 @@
+import os
+
+import git
+
+from dynamodocs.diff_detector import DiffDetector
+
+
+def write(repo_path, path, content):
+    with open(os.path.join(repo_path, path), "w") as writer:
+        writer.write(content)
+
+
+def make_repo(tmp_path):
+    repo_path = str(tmp_path)
+    repo = git.Repo.init(repo_path)
+    write(repo_path, "kept.py", "def kept():\n    return 1\n")
+    write(repo_path, "moved.py", "def moved():\n    '''A function long enough to be seen as renamed.'''\n    return 2\n")
+    write(repo_path, "removed.py", "def removed():\n    return 3\n")
+    repo.index.add(["kept.py", "moved.py", "removed.py"])
+    repo.index.commit("init")
+    return repo_path, repo
+
+
+def test_staged_changes_with_renames(tmp_path):
+    repo_path, repo = make_repo(tmp_path)
+    write(repo_path, "kept.py", "def kept():\n    return 10\n")
+    write(repo_path, "added.py", "def added():\n    return 4\n")
+    write(repo_path, "notes.txt", "notes\n")
+    repo.index.add(["kept.py", "added.py", "notes.txt"])
+    repo.index.move(["moved.py", "renamed.py"])
+    repo.index.remove(["removed.py"], working_tree=True)
+
+    detector = DiffDetector(repo_path)
+    assert detector.get_staged_python_files() == {"kept.py": False, "added.py": True, "renamed.py": True}
+    assert sorted(detector.get_staged_deleted_python_files()) == ["moved.py", "removed.py"]
+
+
+def test_index_blobs_change_with_the_staged_version_only(tmp_path):
+    repo_path, repo = make_repo(tmp_path)
+    detector = DiffDetector(repo_path)
+    blobs = detector.get_index_python_blobs()
+    assert sorted(blobs) == ["kept.py", "moved.py", "removed.py"]
+
+    write(repo_path, "kept.py", "def kept():\n    return 10\n")
+    assert detector.get_index_python_blobs() == blobs
+    repo.index.add(["kept.py"])
+    repo.index.write()
+    changed = DiffDetector(repo_path).get_index_python_blobs()
+    assert [path for path in blobs if changed[path] != blobs[path]] == ["kept.py"]
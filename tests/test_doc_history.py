@@ -0,0 +1,75 @@
+import json
+import os
+
+from dynamodocs.doc_history import DOC_HISTORY_FOLDER, DocHistoryStore, doc_digest
+from dynamodocs.tree_handler import MetaInfo
+
+
+def test_identical_docs_share_their_blob(tmp_path):
+    store = DocHistoryStore(str(tmp_path / "history"))
+    digest = store.put("the doc")
+    assert store.put("the doc") == digest == doc_digest("the doc")
+    assert store.get(digest) == "the doc"
+    assert sum(len(files) for _, _, files in os.walk(store.folder)) == 1
+
+
+def test_collect_garbage_keeps_the_referenced_blobs(tmp_path):
+    store = DocHistoryStore(str(tmp_path / "history"))
+    kept, dropped = store.put("kept"), store.put("dropped")
+    assert store.collect_garbage([kept]) == 1
+    assert store.get(kept) == "kept"
+    assert not os.path.exists(store.blob_path(dropped))
+
+
+def make_meta_info(repo_path, md_content):
+    with open(os.path.join(repo_path, "module.py"), "w") as writer:
+        writer.write("def f():\n    return 1\n")
+    return MetaInfo.from_project_hierarchy_json({"module.py": [{
+        "type": "FunctionDef", "name": "f", "md_content": md_content, "code_start_line": 1,
+        "code_end_line": 2, "params": [], "have_return": True, "name_column": 4, "item_status": "doc_upto_date",
+    }]})
+
+
+def saved_function(target_dir):
+    with open(os.path.join(target_dir, "project_hierarchy.json"), encoding="utf-8") as reader:
+        return json.load(reader)["module.py"][0]
+
+
+def test_checkpoint_moves_the_older_docs_to_the_history(repo_config, tmp_path):
+    meta_info = make_meta_info(str(tmp_path), ["v1", "v2", "v3"])
+    target_dir = str(tmp_path / "hierarchy")
+    meta_info.checkpoint(target_dir)
+
+    saved = saved_function(target_dir)
+    assert saved["md_content"] == ["v3"]
+    store = DocHistoryStore(os.path.join(target_dir, DOC_HISTORY_FOLDER))
+    assert [store.get(digest) for digest in saved["md_history"]] == ["v1", "v2"]
+
+
+def test_checkpoint_doesnt_archive_while_the_workers_append_docs(repo_config, tmp_path):
+    meta_info = make_meta_info(str(tmp_path), ["v1", "v2"])
+    meta_info.in_generation_process = True
+    target_dir = str(tmp_path / "hierarchy")
+    function_item = meta_info.target_repo_hierarchical_tree.find(["module.py", "f"])
+    md_content = function_item.md_content
+    meta_info.checkpoint(target_dir)
+    # a worker appending to the list it holds doesn't lose its doc
+    md_content.append("v3")
+    assert function_item.md_content == ["v1", "v2", "v3"]
+
+    meta_info.in_generation_process = False
+    meta_info.checkpoint(target_dir)
+    assert saved_function(target_dir)["md_content"] == ["v3"]
+    assert len(saved_function(target_dir)["md_history"]) == 2
+
+
+def test_older_versions_past_the_maximum_are_dropped(repo_config, tmp_path):
+    repo_config["doc_history"] = {"max_versions": 1}
+    meta_info = make_meta_info(str(tmp_path), ["v1", "v2", "v3"])
+    target_dir = str(tmp_path / "hierarchy")
+    meta_info.checkpoint(target_dir)
+
+    saved = saved_function(target_dir)
+    store = DocHistoryStore(os.path.join(target_dir, DOC_HISTORY_FOLDER))
+    assert [store.get(digest) for digest in saved["md_history"]] == ["v2"]
+    assert not os.path.exists(store.blob_path(doc_digest("v1")))
@@ -0,0 +1,78 @@
+import os
+from functools import partial
+
+import pytest
+
+from dynamodocs.code_store import CodeUnavailableError
+from dynamodocs.dry_run import Throughput, load_run_stats, plan_tasks, print_plan, record_run_stats
+from dynamodocs.tree_handler import EXPECTED_DOC_TOKENS, PREFILL_SPEEDUP, DocItem, MetaInfo
+
+RUN = {"requests": 10, "latency_seconds": 20.0, "output_tokens": 1000, "prompt_tokens": 5000,
+       "wall_seconds": 5.0}
+
+
+def test_throughput_without_any_run_projects_nothing():
+    throughput = Throughput.from_runs([])
+    assert throughput.seconds_per_work_token is None
+    assert throughput.output_tokens_per_request == EXPECTED_DOC_TOKENS
+    assert throughput.request_seconds(100, 100) is None
+
+
+def test_throughput_is_measured_over_the_recorded_runs():
+    throughput = Throughput.from_runs([RUN, {**RUN, "requests": 0}])
+    work = 1000 + 5000 / PREFILL_SPEEDUP
+    assert throughput.runs == 1
+    assert throughput.output_tokens_per_request == 100
+    assert throughput.seconds_per_work_token == pytest.approx(20.0 / work)
+    assert throughput.requests_in_flight == 4.0
+    assert throughput.request_seconds(0, 100) == pytest.approx(100 * 20.0 / work)
+
+
+def test_run_stats_keep_the_last_runs(tmp_path):
+    hierarchy_path = str(tmp_path / "hierarchy")
+    record_run_stats(hierarchy_path, {**RUN, "requests": 0}, 1.0, 1)
+    assert load_run_stats(hierarchy_path) == []
+    for task_count in range(12):
+        record_run_stats(hierarchy_path, RUN, 5.0, task_count)
+    runs = load_run_stats(hierarchy_path)
+    assert [run["tasks"] for run in runs] == list(range(2, 12))
+
+
+class PromptEngine:
+    """Builds a prompt of one word per line of code, the code of `missing` is not available."""
+
+    def __init__(self, missing):
+        self.missing = missing
+
+    def build_prompt(self, doc_item):
+        if doc_item.item_name == self.missing:
+            raise CodeUnavailableError(f"{doc_item.item_name} is gone")
+        return "system prompt", " ".join(["word"] * doc_item.code_end_line)
+
+    @staticmethod
+    def num_tokens_from_string(string):
+        return len(string.split())
+
+
+def test_plan_reports_the_objects_whose_code_is_not_available(repo_config, tmp_path, capsys):
+    with open(os.path.join(str(tmp_path), "module.py"), "w") as writer:
+        writer.write("def f():\n    pass\n\n\ndef g():\n    pass\n")
+    meta_info = MetaInfo.from_project_hierarchy_json({"module.py": [
+        {"type": "FunctionDef", "name": name, "md_content": [], "code_start_line": start,
+         "code_end_line": start + 1, "params": [], "have_return": False, "name_column": 4}
+        for name, start in [("f", 1), ("g", 5)]]})
+    task_manager = meta_info.get_task_manager(
+        meta_info.target_repo_hierarchical_tree, task_available_func=partial(DocItem.need_to_generate, ignore_list=[]))
+    throughput = Throughput.from_runs([RUN])
+
+    plan = plan_tasks(task_manager, PromptEngine(missing="g"), throughput)
+    rows = {row["path"].split("/")[-1].split("(")[0]: row for row in plan}
+    assert rows["f"]["prompt_tokens"] == 2 + 2
+    assert not rows["f"]["code_unavailable"]
+    assert rows["g"]["prompt_tokens"] == rows["g"]["output_tokens"] == 0
+    assert rows["g"]["code_unavailable"]
+
+    print_plan(task_manager, plan, throughput, workers=2)
+    output = capsys.readouterr().out
+    assert f"Dry run: {len(plan) - 1} LLM calls planned" in output
+    assert f"1 objects would fail, their code is not available anymore: {rows['g']['path']}" in output
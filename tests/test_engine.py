@@ -0,0 +1,57 @@
+from dynamodocs.backends import SimulatedBackend
+from dynamodocs.engine import ChatEngine, parse_batch_response
+from dynamodocs.prompts import dev_prompt
+from dynamodocs.tree_handler import MetaInfo
+
+
+def make_meta_info(repo_path):
+    with open(f"{repo_path}/module.py", "w") as writer:
+        writer.write("def f():\n    return 1\n\n\ndef g():\n    return 2\n")
+    return MetaInfo.from_project_hierarchy_json({"module.py": [
+        {"type": "FunctionDef", "name": name, "md_content": [], "code_start_line": start,
+         "code_end_line": start + 1, "params": [], "have_return": True, "name_column": 4,
+         "code_content": f"def {name}():\n    return {value}\n"}
+        for name, start, value in [("f", 1, 1), ("g", 5, 2)]]})
+
+
+def make_engine(config, prompt_layout):
+    config["prompt_layout"] = prompt_layout
+    return ChatEngine(config, dev_prompt.SYSTEM_PROMPT, dev_prompt.USER_PROMPT, backend=SimulatedBackend(),
+                      PREFIX_STABLE_SYSTEM_PROMPT=dev_prompt.PREFIX_STABLE_SYSTEM_PROMPT,
+                      PREFIX_STABLE_USER_PROMPT=dev_prompt.PREFIX_STABLE_USER_PROMPT)
+
+
+def test_prefix_stable_prompts_of_a_file_share_their_system_prompt(repo_config, tmp_path):
+    file_item = make_meta_info(str(tmp_path)).target_repo_hierarchical_tree.children["module.py"]
+    engine = make_engine(repo_config, "prefix_stable")
+    (f_system, f_user), (g_system, g_user) = [
+        engine.build_prompt(file_item.children[name]) for name in ["f", "g"]]
+    assert f_system == g_system
+    assert "Function f" in f_system and "Function g" in f_system
+    assert "return 1" in f_user and "return 2" in g_user and "return 1" not in f_system
+
+
+def test_default_prompts_embed_the_code_in_the_system_prompt(repo_config, tmp_path):
+    file_item = make_meta_info(str(tmp_path)).target_repo_hierarchical_tree.children["module.py"]
+    engine = make_engine(repo_config, "default")
+    system_prompt, user_prompt = engine.build_prompt(file_item.children["f"])
+    assert "return 1" in system_prompt
+    assert user_prompt == dev_prompt.USER_PROMPT.format(language="English")
+
+
+def test_batch_response_is_split_in_object_order():
+    content = ("Here are the docs.\n<<<DOC 2>>>\n**g**: second\n<<<END 2>>>\n"
+               "<<<DOC 1>>>\n**f**: first\n\nwith a paragraph\n<<<END 1>>>\n")
+    assert parse_batch_response(content, 2) == ["**f**: first\n\nwith a paragraph", "**g**: second"]
+
+
+def test_batch_response_with_a_missing_or_empty_doc_is_rejected():
+    assert parse_batch_response("<<<DOC 1>>>first<<<END 1>>>", 2) is None
+    assert parse_batch_response("<<<DOC 1>>>first<<<END 1>>><<<DOC 2>>> <<<END 2>>>", 2) is None
+    # a doc closed by the marker of another one is not taken
+    assert parse_batch_response("<<<DOC 1>>>first<<<END 2>>>", 1) is None
+
+
+def test_repeated_docs_keep_the_first_one():
+    content = "<<<DOC 1>>>first<<<END 1>>><<<DOC 1>>>again<<<END 1>>>"
+    assert parse_batch_response(content, 1) == ["first"]
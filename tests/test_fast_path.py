@@ -0,0 +1,53 @@
+import ast
+
+from dynamodocs.fast_path import match_fast_path, render_fast_path_doc
+
+
+def match(source):
+    return match_fast_path(ast.parse(source).body[0])
+
+
+def method_match(source):
+    return match_fast_path(ast.parse(f"class A:\n{source}").body[0].body[0])
+
+
+def test_stubs():
+    assert match("def f(x):\n    pass\n") == {"rule": "stub", "docstring": ""}
+    assert match('class A:\n    """An A."""\n    ...\n') == {"rule": "stub", "docstring": "An A."}
+    assert match("def f(x):\n    return x\n") is None
+
+
+def test_accessors():
+    assert method_match("    def get(self):\n        return self.value\n")["attribute"] == "value"
+    assert method_match("    def set(self, v):\n        self.value = v\n") == {
+        "rule": "setter", "docstring": "", "attribute": "value", "value": "v"}
+    assert method_match("    def get(self):\n        return self.value + 1\n") is None
+    assert method_match("    def set(self, v):\n        self.value = v * 2\n") is None
+
+
+def test_properties():
+    assert method_match("    @property\n    def value(self):\n        return self._value\n")["access"] == "returns"
+    assert method_match("    @value.setter\n    def value(self, v):\n        self._value = v\n")["access"] == "sets"
+    assert method_match("    @property\n    def value(self):\n        return compute(self)\n") is None
+
+
+def test_init_assign():
+    source = "    def __init__(self, a, b: int):\n        self.a = a\n        self.b: int = b\n        self.c = None\n"
+    assert method_match(source)["assignments"] == [["a", "a"], ["b", "b"], ["c", "None"]]
+    assert method_match("    def __init__(self, a):\n        self.a = a\n        setup(a)\n") is None
+    assert method_match("    def __init__(self, a):\n        self.a = [a]\n") is None
+
+
+def test_classes_only_match_stubs():
+    assert match("class A:\n    x = 1\n") is None
+
+
+def test_render_fills_the_template_of_the_rule():
+    doc = render_fast_path_doc("set", "FunctionDef", ["self", "v"],
+                               method_match('    def set(self, v):\n        """Set it."""\n        self.value = v\n'))
+    assert doc.startswith("**set**: The function of set is to set the `value` attribute of the object.")
+    assert "**Code Description**: Set it.\nset assigns `v` to `self.value`" in doc
+
+    doc = render_fast_path_doc("f", "FunctionDef", ["x"], match("def f(x):\n    pass\n"),
+                               templates={"stub": "{name} is a stub of{params}"})
+    assert doc == "f is a stub of\n· x"
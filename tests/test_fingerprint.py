@@ -0,0 +1,41 @@
+import ast
+
+from dynamodocs.code_store import code_hash
+from dynamodocs.fingerprint import code_fingerprint, same_code
+
+CODE = 'def f(x):\n    """Double x."""\n    return x * 2\n'
+
+
+def fingerprint(source, ignore_docstrings=False):
+    return code_fingerprint(ast.parse(source).body[0], ignore_docstrings)
+
+
+def test_formatting_and_comments_keep_the_fingerprint():
+    reformatted = 'def f( x ):\n    """Double x."""\n\n    # twice\n    return (x*2)\n'
+    assert fingerprint(reformatted) == fingerprint(CODE)
+    assert fingerprint(CODE.replace("2", "3")) != fingerprint(CODE)
+
+
+def test_docstrings_are_ignored_on_request():
+    edited = CODE.replace("Double x.", "Return twice x.")
+    assert fingerprint(edited) != fingerprint(CODE)
+    assert fingerprint(edited, ignore_docstrings=True) == fingerprint(CODE, ignore_docstrings=True)
+    assert fingerprint('def f():\n    """Only a docstring."""\n', ignore_docstrings=True) == \
+        fingerprint("def f():\n    pass\n", ignore_docstrings=True)
+    assert fingerprint(CODE).startswith("ast:")
+    assert fingerprint(CODE, ignore_docstrings=True).startswith("ast-nodoc:")
+
+
+def test_same_code_compares_the_fingerprints_of_the_same_variant():
+    older = {"code_fingerprint": fingerprint(CODE), "code_hash": code_hash(CODE)}
+    reformatted = CODE.replace("x * 2", "x*2")
+    newer = {"code_fingerprint": fingerprint(reformatted), "code_hash": code_hash(reformatted)}
+    assert same_code(older, newer)
+    # another variant, the raw code is compared
+    newer["code_fingerprint"] = fingerprint(reformatted, ignore_docstrings=True)
+    assert not same_code(older, newer)
+
+
+def test_same_code_of_a_metainfo_without_fingerprints():
+    assert same_code({"code_content": CODE}, {"code_fingerprint": fingerprint(CODE), "code_hash": code_hash(CODE)})
+    assert not same_code({"code_content": CODE}, {"code_hash": code_hash(CODE + "\n")})
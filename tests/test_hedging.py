@@ -0,0 +1,72 @@
+import threading
+
+from dynamodocs.backends import LLMBackend, RequestCancelledError
+from dynamodocs.concurrency import ConcurrencyController
+from dynamodocs.hedging import RequestHedger
+
+MESSAGES = [{"role": "user", "content": "def f(): pass"}]
+
+
+class StuckBackend(LLMBackend):
+    """The first copy of a request hangs until it is cancelled, the hedge answers right away."""
+
+    def __init__(self):
+        self.cancelled_first = threading.Event()
+
+    def chat_cancellable(self, messages, cancelled, hedge=False):
+        if hedge:
+            return {"message": {"role": "assistant", "content": "hedge"}}
+        if cancelled.wait(timeout=5):
+            self.cancelled_first.set()
+            raise RequestCancelledError("cancelled")
+        return {"message": {"role": "assistant", "content": "first"}}
+
+    def chat(self, messages):
+        return {"message": {"role": "assistant", "content": "plain"}}
+
+
+def make_hedger(max_extra_load=1.0, max_limit=4):
+    hedger = RequestHedger(ConcurrencyController(max_limit=max_limit), enabled=True, percentile=90,
+                           min_samples=10, min_delay=0.01, max_extra_load=max_extra_load)
+    for latency in [0.01] * 9 + [0.05]:
+        hedger.record_latency(latency)
+    return hedger
+
+
+def test_hedge_delay_is_the_percentile_of_the_recent_latencies():
+    hedger = RequestHedger(ConcurrencyController(), enabled=True, min_samples=3, min_delay=0.5)
+    hedger.record_latency(1.0)
+    assert hedger.hedge_delay() is None
+    for latency in [2.0, 3.0, 4.0]:
+        hedger.record_latency(latency)
+    assert hedger.hedge_delay() == 4.0
+    hedger.percentile = 50
+    assert hedger.hedge_delay() == 3.0
+    assert hedger.expected_remaining(2.5) == 1.0
+
+
+def test_a_slow_request_is_answered_by_its_hedge():
+    hedger = make_hedger()
+    backend = StuckBackend()
+    assert hedger.chat(backend, MESSAGES)["message"]["content"] == "hedge"
+    assert backend.cancelled_first.wait(timeout=5)
+    assert (hedger.hedges, hedger.hedge_wins) == (1, 1)
+    assert "1 answered first by the hedge" in hedger.summary()
+
+
+def test_hedges_are_capped_by_the_extra_load_and_the_free_slots():
+    hedger = make_hedger(max_extra_load=0.05)
+    hedger.requests = 10
+    assert not hedger.take_hedge()
+    hedger.requests = 40
+    hedger.concurrency.in_flight = 4
+    assert not hedger.take_hedge()
+    hedger.concurrency.in_flight = 0
+    assert hedger.take_hedge()
+    assert (hedger.hedges, hedger.skipped, hedger.concurrency.in_flight) == (1, 2, 1)
+
+
+def test_disabled_hedger_sends_the_request_as_is():
+    hedger = RequestHedger(ConcurrencyController(), enabled=False)
+    assert hedger.chat(StuckBackend(), MESSAGES)["message"]["content"] == "plain"
+    assert hedger.summary() is None
@@ -0,0 +1,50 @@
+import ast
+
+from dynamodocs.identifier_index import SEARCH_FILE, SEARCH_NONE, SEARCH_PROJECT, IdentifierIndex
+
+FILES = {
+    "pkg/__init__.py": "",
+    "pkg/base.py": "def helper():\n    return 1\n\n\ndef lonely():\n    return helper()\n",
+    "pkg/user.py": "from pkg.base import helper\n\n\ndef use():\n    return helper()\n",
+    "app.py": "import pkg.user\n\n\ndef main():\n    return pkg.user.use()\n",
+    # names the same identifier without importing anything
+    "scripts/tool.py": "def run(helper):\n    return helper\n",
+}
+
+
+def make_index(tmp_path, files=FILES):
+    for path, text in files.items():
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(text)
+    return IdentifierIndex(str(tmp_path), sorted(files))
+
+
+def test_imported_modules_include_the_parent_packages():
+    tree = ast.parse("import a.b.c\nfrom . import sibling\nfrom .sub import name\n")
+    assert IdentifierIndex.imported_modules("pkg/module.py", tree) == {
+        "a", "a.b", "a.b.c", "pkg", "pkg.sibling", "pkg.sub", "pkg.sub.name"}
+
+
+def test_module_level_objects_are_searched_in_the_importing_files_only(tmp_path):
+    index = make_index(tmp_path)
+    assert index.reaching("pkg/base.py") == {"pkg/user.py", "app.py"}
+    assert index.search_scope("helper", "pkg/base.py", module_level=True) == (SEARCH_PROJECT, ["pkg/user.py"])
+    # a method may be called on any object, every file naming it is a candidate
+    assert index.search_scope("helper", "pkg/base.py", module_level=False) == (
+        SEARCH_PROJECT, ["pkg/user.py", "scripts/tool.py"])
+
+
+def test_searches_of_names_appearing_in_their_own_file_only(tmp_path):
+    index = make_index(tmp_path)
+    assert index.search_scope("lonely", "pkg/base.py", module_level=True) == (SEARCH_NONE, [])
+    assert index.search_scope("run", "scripts/tool.py", module_level=True) == (SEARCH_NONE, [])
+    files = {**FILES, "pkg/base.py": FILES["pkg/base.py"] + "\n\nlonely()\n"}
+    index = make_index(tmp_path, files)
+    assert index.search_scope("lonely", "pkg/base.py", module_level=True) == (SEARCH_FILE, [])
+    assert index.summary() == ("Reference pre-filter: 0 searches skipped, 1 narrowed to their own file, "
+                               "0 on the candidate files")
+
+
+def test_files_that_do_not_parse_may_import_any_module(tmp_path):
+    index = make_index(tmp_path, {**FILES, "broken.py": "def broken(:\n    helper()\n"})
+    assert "broken.py" in index.search_scope("helper", "pkg/base.py", module_level=True)[1]
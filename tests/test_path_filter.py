@@ -0,0 +1,58 @@
+import re
+
+import pytest
+
+from dynamodocs.utils.path_filter import PathFilter, get_path_filter, glob_to_regex, literal_prefix
+
+
+@pytest.mark.parametrize("pattern, path, matched", [
+    ("src/*.py", "src/module.py", True),
+    ("src/*.py", "src/pkg/module.py", False),
+    ("src/**/*.py", "src/module.py", True),
+    ("src/**/*.py", "src/a/b/module.py", True),
+    ("**/test_*.py", "test_module.py", True),
+    ("**/test_*.py", "pkg/tests/test_module.py", True),
+    ("tests", "tests/unit/test_module.py", True),
+    ("tests/", "tests_utils.py", False),
+    ("module?.py", "module1.py", True),
+    ("module?.py", "module10.py", False),
+    ("module[0-2].py", "module1.py", True),
+    ("module[!0-2].py", "module1.py", False),
+    ("a.b.py", "aXb.py", False),
+])
+def test_glob_to_regex(pattern, path, matched):
+    assert (re.fullmatch(glob_to_regex(pattern), path) is not None) == matched
+
+
+def test_literal_prefix():
+    assert literal_prefix("src/pkg/*/test_*.py") == "src/pkg"
+    assert literal_prefix("**/*.py") == ""
+    assert literal_prefix("/tests/") == "tests"
+
+
+def test_match_combines_the_include_exclude_and_scope_globs():
+    path_filter = PathFilter(include=["src/**"], exclude=["**/generated_*.py"], ignore_prefixes=["src/legacy"],
+                             scope=["src/core"])
+    assert path_filter.match("src/core/module.py")
+    assert not path_filter.match("src/other/module.py")
+    assert not path_filter.match("src/core/generated_api.py")
+    assert not path_filter.match("docs/conf.py")
+    assert path_filter.without_scope().match("src/other/module.py")
+    assert not path_filter.without_scope().match("src/legacy_utils.py")
+    assert PathFilter().is_empty and PathFilter().match("any/module.py")
+
+
+def test_may_contain_prunes_the_folders_out_of_reach():
+    path_filter = PathFilter(include=["src/pkg/**/*.py"], exclude=["src/pkg/vendor"])
+    assert path_filter.may_contain("src")
+    assert path_filter.may_contain("src/pkg/sub")
+    assert not path_filter.may_contain("docs")
+    assert not path_filter.may_contain("src/pkg/vendor")
+    assert PathFilter(include=["**/*.py"]).may_contain("anything")
+
+
+def test_get_path_filter_is_compiled_once_per_globs():
+    config = {"paths": {"include": ["src"], "scope": ["src/core"]}, "ignore_list": ["src/old"]}
+    assert get_path_filter(config) is get_path_filter(dict(config))
+    assert get_path_filter(config, scoped=False).scope == []
+    assert get_path_filter({"paths": None}).is_empty
@@ -0,0 +1,92 @@
+import random
+import threading
+import time
+
+import pytest
+
+from dynamodocs.retry import CircuitBreaker, CircuitOpenError, backoff_delay
+
+
+def test_backoff_delay_stays_within_the_capped_exponential_bound():
+    rng = random.Random(0)
+    for attempt in range(10):
+        bound = min(8.0, 0.5 * 2 ** attempt)
+        assert all(0 <= backoff_delay(attempt, 0.5, 8.0, rng) <= bound for _ in range(50))
+
+
+def test_disabled_breaker_never_blocks():
+    breaker = CircuitBreaker(failure_threshold=0)
+    for _ in range(10):
+        breaker.record_failure()
+    breaker.before_request()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_opens_after_the_threshold_and_closes_after_a_successful_probe():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0.05)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    start = time.monotonic()
+    breaker.before_request()
+    assert time.monotonic() - start >= 0.04
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.times_opened == 1
+
+
+def test_failed_probe_doubles_the_cooldown_up_to_the_maximum():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.01, max_cooldown=0.03)
+    breaker.record_failure()
+    for expected_cooldown in [0.02, 0.03, 0.03]:
+        breaker.before_request()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.cooldown == pytest.approx(expected_cooldown)
+
+
+def test_requests_wait_for_the_outcome_of_the_probe():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.01)
+    breaker.record_failure()
+    breaker.before_request()
+    passed = threading.Event()
+    waiting = threading.Thread(target=lambda: (breaker.before_request(), passed.set()))
+    waiting.start()
+    assert not passed.wait(0.05)
+    breaker.record_success()
+    assert passed.wait(1.0)
+    waiting.join()
+
+
+def test_after_giving_up_the_requests_fail_but_a_probe_can_still_close_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05, give_up_after=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+    time.sleep(0.05)
+    # the cooldown is over, this request is the probe
+    breaker.before_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # the other requests don't wait for it once the backend is given up
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_request()
+
+
+def test_start_run_gives_the_backend_another_give_up_delay():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.2, give_up_after=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    breaker.start_run()
+    # waits for the cooldown instead of failing, and becomes the probe
+    breaker.before_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
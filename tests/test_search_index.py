@@ -0,0 +1,57 @@
+from dynamodocs.search_index import SearchIndex, heading_anchor, tokenize
+
+
+def page(doc, *objects):
+    return {
+        "doc": doc,
+        "markdown": "\n".join(text for _, text in objects),
+        "objects": [{"name": name, "type": "FunctionDef", "anchor": name.rsplit("/", 1)[-1], "text": text}
+                    for name, text in objects],
+    }
+
+
+def test_heading_anchor_numbers_the_repeated_headings():
+    seen = {}
+    assert heading_anchor("FunctionDef load_doc(path)", seen) == "functiondef-load_docpath"
+    assert heading_anchor("FunctionDef load_doc(path)", seen) == "functiondef-load_docpath-1"
+    assert heading_anchor(" Other: heading ", seen) == "other-heading"
+
+
+def test_tokenize_adds_the_snake_case_parts_and_drops_the_stop_words():
+    assert tokenize("The load_doc of a file") == ["doc", "file", "load", "load_doc"]
+
+
+def test_update_indexes_the_changed_pages_only():
+    index = SearchIndex()
+    pages = {
+        "a.py": page("a.md", ("a.py/load_doc", "Reads the doc")),
+        "b.py": page("b.md", ("b.py/save", "Writes the doc")),
+    }
+    assert index.update(pages, removed=[]) == 2
+    assert index.symbols == {"load_doc": {"a.py": [0]}, "save": {"b.py": [0]}}
+    assert index.terms["doc"] == {"a.py": [0], "b.py": [0]}
+
+    pages["b.py"] = page("b.md", ("b.py/save", "Writes the page"), ("b.py/dump", "Writes the doc"))
+    assert index.update(pages, removed=[]) == 1
+    assert index.terms["doc"] == {"a.py": [0], "b.py": [1]}
+    assert index.terms["page"] == {"b.py": [0]}
+    assert index.files["b.py"]["objects"] == [["b.py/save", "FunctionDef", "save"],
+                                              ["b.py/dump", "FunctionDef", "dump"]]
+
+
+def test_update_forgets_the_removed_pages():
+    index = SearchIndex()
+    index.update({"a.py": page("a.md", ("a.py/load", "Reads")),
+                  "b.py": page("b.md", ("b.py/save", "Writes"))}, removed=[])
+    assert index.update({}, removed=["a.py", "unknown.py"]) == 0
+    assert set(index.files) == {"b.py"}
+    assert "load" not in index.symbols and "reads" not in index.terms
+
+
+def test_save_and_load(tmp_path):
+    index = SearchIndex()
+    index.update({"a.py": page("a.md", ("a.py/load", "Reads"))}, removed=[])
+    index.save(str(tmp_path))
+    loaded = SearchIndex.load(str(tmp_path))
+    assert (loaded.files, loaded.terms, loaded.symbols) == (index.files, index.terms, index.symbols)
+    assert SearchIndex.load(str(tmp_path / "missing")).files == {}
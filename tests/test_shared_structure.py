@@ -0,0 +1,55 @@
+import os
+
+from dynamodocs.shared_structure import SharedStructureStore
+
+
+def test_from_config_is_off_unless_enabled(tmp_path):
+    assert SharedStructureStore.from_config({}, str(tmp_path), ".project_hierarchy") is None
+    store = SharedStructureStore.from_config(
+        {"shared_structure": {"enabled": True, "max_entries": 3}}, str(tmp_path), ".project_hierarchy")
+    assert store.folder == os.path.join(str(tmp_path), ".project_hierarchy_shared")
+    assert store.max_entries == 3
+
+
+def test_saved_entries_are_loaded_back(tmp_path):
+    store = SharedStructureStore(str(tmp_path / "shared"))
+    assert store.load("structure", "key") is None
+    store.save("structure", "key", {"module.py": [1, 2]})
+    assert store.load("structure", "key") == {"module.py": [1, 2]}
+    assert (store.hits, store.misses) == (1, 1)
+
+
+def test_structure_key_follows_the_content_of_the_files_and_the_config(tmp_path):
+    (tmp_path / "module.py").write_text("def f():\n    pass\n")
+    key = SharedStructureStore.structure_key({}, str(tmp_path), ["module.py"])
+    assert SharedStructureStore.structure_key({}, str(tmp_path), ["module.py"]) == key
+    assert SharedStructureStore.structure_key({"fast_path": {"enabled": True}}, str(tmp_path), ["module.py"]) != key
+    (tmp_path / "module.py").write_text("def g():\n    pass\n")
+    assert SharedStructureStore.structure_key({}, str(tmp_path), ["module.py"]) != key
+    assert SharedStructureStore.structure_key({}, str(tmp_path), ["missing.py"]) is None
+
+
+def test_the_least_recently_used_entries_are_pruned(tmp_path):
+    store = SharedStructureStore(str(tmp_path / "shared"), max_entries=2)
+    store.save("references", "old", [])
+    store.save("references", "used", [])
+    os.utime(store.entry_path("references", "old"), (1, 1))
+    os.utime(store.entry_path("references", "used"), (2, 2))
+    store.load("references", "used")
+    store.save("references", "new", [])
+    assert store.load("references", "old") is None
+    assert store.load("references", "used") == []
+    assert store.load("references", "new") == []
+
+
+def test_a_read_only_store_leaves_the_folder_untouched(tmp_path):
+    writer = SharedStructureStore(str(tmp_path / "shared"))
+    writer.save("structure", "key", {"a": 1})
+    path = writer.entry_path("structure", "key")
+    os.utime(path, (1, 1))
+
+    reader = SharedStructureStore(str(tmp_path / "shared"), read_only=True)
+    assert reader.load("structure", "key") == {"a": 1}
+    assert os.path.getmtime(path) == 1
+    reader.save("structure", "other", {"b": 2})
+    assert not os.path.exists(reader.entry_path("structure", "other"))
@@ -0,0 +1,75 @@
+import ast
+
+from dynamodocs.static_references import StaticReferenceResolver, annotation_class, module_name_of, resolve_import
+
+BASE = """class Base:
+    def run(self):
+        return helper()
+
+
+def helper():
+    return 1
+
+
+def other():
+    return 2
+"""
+
+USER = """from .base import Base, helper
+from pkg import base
+
+
+class Child(Base):
+    def go(self):
+        self.run()
+        return helper()
+
+
+def use(item: Base, unknown):
+    item.run()
+    unknown.other()
+    return base.helper()
+"""
+
+
+def make_resolver(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "__init__.py").write_text("")
+    (tmp_path / "pkg" / "base.py").write_text(BASE)
+    (tmp_path / "pkg" / "user.py").write_text(USER)
+    return StaticReferenceResolver(str(tmp_path), ["pkg/__init__.py", "pkg/base.py", "pkg/user.py"])
+
+
+def test_module_names_and_relative_imports():
+    assert module_name_of("pkg/sub/module.py") == ("pkg.sub.module", False)
+    assert module_name_of("pkg/__init__.py") == ("pkg", True)
+    assert resolve_import("base", 1, "pkg.user", False) == "pkg.base"
+    assert resolve_import("base", 1, "pkg", True) == "pkg.base"
+    assert resolve_import(None, 2, "pkg.sub.module", False) == "pkg"
+    assert resolve_import("os.path", 0, "pkg.user", False) == "os.path"
+
+
+def test_annotation_class():
+    def parse(annotation):
+        return annotation_class(ast.parse(annotation, mode="eval").body)
+
+    assert ast.unparse(parse("Optional[Base]")) == "Base"
+    assert ast.unparse(parse("'pkg.Base'")) == "pkg.Base"
+    assert parse("List[Base]") is None
+
+
+def test_references_through_imports_self_and_annotations(tmp_path):
+    resolver = make_resolver(tmp_path)
+    assert resolver.find_references("helper", "pkg/base.py", 6) == [
+        ("pkg/base.py", 3, 15), ("pkg/user.py", 1, 24), ("pkg/user.py", 8, 15), ("pkg/user.py", 14, 16)]
+    assert resolver.find_references("run", "pkg/base.py", 2) == [("pkg/user.py", 7, 13), ("pkg/user.py", 12, 9)]
+    assert resolver.find_references("Base", "pkg/base.py", 1) == [
+        ("pkg/user.py", 1, 18), ("pkg/user.py", 5, 12), ("pkg/user.py", 11, 14)]
+    assert resolver.find_references("helper", "pkg/base.py", 6, in_file_only=True) == [("pkg/base.py", 3, 15)]
+
+
+def test_names_used_on_unknown_values_are_left_to_jedi(tmp_path):
+    resolver = make_resolver(tmp_path)
+    assert resolver.find_references("other", "pkg/base.py", 10) is None
+    assert resolver.find_references("missing", "pkg/base.py", 1) is None
+    assert resolver.fallback_count == 2
@@ -0,0 +1,40 @@
+import ast
+import os
+
+import git
+
+from benchmarks.synthetic_repo import SyntheticRepoSpec, generate_synthetic_repo
+
+SPEC = SyntheticRepoSpec(file_count=6, objects_per_file=8, nesting_depth=2, reference_density=1.5, seed=3)
+
+
+def read_modules(repo_path):
+    modules = {}
+    for root, _, files in os.walk(os.path.join(repo_path, "synthetic")):
+        for file in files:
+            if file.startswith("module_"):
+                path = os.path.join(root, file)
+                with open(path, encoding="utf-8") as reader:
+                    modules[os.path.relpath(path, repo_path)] = reader.read()
+    return modules
+
+
+def test_every_module_has_the_requested_objects(tmp_path):
+    repo_path = generate_synthetic_repo(str(tmp_path / "repo"), SPEC)
+    modules = read_modules(repo_path)
+    assert len(modules) == SPEC.file_count
+    for source in modules.values():
+        tree = ast.parse(source)
+        objects = [node for node in ast.walk(tree) if isinstance(node, (ast.FunctionDef, ast.ClassDef))]
+        assert len(objects) == SPEC.objects_per_file
+        assert all(node.module.startswith("synthetic.") for node in tree.body if isinstance(node, ast.ImportFrom))
+    assert max(len(path.split(os.sep)) for path in modules) == SPEC.nesting_depth + 2
+
+
+def test_the_same_spec_gives_the_same_committed_repository(tmp_path):
+    first = generate_synthetic_repo(str(tmp_path / "first"), SPEC)
+    second = generate_synthetic_repo(str(tmp_path / "second"), SPEC)
+    assert read_modules(first) == read_modules(second)
+    repo = git.Repo(first)
+    assert not repo.is_dirty(untracked_files=True)
+    assert os.path.exists(os.path.join(first, "synthetic", "__init__.py"))
@@ -0,0 +1,65 @@
+from functools import partial
+
+from dynamodocs.tree_handler import DocItem, DocItemStatus, MetaInfo
+
+ITEM = {"md_content": [], "params": [], "have_return": False, "name_column": 4}
+
+
+def make_meta_info(repo_path):
+    """A class A with a method m, and a function f calling m."""
+    (repo_path / "module.py").write_text("class A:\n    def m(self):\n        pass\n\n\ndef f():\n    pass\n")
+    meta_info = MetaInfo.from_project_hierarchy_json({"module.py": [
+        {**ITEM, "type": "ClassDef", "name": "A", "code_start_line": 1, "code_end_line": 3},
+        {**ITEM, "type": "FunctionDef", "name": "m", "code_start_line": 2, "code_end_line": 3},
+        {**ITEM, "type": "FunctionDef", "name": "f", "code_start_line": 6, "code_end_line": 7},
+    ]})
+    meta_info.document_version = "abc123"
+    return meta_info
+
+
+def items(meta_info):
+    file_item = meta_info.target_repo_hierarchical_tree.children["module.py"]
+    return file_item.children["A"], file_item.children["A"].children["m"], file_item.children["f"]
+
+
+def link_reference(meta_info):
+    _, method_item, function_item = items(meta_info)
+    function_item.reference_who.append(method_item)
+    function_item.special_reference_type.append(False)
+    method_item.who_reference_me.append(function_item)
+
+
+def task_names(task_manager):
+    return {task.extra_info.item_name: sorted(dependency.extra_info.item_name for dependency in task.dependencies)
+            for task in task_manager.task_dict.values()}
+
+
+def test_saved_task_graph_resumes_with_the_tasks_left(repo_config, tmp_path):
+    available = partial(DocItem.need_to_generate, ignore_list=[])
+    meta_info = make_meta_info(tmp_path)
+    link_reference(meta_info)
+    task_manager = meta_info.get_task_manager(meta_info.target_repo_hierarchical_tree, task_available_func=available)
+    checkpoint = str(tmp_path / ".project_hierarchy")
+    meta_info.save_task_graph(task_manager, checkpoint)
+    assert task_names(task_manager) == {"m": [], "A": ["m"], "f": ["m"]}
+
+    # the interrupted run documented m, the references are not resolved again
+    resumed = make_meta_info(tmp_path)
+    items(resumed)[1].item_status = DocItemStatus.doc_upto_date
+    resumed_manager = resumed.load_task_graph(checkpoint, available)
+    assert task_names(resumed_manager) == {"A": [], "f": []}
+    _, method_item, function_item = items(resumed)
+    assert function_item.reference_who == [method_item]
+    assert method_item.who_reference_me == [function_item]
+
+
+def test_a_task_graph_of_another_version_is_not_loaded(repo_config, tmp_path):
+    meta_info = make_meta_info(tmp_path)
+    task_manager = meta_info.get_task_manager(meta_info.target_repo_hierarchical_tree, task_available_func=None)
+    checkpoint = str(tmp_path / ".project_hierarchy")
+    meta_info.save_task_graph(task_manager, checkpoint)
+
+    other = make_meta_info(tmp_path)
+    other.document_version = "def456"
+    assert other.load_task_graph(checkpoint, None) is None
+    assert make_meta_info(tmp_path).load_task_graph(str(tmp_path / "missing"), None) is None
@@ -0,0 +1,189 @@
+import threading
+
+from dynamodocs.threads import GenerationQueue, TaskManager
+from dynamodocs.tree_handler import (CHARS_PER_TOKEN, EXPECTED_DOC_TOKENS, PREFILL_SPEEDUP, PROMPT_TEMPLATE_TOKENS,
+                                     DocItem, MetaInfo)
+
+
+def claim_all(task_manager, process_id=0):
+    """Claim and complete the ready tasks until none is left, returns their IDs in claim order."""
+    task_manager.sync_func = lambda: None
+    claimed = []
+    while not task_manager.all_success:
+        task, task_id = task_manager.get_next_task(process_id)
+        assert task is not None, "a task is left that never gets ready"
+        claimed.append(task_id)
+        task_manager.mark_completed(task_id)
+    return claimed
+
+
+def test_ready_tasks_are_claimed_in_the_order_they_were_added():
+    task_manager = TaskManager()
+    first = task_manager.add_task([])
+    second = task_manager.add_task([])
+    after_first = task_manager.add_task([first])
+    task_manager.add_task([second, after_first])
+    assert claim_all(task_manager) == [0, 1, 2, 3]
+
+
+def test_a_task_is_ready_once_all_its_dependencies_are_completed():
+    task_manager = TaskManager()
+    task_manager.sync_func = lambda: None
+    first = task_manager.add_task([])
+    second = task_manager.add_task([])
+    task_manager.add_task([first, second])
+
+    task, _ = task_manager.get_next_task(0)
+    task_manager.mark_completed(task.task_id)
+    task, _ = task_manager.get_next_task(0)
+    assert task.task_id == second
+    assert task_manager.get_next_task(0) == (None, -1)
+    task_manager.mark_completed(second)
+    assert task_manager.get_next_task(0)[1] == 2
+
+
+def test_task_graph_schedules_the_children_and_the_references_first(repo_config, tmp_path):
+    (tmp_path / "module.py").write_text("class A:\n    def m(self):\n        pass\n\n\ndef f():\n    pass\n")
+    item = {"md_content": [], "params": [], "have_return": False, "name_column": 4}
+    meta_info = MetaInfo.from_project_hierarchy_json({"module.py": [
+        {**item, "type": "ClassDef", "name": "A", "code_start_line": 1, "code_end_line": 3},
+        {**item, "type": "FunctionDef", "name": "m", "code_start_line": 2, "code_end_line": 3},
+        {**item, "type": "FunctionDef", "name": "f", "code_start_line": 6, "code_end_line": 7},
+    ]})
+    class_item = meta_info.target_repo_hierarchical_tree.children["module.py"].children["A"]
+    function_item = meta_info.target_repo_hierarchical_tree.children["module.py"].children["f"]
+    # f calls m
+    method_item = class_item.children["m"]
+    function_item.reference_who.append(method_item)
+    function_item.special_reference_type.append(False)
+    method_item.who_reference_me.append(function_item)
+
+    task_manager = meta_info.get_task_manager(meta_info.target_repo_hierarchical_tree, task_available_func=None)
+    names = {task_id: task.extra_info.item_name for task_id, task in task_manager.task_dict.items()}
+    order = [names[task_id] for task_id in claim_all(task_manager)]
+    assert order.index("m") < order.index("A")
+    assert order.index("m") < order.index("f")
+    assert order.index("A") < order.index("module.py")
+
+
+def test_prioritize_starts_the_longest_chain_first():
+    task_manager = TaskManager()
+    short = task_manager.add_task([], cost=5.0)
+    chain_start = task_manager.add_task([], cost=1.0)
+    middle = task_manager.add_task([chain_start], cost=3.0)
+    task_manager.add_task([middle], cost=3.0)
+    task_manager.prioritize()
+    assert [task_manager.task_dict[task_id].priority for task_id in range(4)] == [5.0, 7.0, 6.0, 3.0]
+    assert claim_all(task_manager) == [chain_start, middle, short, 3]
+
+
+def test_tasks_of_equal_priority_keep_their_order():
+    task_manager = TaskManager()
+    for _ in range(3):
+        task_manager.add_task([], cost=2.0)
+    task_manager.prioritize()
+    assert claim_all(task_manager) == [0, 1, 2]
+
+
+def test_generation_cost_grows_with_the_prompt():
+    item = DocItem(item_name="f", content={"code_size": 400 * CHARS_PER_TOKEN})
+    documented = DocItem(item_name="g", md_content=["x" * 40 * CHARS_PER_TOKEN])
+    undocumented = DocItem(item_name="h")
+    item.reference_who = [documented]
+    item.who_reference_me = [undocumented]
+    prompt_tokens = PROMPT_TEMPLATE_TOKENS + 400 + 40 + EXPECTED_DOC_TOKENS
+    assert item.estimate_generation_cost() == 1 + prompt_tokens / PREFILL_SPEEDUP / EXPECTED_DOC_TOKENS
+
+
+def test_claim_group_takes_the_accepted_ready_tasks_of_the_group():
+    task_manager = TaskManager()
+    task_manager.sync_func = lambda: None
+    first = task_manager.add_task([], extra="small", group="module.py")
+    task_manager.add_task([], extra="large", group="module.py")
+    waiting = task_manager.add_task([first], extra="small", group="module.py")
+    task_manager.add_task([], extra="small", group="other.py")
+    for _ in range(2):
+        task_manager.add_task([], extra="small", group="module.py")
+
+    task, _ = task_manager.get_next_task(0)
+    first_claim = task_manager.claim_group(task, accept=lambda extra: extra == "small", max_count=1)
+    assert [other.task_id for other in first_claim] == [4]
+    second_claim = task_manager.claim_group(task, accept=lambda extra: extra == "small", max_count=5)
+    assert [other.task_id for other in second_claim] == [5]
+    for batch_task in [task, *first_claim, *second_claim]:
+        task_manager.mark_completed(batch_task.task_id)
+    # the claimed tasks are not handed out again, the declined and the waiting ones still are
+    assert claim_all(task_manager) == [1, waiting, 3]
+
+
+def test_a_worker_gets_a_ready_task_of_its_affinity_first():
+    task_manager = TaskManager()
+    task_manager.sync_func = lambda: None
+    for affinity in ["a.py", "b.py", "a.py", "b.py"]:
+        task_manager.add_task([], cost=1.0, affinity=affinity)
+    task_manager.prioritize()
+    task, _ = task_manager.get_next_task(0)
+    assert task.task_id == 0
+    assert task_manager.get_next_task(0, affinity="b.py")[1] == 1
+    assert task_manager.get_next_task(0, affinity="b.py")[1] == 3
+    # no ready task of the affinity left, the next one by priority
+    assert task_manager.get_next_task(0, affinity="b.py")[1] == 2
+
+
+def repo_tasks(name, count, cost=1.0):
+    task_manager = TaskManager()
+    task_manager.sync_func = lambda: None
+    for index in range(count):
+        task_manager.add_task([], extra=f"{name}{index}", cost=cost)
+    return task_manager
+
+
+def run_in_thread(generation_queue, task_manager, handler, errors):
+    def run():
+        try:
+            generation_queue.run(task_manager, handler)
+        except RuntimeError as e:
+            errors.append(e)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def wait_for_entries(generation_queue, count):
+    with generation_queue.condition:
+        assert generation_queue.condition.wait_for(lambda: len(generation_queue.entries) == count, timeout=5)
+
+
+def test_generation_queue_serves_the_task_managers_fair_share():
+    generation_queue = GenerationQueue(thread_count=1)
+    handled, errors = [], []
+    threads = [run_in_thread(generation_queue, repo_tasks("a", 4), handled.append, errors)]
+    wait_for_entries(generation_queue, 1)
+    # b costs twice as much per task, it gets half as many tasks
+    threads.append(run_in_thread(generation_queue, repo_tasks("b", 2, cost=2.0), handled.append, errors))
+    wait_for_entries(generation_queue, 2)
+    generation_queue.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    generation_queue.close()
+    assert handled == ["a0", "b0", "a1", "a2", "b1", "a3"]
+    assert errors == [] and generation_queue.entries == []
+
+
+def test_a_failed_task_releases_its_run_only():
+    generation_queue = GenerationQueue(thread_count=2)
+    generation_queue.start()
+    handled, errors = [], []
+
+    def handler(extra):
+        if extra == "a1":
+            raise ValueError("broken edit")
+        handled.append(extra)
+
+    threads = [run_in_thread(generation_queue, repo_tasks(name, 3), handler, errors) for name in "ab"]
+    for thread in threads:
+        thread.join(timeout=10)
+    generation_queue.close()
+    assert [type(error.__cause__) for error in errors] == [ValueError]
+    assert {"b0", "b1", "b2"} <= set(handled)
+    assert generation_queue.entries == []
@@ -0,0 +1,52 @@
+import json
+import threading
+from contextlib import nullcontext
+
+from dynamodocs.tracing import Tracer
+
+
+def test_a_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    lock = threading.Lock()
+    assert isinstance(tracer.span("stage"), nullcontext)
+    assert tracer.locked(lock, "lock") is lock
+    with tracer.span("stage"):
+        pass
+    assert tracer.events == []
+
+
+def test_spans_and_lock_waits_are_recorded():
+    tracer = Tracer()
+    tracer.enable()
+
+    @tracer.traced("parse")
+    def parse(value):
+        return value * 2
+
+    assert parse(2) == 4
+    with tracer.span("llm call", "llm", model="m"):
+        pass
+    with tracer.locked(threading.Lock(), "task_lock") as lock:
+        assert lock.locked()
+    names = [(event["name"], event["cat"]) for event in tracer.events]
+    assert names == [("parse", "stage"), ("llm call", "llm"), ("wait task_lock", "lock")]
+    assert tracer.events[1]["args"] == {"model": "m"}
+    assert all(event["dur"] >= 0 for event in tracer.events)
+
+
+def test_chrome_trace_and_summary(tmp_path):
+    tracer = Tracer()
+    tracer.enable()
+    for _ in range(3):
+        with tracer.span("task", "task"):
+            pass
+    path = str(tmp_path / "trace.json")
+    tracer.export_chrome_trace(path)
+    with open(path) as reader:
+        trace = json.load(reader)
+    phases = [event["ph"] for event in trace["traceEvents"]]
+    assert phases == ["M", "X", "X", "X"]
+    assert trace["traceEvents"][0]["args"]["name"] == threading.current_thread().name
+
+    rows = tracer.summary_table().rows
+    assert [row[:3] for row in rows] == [["task", "task", 3]]
@@ -0,0 +1,66 @@
+import os
+
+import git
+
+from dynamodocs.utils.path_filter import PathFilter
+from dynamodocs.watcher import PollingWatcher
+
+
+def write(repo_path, path, content):
+    full_path = os.path.join(repo_path, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "w") as writer:
+        writer.write(content)
+
+
+def make_repo(tmp_path):
+    repo_path = str(tmp_path)
+    repo = git.Repo.init(repo_path)
+    write(repo_path, "pkg/module.py", "x = 1\n")
+    repo.index.add(["pkg/module.py"])
+    repo.index.commit("init")
+    return repo_path, repo
+
+
+def test_snapshot_skips_the_fake_files_and_the_skipped_folders(tmp_path):
+    repo_path, _ = make_repo(tmp_path)
+    write(repo_path, "pkg/module_latest_version.py", "x = 1\n")
+    write(repo_path, "markdown_docs/generated.py", "x = 1\n")
+    write(repo_path, "pkg/notes.txt", "notes\n")
+    watcher = PollingWatcher(repo_path, skip_dirs=["markdown_docs"])
+    files = [path for path in watcher.last_snapshot if not path.startswith(".git/")]
+    assert files == [os.path.join("pkg", "module.py")]
+    assert ".git/HEAD" in watcher.last_snapshot
+
+
+def test_changed_paths_reports_the_edited_added_and_removed_files(tmp_path):
+    repo_path, _ = make_repo(tmp_path)
+    write(repo_path, "pkg/removed.py", "y = 2\n")
+    watcher = PollingWatcher(repo_path, skip_dirs=[])
+    write(repo_path, "pkg/module.py", "x = 10\n")
+    write(repo_path, "pkg/added.py", "z = 3\n")
+    os.remove(os.path.join(repo_path, "pkg", "removed.py"))
+    assert watcher.changed_paths(watcher.snapshot()) == [
+        os.path.join("pkg", path) for path in ["added.py", "module.py", "removed.py"]]
+
+
+def test_path_filter_limits_the_watched_files(tmp_path):
+    repo_path, _ = make_repo(tmp_path)
+    write(repo_path, "tests/test_module.py", "x = 1\n")
+    watcher = PollingWatcher(repo_path, skip_dirs=[], path_filter=PathFilter(include=["pkg/**"]))
+    write(repo_path, "tests/test_module.py", "x = 2\n")
+    assert watcher.changed_paths(watcher.snapshot()) == []
+
+
+def test_rebase_git_state_keeps_the_file_changes(tmp_path):
+    repo_path, repo = make_repo(tmp_path)
+    watcher = PollingWatcher(repo_path, skip_dirs=[])
+    write(repo_path, "pkg/module.py", "x = 10\n")
+    repo.index.add(["pkg/module.py"])
+    repo.index.commit("edit")
+    assert ".git/HEAD" in watcher.changed_paths(watcher.snapshot())
+
+    watcher.rebase_git_state()
+    changed = watcher.changed_paths(watcher.snapshot())
+    assert ".git/HEAD" not in changed and ".git/index" not in changed
+    assert os.path.join("pkg", "module.py") in changed